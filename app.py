@@ -1,13 +1,19 @@
-import threading
-from flask import Flask, render_template, request, jsonify, redirect, url_for, send_file
-from database import init_db, add_site, get_sites, get_articles, delete_site, \
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, send_file, abort
+from database import init_db, add_site, get_sites, get_articles, get_article, delete_site, \
                      add_search_term, get_search_terms, delete_search_term, \
-                     set_scraper_status, get_scraper_status, \
+                     set_scraper_status, \
                      import_sites_from_file, export_sites_to_file, \
-                     import_terms_from_file, export_terms_to_file
-from scraper import scrape_website_threaded, _crawled_urls_per_site_session
+                     import_terms_from_file, export_terms_to_file, get_backfill_terms
+from run_state import run_registry, SCAN_MODES
+from dedup import near_duplicate_index
+from term_backfill import term_backfill
+from metrics import crawl_metrics
+from profiling import PROFILERS
 from datetime import datetime
+import json
 import os
+import queue
+import time
 
 app = Flask(__name__)
 app.config.from_object('config.Config')
@@ -17,10 +23,12 @@ if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
-scraper_threads_list = []
+crawl_scheduler = None # CrawlScheduler of the current/last run
 
 with app.app_context():
     init_db()
+    if get_backfill_terms():
+        term_backfill.request(app) # Terms whose backfill was interrupted by a restart
 
 @app.context_processor
 def inject_datetime():
@@ -45,13 +53,14 @@ def add_site_route():
 @app.route('/delete_site/<int:site_id>', methods=['POST'])
 def delete_site_route(site_id):
     delete_site(site_id)
+    near_duplicate_index.reset() # Reloaded from the remaining articles on the next crawl
     return redirect(url_for('index'))
 
 @app.route('/add_term', methods=['POST'])
 def add_term_route():
     term = request.form['term'].strip()
-    if term:
-        add_search_term(term)
+    if term and add_search_term(term):
+        term_backfill.request(app) # Looks for it in the articles already collected
     return redirect(url_for('index'))
 
 @app.route('/delete_term/<int:term_id>', methods=['POST'])
@@ -61,14 +70,24 @@ def delete_term_route(term_id):
 
 @app.route('/start_scrape', methods=['POST'])
 def start_scrape_route():
-    global scraper_threads_list
-    
-    _crawled_urls_per_site_session.clear() 
+    global crawl_scheduler
 
-    active_threads = [t for t in scraper_threads_list if t.is_alive()]
-    if active_threads:
+    if crawl_scheduler and crawl_scheduler.is_running():
         return jsonify({'status': 'Scraper já está rodando!'}), 200
 
+    scan_mode = request.form.get('mode') or request.args.get('mode') or 'default'
+    if scan_mode not in SCAN_MODES:
+        return jsonify({'status': f'Erro: Modo de varredura inválido: {scan_mode}'}), 400
+
+    # The crawl stack (newspaper3k with nltk/lxml/PIL, aiohttp, ...) is only
+    # imported by the first run, so processes serving just the search pages
+    # never load it
+    from scraper import _crawled_urls_per_site_session, reset_fetch_stats
+    from crawl_scheduler import CrawlScheduler, AsyncCrawlScheduler
+
+    _crawled_urls_per_site_session.clear() 
+    reset_fetch_stats()
+
     query_terms = [term['term'] for term in get_search_terms()]
     if not query_terms:
         return jsonify({'status': 'Erro: Adicione termos de busca antes de iniciar a varredura!'}), 400
@@ -77,42 +96,112 @@ def start_scrape_route():
     if not sites_to_process:
         return jsonify({'status': 'Erro: Nenhum site cadastrado para varrer. Adicione sites e termos de busca.'}), 400
 
+    # Optional profiler for this run only (see profiling.py)
+    profiler = request.form.get('profile') or request.args.get('profile') or app.config['CRAWL_PROFILER'] or None
+    if profiler and profiler not in PROFILERS:
+        return jsonify({'status': f'Erro: Profiler inválido: {profiler}'}), 400
+
     set_scraper_status('running')
+    run = run_registry.start_run(scan_mode, profiler) # Progress counters and stop signal of this run
 
-    scraper_threads_list.clear()
-    for site_info in sites_to_process:
-        thread = threading.Thread(target=scrape_website_threaded, 
-                                  args=(app.app_context(), site_info['id'], site_info['url'], query_terms))
-        scraper_threads_list.append(thread)
-        thread.start()
-        
-    if not scraper_threads_list:
-        set_scraper_status('stopped')
-        return jsonify({'status': 'Nenhum site para iniciar varredura.'}), 400
+    if scan_mode == 'reprocess':
+        from reprocess import ReprocessScheduler
+        crawl_scheduler = ReprocessScheduler(app) # Replays the page archive, no network
+    elif app.config['CRAWL_ENGINE'] == 'async':
+        crawl_scheduler = AsyncCrawlScheduler(app, app.config['ASYNC_MAX_CONCURRENCY'])
+    else:
+        crawl_scheduler = CrawlScheduler(app, app.config['CRAWL_WORKERS'])
+    crawl_scheduler.start(sites_to_process, query_terms, scan_mode, run)
 
     return jsonify({'status': 'Scraper iniciado em background.'}), 202
 
 @app.route('/stop_scrape', methods=['POST'])
 def stop_scrape_route():
-    set_scraper_status('stopped')
+    # Workers see the run's stop Event before their next page; the run marks
+    # the scraper stopped in the DB once every site has finished
+    if not run_registry.stop_current_run():
+        set_scraper_status('stopped') # Nothing running in this process; just clear a stale DB status
     return jsonify({'status': 'Comando de parada enviado ao scraper.'}), 202
 
-@app.route('/scraper_status', methods=['GET'])
-def scraper_status_route():
-    status_info = get_scraper_status()
-    
-    global scraper_threads_list
-    active_threads = [t for t in scraper_threads_list if t.is_alive()]
-    
-    if not active_threads and status_info['status'] == 'running':
-        set_scraper_status('stopped')
-        status_info = get_scraper_status()
+def _scraper_status_payload():
+    # Served from the in-memory run state; no DB access
+    run = run_registry.current_run
+    status_info = run.snapshot() if run else {'status': 'stopped', 'pages_crawled': 0, 'max_pages': 0}
 
-    return jsonify({
+    scheduler_running = crawl_scheduler is not None and crawl_scheduler.is_running()
+    if not scheduler_running and status_info['status'] != 'stopped':
+        status_info['status'] = 'stopped' # The engine died without finishing its run
+
+    scheduler_stats = crawl_scheduler.get_stats() if crawl_scheduler else {}
+    return {
         'status': status_info['status'].upper(),
         'pages_crawled': status_info['pages_crawled'],
-        'max_pages': status_info['max_pages']
-    })
+        'max_pages': status_info['max_pages'],
+        'pages_per_sec': status_info.get('pages_per_sec', 0.0),
+        'articles_saved': status_info.get('articles_saved', 0),
+        'sites': status_info.get('individual_sites', []),
+        'queue_depth': scheduler_stats.get('queue_depth', 0),
+        'active_workers': scheduler_stats.get('active_workers', 0),
+        'workers': scheduler_stats.get('workers', 0)
+    }
+
+@app.route('/scraper_status', methods=['GET'])
+def scraper_status_route():
+    return jsonify(_scraper_status_payload())
+
+# Crawl counters and stage histograms in the Prometheus text format (see metrics.py)
+@app.route('/metrics', methods=['GET'])
+def metrics_route():
+    return Response(crawl_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# JSON report of the current (or last) run: stage timings, statuses, errors, bytes
+@app.route('/metrics/run', methods=['GET'])
+def run_metrics_route():
+    run = run_registry.current_run
+    if run is None:
+        return jsonify({'status': 'Nenhuma varredura iniciada.'}), 404
+    return jsonify(run.report())
+
+def _sse_message(event_type, data):
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+# Server-Sent Events stream of the crawl: 'status' (same payload as
+# /scraper_status, at most every SSE_STATUS_INTERVAL seconds and only when it
+# changed), 'article' for every article saved, and 'started'/'finished'.
+# static/js/script.js falls back to polling /scraper_status without it.
+@app.route('/scraper_events')
+def scraper_events_route():
+    def event_stream():
+        subscription = run_registry.subscribe()
+        try:
+            yield 'retry: 3000\n\n' # Browser reconnect delay (ms)
+            last_status = None
+            last_sent = time.monotonic()
+            next_status_at = last_sent
+            while True:
+                try:
+                    event_type, data = subscription.get(timeout=max(0.0, next_status_at - time.monotonic()))
+                    yield _sse_message(event_type, data)
+                    last_sent = time.monotonic()
+                except queue.Empty:
+                    pass
+                now = time.monotonic()
+                if now < next_status_at:
+                    continue
+                next_status_at = now + app.config['SSE_STATUS_INTERVAL']
+                status = _scraper_status_payload()
+                if status != last_status:
+                    yield _sse_message('status', status)
+                    last_status = status
+                    last_sent = now
+                elif now - last_sent > 15:
+                    yield ': keep-alive\n\n' # Also how a closed connection gets noticed
+                    last_sent = now
+        finally:
+            run_registry.unsubscribe(subscription)
+
+    return Response(event_stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 @app.route('/search_articles', methods=['GET'])
@@ -129,9 +218,18 @@ def search_articles_route():
     # NEW: Pagination parameters
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int) # Default to 10 articles per page
+    # Keyset cursors set by the Anterior/Próximo links (see get_articles)
+    after = request.args.get('after')
+    before = request.args.get('before')
+    # Near-duplicates are folded under their first copy unless asked for;
+    # cluster lists one article with all its copies
+    show_duplicates = request.args.get('show_duplicates') == '1'
+    cluster_id = request.args.get('cluster', type=int)
 
     # get_articles now returns a dict with articles, total_results, etc.
-    pagination_data = get_articles(query_terms, selected_site_id, order_by, start_date, end_date, page, per_page)
+    pagination_data = get_articles(query_terms, selected_site_id, order_by, start_date, end_date, page, per_page,
+                                   after=after, before=before, collapse_duplicates=not show_duplicates,
+                                   cluster_id=cluster_id)
     articles = pagination_data['articles']
     total_results = pagination_data['total_results']
     current_page = pagination_data['current_page']
@@ -141,7 +239,17 @@ def search_articles_route():
                            articles=articles,
                            selected_site_id=selected_site_id,
                            order_by=order_by, start_date=start_date, end_date=end_date,
-                           current_page=current_page, total_pages=total_pages, total_results=total_results, per_page=per_page)
+                           current_page=current_page, total_pages=total_pages, total_results=total_results, per_page=per_page,
+                           next_cursor=pagination_data['next_cursor'], prev_cursor=pagination_data['prev_cursor'],
+                           show_duplicates=show_duplicates, cluster_id=cluster_id)
+
+# Full text of a saved article; the listing only carries its snippet
+@app.route('/article/<int:article_id>', methods=['GET'])
+def article_route(article_id):
+    article = get_article(article_id)
+    if article is None:
+        abort(404)
+    return render_template('article.html', article=article, title=article['title'])
 
 
 @app.route('/import_sites', methods=['POST'])
@@ -187,7 +295,11 @@ def import_terms_route():
         try:
             imported_count = import_terms_from_file(file_path)
             os.remove(file_path)
-            return jsonify({'status': f'{imported_count} termos importados com sucesso.', 'success': True}), 200
+            status = f'{imported_count} termos importados com sucesso.'
+            if imported_count:
+                term_backfill.request(app) # Looks for them in the articles already collected
+                status += ' Buscando-os nas notícias já coletadas em segundo plano.'
+            return jsonify({'status': status, 'success': True}), 200
         except Exception as e:
             os.remove(file_path)
             return jsonify({'status': f'Erro ao importar termos: {str(e)}', 'success': False}), 500
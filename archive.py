@@ -0,0 +1,140 @@
+import gzip
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http import HTTPStatus
+
+from config import Config
+
+# Append-only archive of the pages the crawler fetched, so extraction and term
+# matching can be re-run later without the network (the 'reprocess' scan mode,
+# see reprocess.py).
+#
+# Pages are appended to segment files in ARCHIVE_DIR as WARC/1.1 'response'
+# records, each one its own gzip member: a segment is a valid .warc.gz that
+# standard WARC tools can read, and any record can be read on its own by
+# seeking to its offset. Segments are never modified; a new one is started once
+# the current one reaches ARCHIVE_SEGMENT_MAX_BYTES, and every process writes
+# its own. The index (URL, fetch time -> segment, offset, length) is the
+# archived_responses table, filled through the DB writer.
+#
+# Retention: a segment stays on disk while archived_responses points into it.
+# Deleting a site drops its index rows and the segments left without any
+# (see database.delete_site). Nothing else expires: every fetch of the sites
+# still configured adds a record, so the archive grows with the crawling done.
+# Set ARCHIVE_ENABLED=0 to stop archiving. To trim it by hand, delete old
+# segment files together with their archived_responses rows.
+#
+# The stored body is the decoded HTML re-encoded as UTF-8 (the crawler keeps no
+# raw bytes), with only the headers the crawler uses: Content-Type, ETag and
+# Last-Modified.
+
+SEGMENT_SUFFIX = '.warc.gz'
+
+def _status_line(status_code):
+    try:
+        reason = HTTPStatus(status_code).phrase
+    except ValueError:
+        reason = ''
+    return f"HTTP/1.1 {status_code} {reason}".rstrip()
+
+# One gzip-compressed WARC response record; returns (record bytes, fetched_at)
+def build_record(url, status_code, html, etag=None, last_modified=None, fetched_at=None):
+    fetched_at = fetched_at or datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    http_headers = [_status_line(status_code), 'Content-Type: text/html; charset=utf-8']
+    if etag:
+        http_headers.append(f"ETag: {etag}")
+    if last_modified:
+        http_headers.append(f"Last-Modified: {last_modified}")
+    payload = ('\r\n'.join(http_headers) + '\r\n\r\n').encode('utf-8') + html.encode('utf-8')
+    warc_headers = [
+        'WARC/1.1',
+        'WARC-Type: response',
+        f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>",
+        f"WARC-Date: {fetched_at}",
+        f"WARC-Target-URI: {url}",
+        'Content-Type: application/http; msgtype=response',
+        f"Content-Length: {len(payload)}"
+    ]
+    record = ('\r\n'.join(warc_headers) + '\r\n\r\n').encode('utf-8') + payload + b'\r\n\r\n'
+    return gzip.compress(record, compresslevel=Config.ARCHIVE_COMPRESSION_LEVEL), fetched_at
+
+def _header_fields(lines):
+    fields = {}
+    for line in lines:
+        name, _, value = line.partition(':')
+        fields[name.strip().lower()] = value.strip()
+    return fields
+
+# Inverse of build_record, from the decompressed record
+def parse_record(record):
+    warc_block, _, rest = record.partition(b'\r\n\r\n')
+    warc_headers = _header_fields(warc_block.decode('utf-8').split('\r\n')[1:])
+    payload = rest[:int(warc_headers['content-length'])]
+    http_block, _, body = payload.partition(b'\r\n\r\n')
+    http_lines = http_block.decode('utf-8').split('\r\n')
+    http_headers = _header_fields(http_lines[1:])
+    return {
+        'url': warc_headers['warc-target-uri'],
+        'fetched_at': warc_headers['warc-date'],
+        'status_code': int(http_lines[0].split()[1]),
+        'html': body.decode('utf-8', errors='replace'),
+        'etag': http_headers.get('etag'),
+        'last_modified': http_headers.get('last-modified')
+    }
+
+# Reads one record given its archived_responses index entry
+def read_record(segment, offset, length, directory=None):
+    with open(os.path.join(directory or Config.ARCHIVE_DIR, segment), 'rb') as segment_file:
+        segment_file.seek(offset)
+        return parse_record(gzip.decompress(segment_file.read(length)))
+
+class ResponseArchive:
+    def __init__(self, directory=None, segment_max_bytes=None):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self._lock = threading.Lock()
+        self._segment_name = None
+        self._segment_file = None
+
+    # Appends a page. Returns (segment, offset, length, fetched_at) for the index.
+    def append(self, url, status_code, html, etag=None, last_modified=None):
+        record, fetched_at = build_record(url, status_code, html, etag, last_modified)
+        with self._lock:
+            segment_file = self._writable_segment()
+            offset = segment_file.tell()
+            segment_file.write(record)
+            segment_file.flush() # Readable by reprocess runs as soon as the index row is committed
+            return self._segment_name, offset, len(record), fetched_at
+
+    def _writable_segment(self):
+        segment_max_bytes = self.segment_max_bytes or Config.ARCHIVE_SEGMENT_MAX_BYTES
+        if self._segment_file is not None and self._segment_file.tell() < segment_max_bytes:
+            return self._segment_file
+        self.close_segment()
+        directory = self.directory or Config.ARCHIVE_DIR
+        os.makedirs(directory, exist_ok=True)
+        self._segment_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:8]}{SEGMENT_SUFFIX}"
+        self._segment_file = open(os.path.join(directory, self._segment_name), 'ab')
+        return self._segment_file
+
+    # Removes segments no index row points into any more, except the one still being written
+    def delete_segments(self, segments):
+        directory = self.directory or Config.ARCHIVE_DIR
+        with self._lock:
+            for segment in segments:
+                if segment == self._segment_name and self._segment_file is not None:
+                    continue
+                try:
+                    os.remove(os.path.join(directory, segment))
+                except FileNotFoundError:
+                    pass
+
+    def close_segment(self):
+        if self._segment_file is not None:
+            self._segment_file.close()
+            self._segment_file = None
+
+response_archive = ResponseArchive()
@@ -0,0 +1,129 @@
+import os
+import sys
+import time
+import json
+import argparse
+import sqlite3
+import tempfile
+
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import body_store
+from benchmarks.fixtures import make_article_fields
+
+# Database size and listing latency with article bodies stored as plain text
+# in articles.content (listings doing SELECT a.*, as before) versus compressed
+# in article_bodies (listings reading articles.snippet only).
+#
+# The plain database is filled the old way, with the first full-text index
+# (reading articles.content directly), and then converted by init_db, the same
+# migration an existing database.db goes through. Sizes are of the whole file,
+# full-text index included; fulltext_bytes is the index's share of it. The
+# fixture bodies use a small vocabulary, so they compress better than real news
+# does; the repo's database.db goes from 606 KB to 717 KB because it had no
+# full-text index before (its bodies and snippets went from 552 KB to 254 KB).
+#
+#   python benchmarks/bench_body_storage.py --articles 20000 --per-page 10 50
+
+SORT = "ORDER BY IFNULL(a.published_date, '') DESC, a.scraped_at DESC, a.id DESC"
+
+PLAIN_FULLTEXT_INDEX = '''
+    CREATE VIRTUAL TABLE articles_fts USING fts5(
+        title, content, content='articles', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+'''
+
+def make_plain_database(path, articles):
+    database.DATABASE = path
+    with Flask(__name__).app_context():
+        database.init_db()
+        db = database.get_db()
+        # Swap the index init_db created (over article_bodies) for the plain layout's one
+        for trigger in ('article_bodies_fts_insert', 'article_bodies_fts_delete', 'article_bodies_fts_update',
+                        'articles_fts_title'):
+            db.execute(f'DROP TRIGGER {trigger}')
+        db.execute('DROP VIEW article_texts')
+        db.execute('DROP TABLE articles_fts')
+        db.execute(PLAIN_FULLTEXT_INDEX)
+        db.execute("INSERT INTO sites (url) VALUES ('https://jornal.exemplo.com.br')")
+        db.executemany('INSERT INTO articles (site_id, title, url, content, published_date) VALUES (1, ?, ?, ?, ?)',
+                       [(a['title'], a['url'], a['content'], a['published_date']) for a in articles])
+        db.execute("INSERT INTO articles_fts (articles_fts) VALUES ('rebuild')")
+        db.commit()
+        db.execute('VACUUM')
+        database.close_db()
+
+def database_size(path):
+    return sum(os.path.getsize(path + suffix) for suffix in ('', '-wal') if os.path.exists(path + suffix))
+
+def fulltext_index_size(path):
+    db = sqlite3.connect(path)
+    try:
+        return db.execute("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE 'articles_fts%'").fetchone()[0] or 0
+    finally:
+        db.close()
+
+def time_listing(db, columns, per_page, offset, repeat):
+    sql = f"SELECT {columns}, s.url AS site_url FROM articles a JOIN sites s ON a.site_id = s.id {SORT} LIMIT ? OFFSET ?"
+    started = time.perf_counter()
+    for _ in range(repeat):
+        [dict(row) for row in db.execute(sql, (per_page, offset)).fetchall()]
+    return (time.perf_counter() - started) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--articles', type=int, default=20000)
+    parser.add_argument('--per-page', type=int, nargs='+', default=[10, 50])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    articles = [make_article_fields(i) for i in range(args.articles)]
+    results = {'articles': args.articles, 'listing_ms': []}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bodies.db')
+        make_plain_database(path, articles)
+        results['plain_bytes'] = database_size(path)
+        results['plain_fulltext_bytes'] = fulltext_index_size(path)
+        with Flask(__name__).app_context():
+            plain_timings = {per_page: time_listing(database.get_db(), 'a.*', per_page, args.articles // 2, args.repeat)
+                             for per_page in args.per_page}
+            database.close_db()
+
+        body_store.dictionaries_loaded = False
+        with Flask(__name__).app_context():
+            started = time.perf_counter()
+            database.init_db() # Trains the dictionary and compresses every body
+            results['migration_seconds'] = round(time.perf_counter() - started, 2)
+            database.close_db()
+        results['compressed_bytes'] = database_size(path)
+        results['compressed_fulltext_bytes'] = fulltext_index_size(path)
+
+        with Flask(__name__).app_context():
+            db = database.get_db()
+            for per_page in args.per_page:
+                compressed_ms = time_listing(db, database.ARTICLE_LIST_COLUMNS, per_page, args.articles // 2, args.repeat)
+                results['listing_ms'].append({'per_page': per_page, 'plain': round(plain_timings[per_page], 3),
+                                              'compressed': round(compressed_ms, 3)})
+                print(f"per_page={per_page:<4} listing plain {plain_timings[per_page]:.3f} ms   "
+                      f"compressed {compressed_ms:.3f} ms")
+            started = time.perf_counter()
+            for article_id in range(1, args.repeat + 1):
+                database.get_article(article_id)
+            results['open_article_ms'] = round((time.perf_counter() - started) / args.repeat * 1000, 3)
+            database.close_db()
+
+    reduction = 1 - results['compressed_bytes'] / results['plain_bytes']
+    results['size_reduction'] = round(reduction, 3)
+    print(f"database size: plain {results['plain_bytes'] / 1e6:.1f} MB, "
+          f"compressed {results['compressed_bytes'] / 1e6:.1f} MB ({reduction:.0%} smaller)")
+    print(f"  of which full-text index: plain {results['plain_fulltext_bytes'] / 1e6:.1f} MB, "
+          f"compressed {results['compressed_fulltext_bytes'] / 1e6:.1f} MB")
+    print(f"opening an article (decompressing its body): {results['open_article_ms']} ms")
+    print(json.dumps({'benchmark': 'body_storage', 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
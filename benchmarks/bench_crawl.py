@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import json
+import argparse
+import contextlib
+import resource
+import tempfile
+import subprocess
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+from benchmarks.fixture_site import add_site_arguments
+
+# End-to-end crawl of synthetic news sites (fixture_site.py) through the real
+# path: /start_scrape, the crawl scheduler, fetcher, parse pool, term matching,
+# dedup and the DB writer, into a fresh database in a temporary directory.
+# Reports pages/sec, fetches per page, articles saved/sec, DB writer
+# operations/sec and peak RSS, plus the run's stage timings (metrics.py).
+#
+# The sites are served by a separate process, so their work and memory do not
+# count against the crawler. Every fixture article contains the term 'Arsal'
+# somewhere with high probability, so most crawled articles are saved.
+#
+# The crawler's own output goes to stderr, so stdout carries only the JSON.
+#
+#   python benchmarks/bench_crawl.py --engine async --sites 4 --pages 300 --max-pages 200 --latency 0.02
+
+def start_fixture_sites(args):
+    command = [sys.executable, os.path.join(BENCHMARKS_DIR, 'fixture_site.py'), '--port', str(args.port),
+               '--sites', str(args.sites), '--pages', str(args.pages), '--fan-out', str(args.fan_out),
+               '--paragraphs', str(args.paragraphs), '--latency', str(args.latency), '--jitter', str(args.jitter),
+               '--error-rate', str(args.error_rate), '--error-status', str(args.error_status), '--seed', str(args.seed)]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    urls = [server.stdout.readline().strip() for _ in range(args.sites)]
+    return server, urls
+
+def run_crawl(engine, urls, args):
+    # Imported here, after the chdir: the app creates database.db (and later
+    # run_reports/) in the current directory
+    import database
+    import scraper
+    from app import app
+    from config import Config
+    from run_state import run_registry
+
+    app.config['CRAWL_ENGINE'] = engine
+    app.config['CRAWL_WORKERS'] = args.workers
+    scraper.MAX_PAGES_PER_SITE = args.max_pages
+    scraper.host_rate_limiter.default_delay = args.crawl_delay
+
+    client = app.test_client()
+    for url in urls:
+        client.post('/add_site', data={'url': url})
+    client.post('/add_term', data={'term': 'Arsal'})
+
+    response = client.post('/start_scrape', data={'mode': 'default'})
+    if response.status_code != 202:
+        raise RuntimeError(f"start_scrape failed: {response.get_json()}")
+    run = run_registry.current_run
+    while not run.is_finished():
+        time.sleep(0.1)
+
+    report = run.report()
+    fetch_stats = scraper.get_fetch_stats()
+    scraper.shutdown_parse_pool() # Parse workers must exit for RUSAGE_CHILDREN to see them
+    # ru_maxrss is in KB on Linux; for children it is the largest single one.
+    # Read before the fixture server process is reaped, so it is not included.
+    peak_rss = {'crawler': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                'parse_worker': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+                                if Config.PARSE_PROCESSES > 0 else None}
+    with app.app_context():
+        saved = database.get_db().execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+        database.close_db()
+    return report, fetch_stats, saved, peak_rss
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_site_arguments(parser)
+    parser.add_argument('--engine', choices=('threaded', 'async'), default='threaded')
+    parser.add_argument('--workers', type=int, default=8, help='CRAWL_WORKERS of the threaded engine')
+    parser.add_argument('--max-pages', type=int, default=200, help='MAX_PAGES_PER_SITE for the run')
+    parser.add_argument('--crawl-delay', type=float, default=0.0, help='Per-host politeness delay (seconds)')
+    parser.add_argument('--port', type=int, default=8800, help='Port of the first fixture site')
+    args = parser.parse_args()
+
+    server, urls = start_fixture_sites(args)
+    working_directory = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                with contextlib.redirect_stdout(sys.stderr):
+                    report, fetch_stats, saved, peak_rss = run_crawl(args.engine, urls, args)
+            finally:
+                os.chdir(working_directory)
+    finally:
+        server.terminate()
+        server.wait()
+
+    duration = report['duration_seconds']
+    metrics = report['metrics']
+    db_write = metrics['stages'].get('db_write', {})
+    db_operations = sum(metrics['db_operations'].values())
+    results = {
+        'engine': args.engine,
+        'status': report['status'],
+        'duration_seconds': duration,
+        'pages': report['pages_crawled'],
+        'pages_per_sec': round(report['pages_crawled'] / duration, 2) if duration else 0.0,
+        'fetches_per_page': fetch_stats['fetches_per_page'],
+        'articles_saved': saved,
+        'articles_per_sec': round(saved / duration, 2) if duration else 0.0,
+        'db_operations_per_write_sec': round(db_operations / db_write['total_seconds'], 1)
+                                       if db_write.get('total_seconds') else None,
+        'peak_rss_mb': round(peak_rss['crawler'], 1),
+        'peak_parse_worker_rss_mb': round(peak_rss['parse_worker'], 1) if peak_rss['parse_worker'] else None,
+        'http_errors': sum(count for statuses in metrics['http_responses'].values()
+                           for status, count in statuses.items() if not status.startswith('2')),
+        'stages': metrics['stages']
+    }
+    print(f"{args.engine}: {results['pages']} pages in {duration}s ({results['pages_per_sec']} pages/s), "
+          f"{results['fetches_per_page']} fetches/page, {saved} articles ({results['articles_per_sec']}/s), "
+          f"peak RSS {results['peak_rss_mb']} MB", file=sys.stderr)
+    sites = {'sites': args.sites, 'pages': args.pages, 'fan_out': args.fan_out, 'paragraphs': args.paragraphs,
+             'latency': args.latency, 'jitter': args.jitter, 'error_rate': args.error_rate}
+    print(json.dumps({'benchmark': 'crawl', 'fixture': sites, 'max_pages': args.max_pages,
+                      'crawl_delay': args.crawl_delay, 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import json
+import sqlite3
+import argparse
+import tempfile
+import threading
+
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from db_writer import DatabaseWriter
+from benchmarks.fixtures import make_article_fields
+
+# Articles/sec saved by N concurrent crawl workers:
+#   direct-rollback  each worker commits every article on its own connection,
+#                    default rollback journal (how the crawler used to write)
+#   direct-wal       same, with WAL and the pragmas of database.connect_db
+#   writer           workers queue articles to one db_writer.DatabaseWriter
+#
+#   python benchmarks/bench_db_writer.py --workers 1 4 8 --articles 300
+
+def make_database(path, journal_mode):
+    database.DATABASE = path
+    with Flask(__name__).app_context():
+        database.init_db()
+        db = database.get_db()
+        db.execute(f'PRAGMA journal_mode = {journal_mode}')
+        db.execute("INSERT INTO sites (url) VALUES ('https://jornal.exemplo.com.br')")
+        db.commit()
+        database.close_db()
+
+def run_workers(workers, articles_per_worker, save_article):
+    errors = []
+    # Built up front so only the writes are timed
+    articles = [[make_article_fields(worker_index * articles_per_worker + i) for i in range(articles_per_worker)]
+                for worker_index in range(workers)]
+    def worker(worker_index):
+        try:
+            for article in articles[worker_index]:
+                save_article(worker_index, article)
+        except sqlite3.Error as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, errors
+
+def bench_direct(path, workers, articles_per_worker, tuned):
+    make_database(path, 'wal' if tuned else 'delete')
+    local = threading.local()
+    def save_article(worker_index, article):
+        if not hasattr(local, 'db'):
+            if tuned:
+                local.db = database.connect_db()
+            else:
+                local.db = sqlite3.connect(path)
+                database.register_sql_functions(local.db)
+        database.write_batch(local.db, articles=[database.article_row(1, **article)]) # One commit per article
+    return run_workers(workers, articles_per_worker, save_article)
+
+def bench_writer(path, workers, articles_per_worker):
+    make_database(path, 'wal')
+    writer = DatabaseWriter()
+    writer.start()
+    def save_article(worker_index, article):
+        writer.add_article(1, **article)
+    elapsed, errors = run_workers(workers, articles_per_worker, save_article)
+    started = time.perf_counter()
+    writer.close() # Count the time to commit what is still queued
+    return elapsed + (time.perf_counter() - started), errors
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--articles', type=int, default=300, help='Articles saved by each worker')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in args.workers:
+            for mode in ('direct-rollback', 'direct-wal', 'writer'):
+                path = os.path.join(directory, f'{mode}-{workers}.db')
+                if mode == 'writer':
+                    elapsed, errors = bench_writer(path, workers, args.articles)
+                else:
+                    elapsed, errors = bench_direct(path, workers, args.articles, tuned=mode == 'direct-wal')
+                total = workers * args.articles
+                results.append({'mode': mode, 'workers': workers, 'articles': total, 'seconds': round(elapsed, 3),
+                                'inserts_per_sec': round(total / elapsed, 1), 'errors': len(errors)})
+                print(f"workers={workers:<3} {mode:<16} {results[-1]['inserts_per_sec']:>10} inserts/sec"
+                      f"{f'  ({len(errors)} failed workers)' if errors else ''}")
+    print(json.dumps({'benchmark': 'db_writer', 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import statistics
+
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from benchmarks.fixtures import make_article_fields
+from term_matcher import get_term_matcher
+
+# database.get_articles latency on corpora of 10k-1M saved articles, for the
+# queries the search page makes: the first page, a deep page by OFFSET and by
+# cursor, a common and a rare term alone (date and relevance order), one site
+# and a date range. Like /search_articles, every query filters on the stored
+# search terms (SEARCH_TERMS) unless it names its own. Each scenario is timed
+# on the first call (total count not cached yet) and as the median of repeated
+# calls.
+#
+# Articles are spread over SITES sites; every RARE_EVERY-th one mentions
+# RARE_TERM, every one of them mentions COMMON_TERM many times, and each is
+# saved with the terms it matched, as a crawl saves it. Building a
+# corpus takes a while (about a minute per 100k articles), --db-dir keeps them
+# between runs.
+#
+#   python benchmarks/bench_get_articles.py --articles 10000 100000 1000000 --db-dir /tmp/corpora
+
+SITES = 10
+RARE_EVERY = 100
+RARE_TERM = 'privatização'
+COMMON_TERM = 'governo'
+SEARCH_TERMS = [COMMON_TERM, RARE_TERM]
+CHUNK = 5000
+
+def build_corpus(path, articles, paragraphs):
+    database.DATABASE = path
+    with Flask(__name__).app_context():
+        database.init_db()
+        db = database.get_db()
+        db.executemany('INSERT INTO sites (url) VALUES (?)',
+                       [(f'https://jornal{site}.exemplo.com.br',) for site in range(SITES)])
+        db.executemany('INSERT INTO search_terms (term) VALUES (?)', [(term,) for term in SEARCH_TERMS])
+        db.commit()
+        matcher = get_term_matcher(SEARCH_TERMS)
+        for start in range(0, articles, CHUNK):
+            rows = []
+            for index in range(start, min(start + CHUNK, articles)):
+                site = index % SITES
+                fields = make_article_fields(index, paragraphs, f'https://jornal{site}.exemplo.com.br')
+                if index % RARE_EVERY == 0:
+                    fields['content'] += f' A {RARE_TERM} foi aprovada.'
+                rows.append(database.article_row(site + 1, fields['title'], fields['url'], fields['content'],
+                                                 fields['published_date'],
+                                                 matcher.find_terms(fields['title'], fields['content'])))
+            database.write_batch(db, rows)
+        database.close_db()
+
+def time_call(repeat, **query):
+    database._clear_article_counts()
+    started = time.perf_counter()
+    result = database.get_articles(**query)
+    first_ms = (time.perf_counter() - started) * 1000
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        database.get_articles(**query)
+        timings.append((time.perf_counter() - started) * 1000)
+    return result, first_ms, statistics.median(timings)
+
+def run_scenarios(articles, per_page, repeat):
+    deep_page = max(1, articles // per_page // 2)
+    # The cursor of the page just before deep_page, so both deep scenarios return the same rows
+    previous_page = database.get_articles(SEARCH_TERMS, page=deep_page - 1, per_page=per_page) if deep_page > 1 else None
+    scenarios = {
+        'latest': {},
+        'deep_offset': {'page': deep_page},
+        'deep_cursor': {'page': deep_page, 'after': previous_page['next_cursor'] if previous_page else None},
+        'common_term_date': {'query_terms': [COMMON_TERM]},
+        'common_term_relevance': {'query_terms': [COMMON_TERM], 'order_by': 'relevance'},
+        'rare_term_date': {'query_terms': [RARE_TERM]},
+        'rare_term_relevance': {'query_terms': [RARE_TERM], 'order_by': 'relevance'},
+        'site': {'site_id': 3},
+        'date_range': {'start_date': '2024-05-10', 'end_date': '2024-05-12'}
+    }
+    results = {}
+    for name, query in scenarios.items():
+        query.setdefault('query_terms', SEARCH_TERMS)
+        result, first_ms, median_ms = time_call(repeat, per_page=per_page, **query)
+        results[name] = {'first_ms': round(first_ms, 3), 'median_ms': round(median_ms, 3),
+                         'total_results': result['total_results']}
+        print(f"  {name:<22} first {first_ms:9.3f} ms   cached {median_ms:8.3f} ms   "
+              f"({result['total_results']} results)")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--articles', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--paragraphs', type=int, default=4, help='Body size; short keeps building 1M articles practical')
+    parser.add_argument('--per-page', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--db-dir', help='Keep corpora here and reuse them on the next run')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        directory = args.db_dir or temporary_directory
+        os.makedirs(directory, exist_ok=True)
+        for articles in args.articles:
+            # Corpora built before articles carried their matched terms are not reused
+            path = os.path.join(directory, f'articles-{articles}-{args.paragraphs}p-terms.db')
+            build_seconds = None
+            if not os.path.exists(path):
+                started = time.perf_counter()
+                build_corpus(path, articles, args.paragraphs)
+                build_seconds = round(time.perf_counter() - started, 1)
+            database.DATABASE = path
+            print(f"{articles} articles ({os.path.getsize(path) / 1e6:.0f} MB)")
+            with Flask(__name__).app_context():
+                scenarios = run_scenarios(articles, args.per_page, args.repeat)
+                database.close_db()
+            results.append({'articles': articles, 'build_seconds': build_seconds, 'scenarios': scenarios})
+
+    print(json.dumps({'benchmark': 'get_articles', 'paragraphs': args.paragraphs, 'per_page': args.per_page,
+                      'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
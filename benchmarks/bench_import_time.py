@@ -0,0 +1,66 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Startup cost of a web process: a fresh interpreter imports app (Flask,
+# SQLite, init_db) and nothing else, the way every worker process starts.
+# 'web' is what a search-only process loads now; 'web+crawl' also imports the
+# crawl stack (scraper, crawl_scheduler), which app.py used to import at load
+# time and now only does on the first /start_scrape. Each import runs in its
+# own interpreter, in a temporary directory so database.db and uploads/ are
+# created there; the database is created by a warm-up run, so init_db finds it
+# in place as it would in production.
+#
+#   python benchmarks/bench_import_time.py --repeat 10
+
+PROBE = '''
+import sys, time, json, resource
+started = time.perf_counter()
+{imports}
+seconds = time.perf_counter() - started
+print(json.dumps({{'seconds': seconds, 'modules': len(sys.modules),
+                  'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                  'crawl_stack_loaded': 'newspaper' in sys.modules}}))
+'''
+
+SCENARIOS = {
+    'web': 'import app',
+    'web+crawl': 'import app, scraper, crawl_scheduler'
+}
+
+def run_probe(imports, directory):
+    environment = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    output = subprocess.run([sys.executable, '-c', PROBE.format(imports=imports)], cwd=directory, env=environment,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        run_probe(SCENARIOS['web+crawl'], directory) # Warm-up: creates the database and fills the OS file cache
+        for name, imports in SCENARIOS.items():
+            probes = [run_probe(imports, directory) for _ in range(args.repeat)]
+            results[name] = {
+                'median_ms': round(statistics.median(probe['seconds'] for probe in probes) * 1000, 1),
+                'min_ms': round(min(probe['seconds'] for probe in probes) * 1000, 1),
+                'modules': probes[-1]['modules'],
+                'rss_mb': round(statistics.median(probe['rss_mb'] for probe in probes), 1),
+                'crawl_stack_loaded': probes[-1]['crawl_stack_loaded']
+            }
+            print(f"{name:<10} import {results[name]['median_ms']:8.1f} ms (median of {args.repeat})   "
+                  f"{results[name]['modules']} modules   RSS {results[name]['rss_mb']} MB")
+
+    print(json.dumps({'benchmark': 'import_time', 'repeat': args.repeat, 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
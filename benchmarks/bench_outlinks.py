@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import json
+import argparse
+from urllib.parse import urljoin
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from newspaper import Article
+
+from scraper import extract_outlinks
+from benchmarks.fixtures import make_news_html, article_path
+
+# Link extraction cost per page:
+#   beautifulsoup  - the old path, a full html.parser BeautifulSoup tree per page
+#   lxml           - scraper.extract_outlinks parsing the HTML itself
+#   newspaper_tree - scraper.extract_outlinks on the tree newspaper3k already built
+#                    (what parse_page does), so only the XPath walk is paid
+#
+#   python benchmarks/bench_outlinks.py --pages 200 --fan-out 80
+
+def beautifulsoup_outlinks(page_url, html_content):
+    soup = BeautifulSoup(html_content, 'html.parser')
+    outlinks = []
+    seen = set()
+    for link_element in soup.find_all('a', href=True):
+        full_url = urljoin(page_url, link_element.get('href'))
+        if full_url not in seen:
+            seen.add(full_url)
+            outlinks.append(full_url)
+    return outlinks
+
+def time_per_page(func, pages, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for args in pages:
+            func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(pages)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--fan-out', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pages = [(f"https://jornal.exemplo.com.br{article_path(i)}", make_news_html(i, fan_out=args.fan_out))
+             for i in range(args.pages)]
+
+    documents = []
+    for url, html_content in pages:
+        article = Article(url, language='pt', fetch_images=False)
+        article.download(input_html=html_content)
+        article.parse()
+        documents.append((url, None, article.clean_doc))
+
+    for (url, html_content), (_, _, document) in zip(pages, documents):
+        expected = beautifulsoup_outlinks(url, html_content)
+        assert extract_outlinks(url, html_content) == expected, url
+        assert extract_outlinks(url, None, document) == expected, url
+
+    results = {
+        'beautifulsoup': time_per_page(beautifulsoup_outlinks, pages, args.repeat),
+        'lxml': time_per_page(extract_outlinks, pages, args.repeat),
+        'newspaper_tree': time_per_page(extract_outlinks, documents, args.repeat)
+    }
+    baseline = results['beautifulsoup']
+    for name, seconds in results.items():
+        print(f"{name:<15} {seconds * 1000:8.3f} ms/page  {baseline / seconds:6.1f}x")
+    print(json.dumps({
+        'benchmark': 'outlinks',
+        'pages': args.pages,
+        'fan_out': args.fan_out,
+        'ms_per_page': {name: round(seconds * 1000, 3) for name, seconds in results.items()}
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+import json
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scraper import parse_page
+from benchmarks.fixtures import make_news_html, article_path
+
+# Pages/sec of the parse/extract stage (scraper.parse_page) as the number of
+# parse processes grows. 0 processes means parsing in the calling thread,
+# which is what the crawler did before the stage was split out.
+#
+#   python benchmarks/bench_parse_pool.py --pages 400 --processes 0 1 2 4 8
+
+def run(pages, processes):
+    started = time.perf_counter()
+    if processes == 0:
+        for url, html_content in pages:
+            parse_page(url, html_content)
+    else:
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+            # Warm the workers up so process start-up is not counted
+            list(pool.map(parse_page, *zip(*pages[:processes])))
+            started = time.perf_counter()
+            list(pool.map(parse_page, *zip(*pages), chunksize=4))
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--processes', type=int, nargs='+', default=[0, 1, 2, 4])
+    args = parser.parse_args()
+
+    pages = [(f"https://jornal.exemplo.com.br{article_path(i)}", make_news_html(i)) for i in range(args.pages)]
+    results = []
+    for processes in args.processes:
+        elapsed = run(pages, processes)
+        results.append({'processes': processes, 'pages': args.pages,
+                        'seconds': round(elapsed, 3), 'pages_per_sec': round(args.pages / elapsed, 1)})
+        print(f"processes={processes:<3} {results[-1]['pages_per_sec']:>8} pages/sec")
+    print(json.dumps({'benchmark': 'parse_pool', 'cpu_count': os.cpu_count(), 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
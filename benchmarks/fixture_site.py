@@ -0,0 +1,154 @@
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import threading
+from urllib.parse import unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import make_news_html, article_path, SECTIONS
+
+# Synthetic news site served over HTTP for end-to-end crawl benchmarks.
+#
+# Every site is a ThreadingHTTPServer on its own port (so each one is a
+# separate host to the crawler's politeness layer) with:
+#   /             home page linking to the first fan_out articles
+#   /<section>/   section pages linking to that section's articles
+#   article pages (fixtures.article_path) with fan_out related links
+#   /robots.txt and /sitemap.xml listing every article
+# Responses can be delayed (latency + random jitter) and a fraction of them
+# replaced by an error status. All randomness is seeded, so two runs with the
+# same arguments serve the same pages and the same errors in the same order
+# (per connection handling order, which depends on the crawler).
+#
+# Standalone:  python benchmarks/fixture_site.py --sites 2 --pages 500 --latency 0.02
+
+ARTICLE_PATH_RE = re.compile(r'/noticia-(\d+)-')
+
+class FixtureSite:
+    def __init__(self, pages=1000, fan_out=40, paragraphs=12, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_status=500, seed=0):
+        self.pages = pages
+        self.fan_out = fan_out
+        self.paragraphs = paragraphs
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.requests_served = 0
+
+    # (delay, inject_error) for the next request
+    def _next_fault(self):
+        with self._rng_lock:
+            self.requests_served += 1
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            return delay, self._rng.random() < self.error_rate
+
+    def render(self, path, base_url):
+        if path == '/robots.txt':
+            return 'text/plain', f"User-agent: *\nAllow: /\nSitemap: {base_url}/sitemap.xml\n"
+        if path == '/sitemap.xml':
+            urls = ''.join(f"<url><loc>{base_url}{article_path(index)}</loc></url>" for index in range(self.pages))
+            return 'application/xml', ('<?xml version="1.0" encoding="UTF-8"?>'
+                                       f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>')
+        if path == '/':
+            return 'text/html', self._listing_page('Início', range(min(self.fan_out, self.pages)))
+        section = path.strip('/')
+        if section in SECTIONS:
+            return 'text/html', self._listing_page(section.title(), range(SECTIONS.index(section), self.pages, len(SECTIONS)))
+        match = ARTICLE_PATH_RE.search(path)
+        if match and int(match.group(1)) < self.pages and path == article_path(int(match.group(1))):
+            return 'text/html', make_news_html(int(match.group(1)), paragraphs=self.paragraphs, fan_out=self.fan_out,
+                                               total_pages=self.pages)
+        return None, None
+
+    def _listing_page(self, heading, indexes):
+        links = ''.join(f'<li><a href="{article_path(index)}">Notícia {index}</a></li>' for index in list(indexes)[:200])
+        sections = ''.join(f'<li><a href="/{section}/">{section.title()}</a></li>' for section in SECTIONS)
+        return (f'<!DOCTYPE html><html lang="pt-BR"><head><meta charset="utf-8"><title>{heading} | Jornal Exemplo</title>'
+                f'</head><body><nav><ul>{sections}</ul></nav><h1>{heading}</h1><ul>{links}</ul></body></html>')
+
+def _handler_for(site):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1' # Keep-alive, like real news sites
+
+        def do_GET(self):
+            delay, inject_error = site._next_fault()
+            if delay:
+                time.sleep(delay)
+            path = unquote(self.path.split('?', 1)[0])
+            # robots.txt is never faulted, so every run reads the same rules
+            if inject_error and path != '/robots.txt':
+                self._send(site.error_status, 'text/plain', 'Erro injetado')
+                return
+            content_type, body = site.render(path, f"http://{self.headers.get('Host', '')}")
+            if body is None:
+                self._send(404, 'text/plain', 'Not found')
+            else:
+                self._send(200, content_type, body)
+
+        def _send(self, status, content_type, body):
+            encoded = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+            self.send_header('Content-Length', str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def log_message(self, format, *args):
+            pass # One line per request would dominate the benchmark's output
+
+    return FixtureHandler
+
+# Starts one server per site on consecutive ports from first_port (0 picks free
+# ports) in daemon threads. Returns the servers; their base URLs are
+# f"http://127.0.0.1:{server.server_address[1]}".
+def start_sites(count=1, first_port=0, **site_options):
+    servers = []
+    for number in range(count):
+        site = FixtureSite(**dict(site_options, seed=site_options.get('seed', 0) + number))
+        server = ThreadingHTTPServer(('127.0.0.1', first_port + number if first_port else 0), _handler_for(site))
+        server.daemon_threads = True
+        server.site = site
+        threading.Thread(target=server.serve_forever, name=f'fixture-site-{number + 1}', daemon=True).start()
+        servers.append(server)
+    return servers
+
+def add_site_arguments(parser):
+    parser.add_argument('--sites', type=int, default=2, help='Sites (one port each)')
+    parser.add_argument('--pages', type=int, default=500, help='Articles per site')
+    parser.add_argument('--fan-out', type=int, default=40, help='Related links per article')
+    parser.add_argument('--paragraphs', type=int, default=12, help='Article size in paragraphs (~5 sentences each)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random extra seconds, up to this much')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of responses replaced by --error-status')
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+
+def site_options(args):
+    return {'pages': args.pages, 'fan_out': args.fan_out, 'paragraphs': args.paragraphs, 'latency': args.latency,
+            'jitter': args.jitter, 'error_rate': args.error_rate, 'error_status': args.error_status, 'seed': args.seed}
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_site_arguments(parser)
+    parser.add_argument('--port', type=int, default=8800, help='Port of the first site')
+    args = parser.parse_args()
+
+    servers = start_sites(args.sites, args.port, **site_options(args))
+    for server in servers:
+        print(f"http://127.0.0.1:{server.server_address[1]}/", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
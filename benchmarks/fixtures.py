@@ -0,0 +1,62 @@
+import random
+
+# Synthetic Portuguese news pages shaped like the sites we crawl: header and
+# footer navigation, a related-articles block and a long article body.
+
+WORDS = ('governo', 'prefeitura', 'economia', 'eleição', 'município', 'saúde', 'educação',
+         'segurança', 'orçamento', 'secretaria', 'população', 'projeto', 'câmara', 'deputado',
+         'investimento', 'mercado', 'tribunal', 'polícia', 'estado', 'regional', 'Arsal', 'obras')
+
+SECTIONS = ('politica', 'economia', 'cidades', 'esportes', 'cultura', 'saude', 'educacao')
+
+def make_paragraph(rng, sentences=5):
+    return ' '.join(
+        ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 18))).capitalize() + '.'
+        for _ in range(sentences)
+    )
+
+def article_path(index):
+    section = SECTIONS[index % len(SECTIONS)]
+    return f"/{section}/2024/05/{(index % 28) + 1:02d}/noticia-{index}-{WORDS[index % len(WORDS)]}.html"
+
+def make_news_html(index, paragraphs=12, fan_out=40, total_pages=1000, seed=None):
+    rng = random.Random(index if seed is None else seed)
+    nav_links = ''.join(f'<li><a href="/{section}/">{section.title()}</a></li>' for section in SECTIONS)
+    related_links = ''.join(
+        f'<li><a href="{article_path(rng.randrange(total_pages))}">{make_paragraph(rng, 1)[:60]}</a></li>'
+        for _ in range(fan_out)
+    )
+    body = ''.join(f'<p>{make_paragraph(rng)}</p>' for _ in range(paragraphs))
+    title = make_paragraph(rng, 1)[:90]
+    return f'''<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>{title} | Jornal Exemplo</title>
+<meta property="article:published_time" content="2024-05-{(index % 28) + 1:02d}T10:30:00-03:00">
+<link rel="stylesheet" href="/static/site.css">
+<script src="/static/site.js"></script>
+</head>
+<body>
+<header><nav><ul><li><a href="/">Início</a></li>{nav_links}</ul></nav></header>
+<main>
+<article>
+<h1>{title}</h1>
+<p class="byline">Por Redação <a href="/author/redacao/">Redação</a></p>
+<div class="article-body">{body}</div>
+</article>
+<aside><h2>Leia também</h2><ul>{related_links}</ul></aside>
+</main>
+<footer><a href="/sobre/">Sobre</a> <a href="/contato/">Contato</a> <a href="#topo">Topo</a></footer>
+</body>
+</html>'''
+
+# Fields of an extracted article as stored in the articles table
+def make_article_fields(index, paragraphs=12, base_url='https://jornal.exemplo.com.br'):
+    rng = random.Random(index)
+    return {
+        'title': make_paragraph(rng, 1)[:90],
+        'url': f"{base_url}{article_path(index)}",
+        'content': '\n\n'.join(make_paragraph(rng) for _ in range(paragraphs)),
+        'published_date': f"2024-05-{(index % 28) + 1:02d}T10:30:00-03:00"
+    }
@@ -0,0 +1,95 @@
+import threading
+import zlib
+from collections import Counter
+
+from config import Config
+
+# Compressed storage of article bodies (the article_bodies table).
+#
+# Listings only read the short articles.snippet; the full text is stored as
+# raw deflate and decompressed only when an article is opened, or when FTS5
+# needs it (through the article_body() SQL function that database.connect_db
+# registers). Bodies are compressed against a preset dictionary (zlib's zdict)
+# trained from saved articles: a single news body is too short for deflate to
+# learn the language's frequent word pairs on its own, the dictionary hands
+# them over up front. Dictionaries are kept in compression_dictionaries and
+# never changed, each body records the one it was compressed with.
+
+DICTIONARY_SIZE = 32 * 1024 # Deflate's window; a bigger zdict would not be used
+DICTIONARY_NGRAM = 2 # Word pairs: measured slightly ahead of single words and of 3/4-grams on our articles
+WINDOW_BITS = -15 # Raw deflate, no zlib header/checksum per body
+
+_dictionaries = {} # dictionary id -> bytes
+_dictionaries_lock = threading.Lock()
+_dictionary_source = None # Returns the stored (id, dictionary) rows; see set_dictionary_source
+current_dictionary_id = None # Used for new bodies; None compresses without a dictionary
+dictionaries_loaded = False
+
+class MissingDictionaryError(LookupError):
+    pass
+
+# Where to reload the dictionaries from when a body names one not loaded yet
+# (one trained after this process loaded them, by another process or thread)
+def set_dictionary_source(fetch_rows):
+    global _dictionary_source
+    _dictionary_source = fetch_rows
+
+def load_dictionaries(rows):
+    global current_dictionary_id, dictionaries_loaded
+    with _dictionaries_lock:
+        for dictionary_id, dictionary in rows:
+            _dictionaries[dictionary_id] = bytes(dictionary)
+        if _dictionaries:
+            current_dictionary_id = max(_dictionaries)
+        dictionaries_loaded = True
+
+def _get_dictionary(dictionary_id):
+    dictionary = _dictionaries.get(dictionary_id)
+    if dictionary is None and _dictionary_source is not None:
+        load_dictionaries(_dictionary_source())
+        dictionary = _dictionaries.get(dictionary_id)
+    if dictionary is None:
+        raise MissingDictionaryError(f'compression dictionary {dictionary_id} is not in compression_dictionaries')
+    return dictionary
+
+def compress_body(text):
+    dictionary_id = current_dictionary_id
+    options = {'zdict': _dictionaries[dictionary_id]} if dictionary_id is not None else {}
+    compressor = zlib.compressobj(Config.BODY_COMPRESSION_LEVEL, zlib.DEFLATED, WINDOW_BITS, **options)
+    return dictionary_id, compressor.compress(text.encode('utf-8')) + compressor.flush()
+
+def decompress_body(body, dictionary_id=None):
+    if body is None:
+        return None
+    options = {'zdict': _get_dictionary(dictionary_id)} if dictionary_id is not None else {}
+    decompressor = zlib.decompressobj(WINDOW_BITS, **options)
+    return (decompressor.decompress(body) + decompressor.flush()).decode('utf-8')
+
+# What the listing shows instead of the body
+def make_snippet(text, length=None):
+    length = length or Config.ARTICLE_SNIPPET_LENGTH
+    text = ' '.join(text.split())
+    if len(text) <= length:
+        return text
+    return text[:length - 3].rstrip() + '...'
+
+# Preset dictionary from sample bodies: the word pairs found in the most
+# samples, weighted by length. The best ones go last, where deflate reaches
+# them with the shortest distances.
+def train_dictionary(samples, size=DICTIONARY_SIZE):
+    counts = Counter()
+    for text in samples:
+        words = text.split()
+        counts.update({' '.join(words[i:i + DICTIONARY_NGRAM]) for i in range(len(words) - DICTIONARY_NGRAM + 1)})
+    min_samples = max(2, len(samples) // 100)
+    phrases = sorted((phrase for phrase, found_in in counts.items() if found_in >= min_samples),
+                     key=lambda phrase: counts[phrase] * len(phrase), reverse=True)
+
+    chosen, used = [], 0
+    for phrase in phrases:
+        encoded = (phrase + ' ').encode('utf-8')
+        if used + len(encoded) > size:
+            break
+        chosen.append(encoded)
+        used += len(encoded)
+    return b''.join(reversed(chosen))
@@ -2,4 +2,84 @@ import os
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'a_very_secret_key_that_should_be_changed'
-    DATABASE = 'database.db'
\ No newline at end of file
+    DATABASE = 'database.db'
+
+    # HTTP client (fetcher.py)
+    FETCH_TIMEOUT = int(os.environ.get('FETCH_TIMEOUT', 15)) # Seconds
+    FETCH_POOL_CONNECTIONS = int(os.environ.get('FETCH_POOL_CONNECTIONS', 100)) # Hosts with a cached connection pool
+    FETCH_POOL_MAXSIZE = int(os.environ.get('FETCH_POOL_MAXSIZE', 10)) # Keep-alive connections per host
+    FETCH_MAX_RETRIES = int(os.environ.get('FETCH_MAX_RETRIES', 3)) # Retries on 5xx and connection errors
+    FETCH_BACKOFF_FACTOR = float(os.environ.get('FETCH_BACKOFF_FACTOR', 0.5)) # Sleeps 0.5s, 1s, 2s... between retries
+    FETCH_MAX_RESPONSE_BYTES = int(os.environ.get('FETCH_MAX_RESPONSE_BYTES', 10 * 1024 * 1024)) # 10 MB
+    FETCH_THROTTLED_RETRIES = int(os.environ.get('FETCH_THROTTLED_RETRIES', 5)) # Times a page answered with 429/503 goes back to the frontier
+
+    # Crawl scheduler (crawl_scheduler.py)
+    CRAWL_ENGINE = os.environ.get('CRAWL_ENGINE', 'threaded') # 'threaded' (worker pool) or 'async' (asyncio + aiohttp)
+    CRAWL_WORKERS = int(os.environ.get('CRAWL_WORKERS', 8)) # Fixed number of crawl worker threads
+    FRONTIER_PRIORITY = os.environ.get('FRONTIER_PRIORITY', 'article') # Key of frontier.PRIORITY_FUNCTIONS
+    FRONTIER_MAX_ATTEMPTS = int(os.environ.get('FRONTIER_MAX_ATTEMPTS', 5)) # Failed fetches of a URL, over all runs, before it is given up
+
+    # Sitemap / RSS / Atom discovery (discovery.py)
+    DISCOVERY_ENABLED = os.environ.get('DISCOVERY_ENABLED', '1') == '1'
+    DISCOVERY_MAX_URLS = int(os.environ.get('DISCOVERY_MAX_URLS', 500)) # Best discovered URLs queued per site and run
+    DISCOVERY_MAX_SITEMAPS = int(os.environ.get('DISCOVERY_MAX_SITEMAPS', 25)) # Sitemap/feed documents read per site and run
+    DISCOVERY_MAX_AGE_DAYS = int(os.environ.get('DISCOVERY_MAX_AGE_DAYS', 30)) # Ignore entries older than this (0 = no limit)
+    SITEMAP_MAX_BYTES = int(os.environ.get('SITEMAP_MAX_BYTES', 50 * 1024 * 1024)) # Sitemaps protocol limit (uncompressed)
+
+    # Batched single-writer for crawl results (db_writer.py)
+    DB_WRITER_BATCH_SIZE = int(os.environ.get('DB_WRITER_BATCH_SIZE', 500)) # Operations per transaction at most
+    DB_WRITER_FLUSH_INTERVAL = float(os.environ.get('DB_WRITER_FLUSH_INTERVAL', 0.5)) # Seconds a batch may wait to fill up
+
+    # Seconds between DB checkpoints of a site's progress (run_state.py); the
+    # in-memory counters behind /scraper_status are always current
+    RUN_STATE_CHECKPOINT_INTERVAL = float(os.environ.get('RUN_STATE_CHECKPOINT_INTERVAL', 5))
+
+    # Max seconds between 'status' events of /scraper_events
+    SSE_STATUS_INTERVAL = float(os.environ.get('SSE_STATUS_INTERVAL', 1))
+
+    # robots.txt cache (robots.py), persisted in the robots_cache table
+    ROBOTS_CACHE_TTL = int(os.environ.get('ROBOTS_CACHE_TTL', 24 * 3600)) # Seconds; RFC 9309 suggests at most 24h
+    ROBOTS_ERROR_TTL = int(os.environ.get('ROBOTS_ERROR_TTL', 600)) # Seconds before retrying an unreachable/5xx robots.txt
+
+    # Search term matching (term_matcher.py): case/accent-insensitive; with whole
+    # words on, "rio" no longer matches "Riozinho"
+    TERM_MATCH_WHOLE_WORDS = os.environ.get('TERM_MATCH_WHOLE_WORDS', '0') == '1'
+
+    # Near-duplicate articles (dedup.py). DEDUP_POLICY: 'link' saves a duplicate
+    # pointing at the first copy (articles.duplicate_of), 'skip' does not save
+    # it, 'keep' saves it as an independent article
+    DEDUP_POLICY = os.environ.get('DEDUP_POLICY', 'link')
+    DEDUP_MAX_HAMMING = int(os.environ.get('DEDUP_MAX_HAMMING', 5)) # Max differing SimHash bits
+    DEDUP_BANDS = int(os.environ.get('DEDUP_BANDS', 6)) # LSH bands; must be > DEDUP_MAX_HAMMING to catch every pair
+
+    # Articles that matched no term are kept as candidates, and new search terms
+    # are matched against them and the saved articles in the background
+    # (term_backfill.py)
+    CANDIDATE_STORE_ENABLED = os.environ.get('CANDIDATE_STORE_ENABLED', '1') == '1'
+    TERM_BACKFILL_BATCH_SIZE = int(os.environ.get('TERM_BACKFILL_BATCH_SIZE', 500)) # Articles read per query
+
+    # Article body storage (body_store.py)
+    ARTICLE_SNIPPET_LENGTH = int(os.environ.get('ARTICLE_SNIPPET_LENGTH', 300)) # Characters shown in listings
+    BODY_COMPRESSION_LEVEL = int(os.environ.get('BODY_COMPRESSION_LEVEL', 9)) # zlib level, 1-9
+    BODY_DICTIONARY_MIN_ARTICLES = int(os.environ.get('BODY_DICTIONARY_MIN_ARTICLES', 100)) # Saved articles needed to train the dictionary
+    BODY_DICTIONARY_SAMPLE_SIZE = int(os.environ.get('BODY_DICTIONARY_SAMPLE_SIZE', 2000)) # Articles sampled to train it
+
+    # Archive of fetched pages (archive.py), replayed by the 'reprocess' scan mode
+    ARCHIVE_ENABLED = os.environ.get('ARCHIVE_ENABLED', '1') == '1'
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'archive')
+    ARCHIVE_SEGMENT_MAX_BYTES = int(os.environ.get('ARCHIVE_SEGMENT_MAX_BYTES', 256 * 1024 * 1024)) # Compressed size before starting a new segment
+    ARCHIVE_COMPRESSION_LEVEL = int(os.environ.get('ARCHIVE_COMPRESSION_LEVEL', 6)) # gzip level, 1-9
+
+    # Run reports and profiling (metrics.py, profiling.py). Each finished run
+    # writes its JSON report here ('' disables the files; /metrics/run still works)
+    RUN_REPORTS_DIR = os.environ.get('RUN_REPORTS_DIR', 'run_reports')
+    CRAWL_PROFILER = os.environ.get('CRAWL_PROFILER', '') # '', 'cprofile' or 'sample'; /start_scrape can override per run
+    CRAWL_PROFILE_INTERVAL = float(os.environ.get('CRAWL_PROFILE_INTERVAL', 0.01)) # Seconds between stack samples
+
+    # Parse/extract stage (scraper.parse_page). 0 parses in the crawling thread;
+    # the default leaves one core for the crawl threads and Flask.
+    PARSE_PROCESSES = int(os.environ.get('PARSE_PROCESSES', min(4, (os.cpu_count() or 1) - 1)))
+
+    # Asyncio crawl engine (scraper.scrape_sites_async)
+    ASYNC_MAX_CONCURRENCY = int(os.environ.get('ASYNC_MAX_CONCURRENCY', 500)) # Fetches in flight at once
+    ASYNC_EXECUTOR_THREADS = int(os.environ.get('ASYNC_EXECUTOR_THREADS', 4)) # Threads for parsing and DB writes
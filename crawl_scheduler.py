@@ -0,0 +1,202 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+from config import Config
+from database import close_db
+from scraper import SiteCrawl, host_rate_limiter, scrape_sites_async, finish_run
+from run_state import CrawlRun
+
+# Fixed-size pool of crawl workers sharing one work queue of sites.
+#
+# Each queue entry is the SiteCrawl of one site, ordered by the time its host
+# may next be requested (see politeness.HostRateLimiter). A worker takes the
+# first site whose host is ready, crawls exactly one page of it and puts it
+# back, so N workers round-robin over any number of sites, only one worker
+# touches a given site at a time, and nobody sleeps on a host while another
+# host has work. Progress is still reported per site through
+# update_scraper_progress_for_site (inside SiteCrawl).
+class CrawlScheduler:
+    def __init__(self, app, num_workers=None):
+        self.app = app
+        self.num_workers = num_workers or Config.CRAWL_WORKERS
+        self._condition = threading.Condition()
+        self._ready_queue = [] # Heap of (ready_time, sequence, SiteCrawl)
+        self._sequence = itertools.count()
+        self._workers = []
+        self._active_workers = 0
+        self._sites_pending = 0
+        self._closed = False
+        self._closing_worker = None
+        self.run = None
+
+    # Must be called from inside an app context (e.g. the /start_scrape request),
+    # since SiteCrawl.start() writes the initial progress row of each site.
+    # run is the run_state.CrawlRun to report to (a new one if not given).
+    def start(self, sites, search_terms, mode='default', run=None):
+        self.run = run or CrawlRun(mode)
+        for site_info in sites:
+            crawl = SiteCrawl(site_info['id'], site_info['url'], search_terms, mode=mode, run=self.run)
+            crawl.start()
+            self._sites_pending += 1
+            self._push(crawl, 0.0)
+
+        for i in range(min(self.num_workers, self._sites_pending)):
+            worker = threading.Thread(target=self._worker_loop, name=f'crawl-worker-{i + 1}', daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def is_running(self):
+        return any(worker.is_alive() for worker in self._workers)
+
+    # Shown by /scraper_status, with the same meaning for both engines:
+    #   workers        - pages that can be in progress at once
+    #   active_workers - pages in progress right now
+    #   queue_depth    - unfinished sites waiting for their turn (no page in progress)
+    #   sites_pending  - unfinished sites
+    def get_stats(self):
+        with self._condition:
+            now = time.monotonic()
+            return {
+                'workers': len(self._workers),
+                'active_workers': self._active_workers,
+                'queue_depth': len(self._ready_queue),
+                'ready_sites': sum(1 for ready_time, _, _ in self._ready_queue if ready_time <= now),
+                'sites_pending': self._sites_pending
+            }
+
+    def _push(self, crawl, ready_time):
+        with self._condition:
+            heapq.heappush(self._ready_queue, (ready_time, next(self._sequence), crawl))
+            self._condition.notify()
+
+    # Blocks until some site's host is free, reserves that host and returns the
+    # site. Returns None once every site is done.
+    def _next_ready_crawl(self):
+        with self._condition:
+            while True:
+                if self._closed:
+                    return None
+                if not self._ready_queue:
+                    self._condition.wait()
+                    continue
+
+                ready_time, _, crawl = self._ready_queue[0]
+                now = time.monotonic()
+                if ready_time > now:
+                    # Nothing is ready yet; idle until the earliest host frees up
+                    # (or until another worker pushes something back)
+                    self._condition.wait(ready_time - now)
+                    continue
+
+                acquired, next_allowed = host_rate_limiter.try_acquire(crawl.host)
+                if not acquired:
+                    # Another site on the same host used the slot; re-key and look again
+                    heapq.heapreplace(self._ready_queue, (next_allowed, next(self._sequence), crawl))
+                    continue
+
+                heapq.heappop(self._ready_queue)
+                self._active_workers += 1
+                return crawl
+
+    def _site_done(self, crawl):
+        try:
+            crawl.finish()
+        finally:
+            with self._condition:
+                self._sites_pending -= 1
+                if self._sites_pending == 0:
+                    # Wake every worker up so it can exit; this one ends the run
+                    self._closed = True
+                    self._closing_worker = threading.current_thread()
+                    self._condition.notify_all()
+
+    def _worker_loop(self):
+        with self.app.app_context(): # One DB connection per worker for the whole run
+            try:
+                with self.run.profile_thread():
+                    self._crawl_until_closed()
+                if self._closing_worker is threading.current_thread():
+                    # The other workers are on their way out; wait for them so
+                    # their profiles are merged before the run's is saved
+                    for worker in self._workers:
+                        if worker is not threading.current_thread():
+                            worker.join()
+                    finish_run(self.run)
+            finally:
+                close_db()
+
+    def _crawl_until_closed(self):
+        while True:
+            crawl = self._next_ready_crawl()
+            if crawl is None:
+                break
+
+            try:
+                # Check for the run's stop signal (set by /stop_scrape)
+                if crawl.stop_requested():
+                    print(f"Scraper for {crawl.base_url} received global stop signal. Stopping.")
+                    self._site_done(crawl)
+                elif not crawl.has_work():
+                    self._site_done(crawl)
+                else:
+                    crawl.crawl_next_page()
+                    self._push(crawl, host_rate_limiter.next_allowed_time(crawl.host))
+            except Exception as e:
+                print(f"Error crawling {crawl.base_url}: {e}")
+                self._site_done(crawl)
+            finally:
+                with self._condition:
+                    self._active_workers -= 1
+
+# Same interface as CrawlScheduler, backed by the asyncio engine: a single
+# thread runs the event loop for every site (see scraper.scrape_sites_async).
+class AsyncCrawlScheduler:
+    def __init__(self, app, max_concurrency=None):
+        self.app = app
+        self.max_concurrency = max_concurrency or Config.ASYNC_MAX_CONCURRENCY
+        self._stats = {'in_flight': 0, 'sites_pending': 0}
+        self._thread = None
+        self.run = None
+
+    # Must be called from inside an app context, like CrawlScheduler.start
+    def start(self, sites, search_terms, mode='default', run=None):
+        self.run = run or CrawlRun(mode)
+        crawls = []
+        for site_info in sites:
+            crawl = SiteCrawl(site_info['id'], site_info['url'], search_terms, mode=mode, run=self.run)
+            crawl.start()
+            crawls.append(crawl)
+        self._stats['sites_pending'] = len(crawls)
+
+        self._thread = threading.Thread(target=self._run, args=(crawls,), name='crawl-event-loop', daemon=True)
+        self._thread.start()
+
+    def _run(self, crawls):
+        try:
+            with self.run.profile_thread():
+                asyncio.run(scrape_sites_async(self.app, crawls, self.max_concurrency, self._stats))
+        except Exception as e:
+            print(f"Async crawl engine failed: {e}")
+        finally:
+            with self.app.app_context():
+                try:
+                    finish_run(self.run)
+                finally:
+                    close_db()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # Keys as in CrawlScheduler.get_stats; a page is in progress while its
+    # request is in flight, of which there are at most max_concurrency
+    def get_stats(self):
+        in_flight, sites_pending = self._stats['in_flight'], self._stats['sites_pending']
+        return {
+            'workers': self.max_concurrency,
+            'active_workers': in_flight,
+            'queue_depth': max(sites_pending - in_flight, 0),
+            'sites_pending': sites_pending
+        }
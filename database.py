@@ -1,14 +1,64 @@
+import base64
+import json
+import re
 import sqlite3
+import threading
 from flask import g
 from datetime import datetime, timedelta
 
+import body_store
+from archive import response_archive
+from body_store import compress_body, decompress_body, make_snippet, train_dictionary
+from config import Config
+from term_matcher import get_term_matcher
+
 DATABASE = 'database.db'
 
+WORD_CHARACTER_RE = re.compile(r'\w')
+
+# Per-connection settings. With WAL (enabled once in init_db) readers never
+# block the writer, so synchronous=NORMAL is still crash-safe; busy_timeout
+# makes concurrent writers wait for the lock instead of failing with
+# "database is locked".
+CONNECTION_PRAGMAS = (
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA busy_timeout = 10000',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -16000' # KiB, i.e. 16 MB of page cache
+)
+
+# SQL functions the schema relies on (the full-text index reads article bodies
+# through article_body)
+def register_sql_functions(db):
+    db.create_function('article_body', 2, decompress_body, deterministic=True)
+
+def connect_db():
+    db = sqlite3.connect(DATABASE)
+    db.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        db.execute(pragma)
+    register_sql_functions(db)
+    if not body_store.dictionaries_loaded:
+        try:
+            body_store.load_dictionaries(db.execute('SELECT id, dictionary FROM compression_dictionaries').fetchall())
+        except sqlite3.OperationalError:
+            pass # Not created yet; init_db loads them
+    return db
+
+# Reloads for body_store when a body names a dictionary it has not loaded
+def _stored_dictionaries():
+    db = sqlite3.connect(DATABASE)
+    try:
+        return db.execute('SELECT id, dictionary FROM compression_dictionaries').fetchall()
+    finally:
+        db.close()
+
+body_store.set_dictionary_source(_stored_dictionaries)
+
 def get_db():
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
+        db = g._database = connect_db()
     return db
 
 def close_db(e=None):
@@ -16,9 +66,220 @@ def close_db(e=None):
     if db is not None:
         db.close()
 
+def _add_column_if_missing(cursor, table, column, definition):
+    existing_columns = {row[1] for row in cursor.execute(f'PRAGMA table_info({table})').fetchall()}
+    if column not in existing_columns:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+# Brings tables created by older versions of init_db up to date
+def _migrate_db(cursor):
+    _add_column_if_missing(cursor, 'crawl_frontier', 'lastmod', 'TEXT')
+    _add_column_if_missing(cursor, 'crawl_frontier', 'attempts', 'INTEGER NOT NULL DEFAULT 0')
+    _add_column_if_missing(cursor, 'articles', 'matched_terms', 'TEXT')
+    _add_column_if_missing(cursor, 'articles', 'simhash', 'INTEGER')
+    _add_column_if_missing(cursor, 'articles', 'duplicate_of', 'INTEGER')
+    _add_column_if_missing(cursor, 'articles', 'snippet', 'TEXT')
+    _add_column_if_missing(cursor, 'search_terms', 'backfill_pending', 'INTEGER NOT NULL DEFAULT 0')
+
+# Compression dictionary for new article bodies (see body_store.py): the
+# stored ones are loaded, or one is trained once there are enough articles to
+# sample from
+def _ensure_body_dictionary(cursor):
+    rows = cursor.execute('SELECT id, dictionary FROM compression_dictionaries').fetchall()
+    body_store.load_dictionaries(rows)
+    if rows:
+        return
+
+    sample_size = Config.BODY_DICTIONARY_SAMPLE_SIZE
+    # Bodies not moved to article_bodies yet count too
+    samples = [row[0] for row in cursor.execute(
+        "SELECT content FROM articles WHERE content <> '' ORDER BY RANDOM() LIMIT ?", (sample_size,))]
+    samples += [decompress_body(row[0], row[1]) for row in cursor.execute(
+        'SELECT body, dictionary_id FROM article_bodies ORDER BY RANDOM() LIMIT ?', (sample_size - len(samples),))]
+    if len(samples) < Config.BODY_DICTIONARY_MIN_ARTICLES:
+        return
+    dictionary = train_dictionary(samples)
+    cursor.execute('INSERT INTO compression_dictionaries (dictionary) VALUES (?)', (dictionary,))
+    body_store.load_dictionaries([(cursor.lastrowid, dictionary)])
+    print(f"Trained a {len(dictionary)} byte compression dictionary from {len(samples)} articles")
+
+# Trains the dictionary once there are enough articles, for databases that
+# started with too few (the DB writer calls it as articles come in)
+def train_body_dictionary(db):
+    cursor = db.cursor()
+    try:
+        _ensure_body_dictionary(cursor)
+        db.commit()
+    finally:
+        cursor.close()
+
+# Databases from before article_bodies kept every body as plain text in
+# articles.content: compress them into article_bodies and leave '' behind.
+# Returns the number of articles moved.
+def _move_bodies_out(cursor):
+    moved, last_id = 0, 0
+    while True:
+        rows = cursor.execute("SELECT id, content FROM articles WHERE content <> '' AND id > ? ORDER BY id LIMIT 1000",
+                              (last_id,)).fetchall()
+        if not rows:
+            return moved
+        bodies = [(row[0],) + compress_body(row[1]) for row in rows]
+        cursor.executemany('INSERT OR REPLACE INTO article_bodies (article_id, dictionary_id, body) VALUES (?, ?, ?)', bodies)
+        cursor.executemany("UPDATE articles SET content = '', snippet = ? WHERE id = ?",
+                           [(make_snippet(row[1]), row[0]) for row in rows])
+        moved += len(rows)
+        last_id = rows[-1][0]
+
+# The first version of the full-text index read articles.content directly, a
+# later one indexed trigrams of the folded text, seven times the size of the
+# compressed bodies
+def _drop_legacy_fulltext_index(cursor):
+    row = cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'articles_fts'").fetchone()
+    if row and "content='articles'" in row[0]:
+        for trigger in ('articles_fts_insert', 'articles_fts_delete', 'articles_fts_update'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        cursor.execute('DROP TABLE articles_fts')
+    elif row and 'trigram' in row[0]:
+        for trigger in ('article_bodies_fts_insert', 'article_bodies_fts_delete', 'article_bodies_fts_update', 'articles_fts_title'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        cursor.execute('DROP VIEW IF EXISTS article_texts')
+        cursor.execute('DROP TABLE articles_fts')
+
+# Full-text index over article titles and bodies for get_articles. It is an
+# external-content FTS5 table (the text is stored only once, compressed in
+# article_bodies) reading through the article_texts view and kept in sync by
+# triggers; when it is first created on an existing database.db the articles
+# already saved are indexed with a 'rebuild'.
+#
+# It only ranks the 'relevance' ordering: which articles a term lists comes
+# from article_terms, i.e. the crawl's own TermMatcher. Whole words, with case
+# and accents folded by unicode61, are enough for bm25 and keep the index
+# close to the size of the compressed bodies.
+#
+# A saved article is an articles row followed by its article_bodies row, so
+# articles enter the index when their body does. Title changes re-index the
+# article; deleting an article deletes its body first, while the title the
+# index needs for the 'delete' is still there.
+def _create_fulltext_index(cursor):
+    index_exists = cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'articles_fts'").fetchone()
+    cursor.execute('''
+        CREATE VIEW IF NOT EXISTS article_texts AS
+            SELECT a.id AS id, a.title AS title, article_body(b.body, b.dictionary_id) AS content
+            FROM articles a JOIN article_bodies b ON b.article_id = a.id;
+    ''')
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+            title, content, content='article_texts', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS article_bodies_fts_insert AFTER INSERT ON article_bodies BEGIN
+            INSERT INTO articles_fts (rowid, title, content)
+                SELECT new.article_id, title, article_body(new.body, new.dictionary_id) FROM articles WHERE id = new.article_id;
+        END;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS article_bodies_fts_delete AFTER DELETE ON article_bodies BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, content)
+                SELECT 'delete', old.article_id, title, article_body(old.body, old.dictionary_id) FROM articles WHERE id = old.article_id;
+        END;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS article_bodies_fts_update AFTER UPDATE ON article_bodies BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, content)
+                SELECT 'delete', old.article_id, title, article_body(old.body, old.dictionary_id) FROM articles WHERE id = old.article_id;
+            INSERT INTO articles_fts (rowid, title, content)
+                SELECT new.article_id, title, article_body(new.body, new.dictionary_id) FROM articles WHERE id = new.article_id;
+        END;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS articles_fts_title AFTER UPDATE OF title ON articles WHEN old.title IS NOT new.title BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, content)
+                SELECT 'delete', old.id, old.title, article_body(body, dictionary_id) FROM article_bodies WHERE article_id = old.id;
+            INSERT INTO articles_fts (rowid, title, content)
+                SELECT new.id, new.title, article_body(body, dictionary_id) FROM article_bodies WHERE article_id = new.id;
+        END;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS articles_delete_body BEFORE DELETE ON articles BEGIN
+            DELETE FROM article_bodies WHERE article_id = old.id;
+        END;
+    ''')
+    if not index_exists:
+        cursor.execute("INSERT INTO articles_fts (articles_fts) VALUES ('rebuild')")
+
+# Which search terms each article matched, one row per (article, term), read
+# from articles.matched_terms and kept in sync by triggers. get_articles
+# filters on it with an EXISTS probe by primary key, so a term-filtered listing
+# is still read in order off idx_articles_published instead of collecting
+# every full-text match and sorting it. When the table is first created the
+# articles already saved are copied in.
+def _create_article_terms(cursor):
+    table_exists = cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'article_terms'").fetchone()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS article_terms (
+            article_id INTEGER NOT NULL,
+            term TEXT NOT NULL,
+            PRIMARY KEY (article_id, term)
+        ) WITHOUT ROWID;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS article_terms_insert AFTER INSERT ON articles WHEN new.matched_terms IS NOT NULL BEGIN
+            INSERT OR IGNORE INTO article_terms (article_id, term) SELECT new.id, value FROM json_each(new.matched_terms);
+        END;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS article_terms_update AFTER UPDATE OF matched_terms ON articles
+        WHEN old.matched_terms IS NOT new.matched_terms BEGIN
+            DELETE FROM article_terms WHERE article_id = old.id;
+            INSERT OR IGNORE INTO article_terms (article_id, term) SELECT new.id, value FROM json_each(new.matched_terms);
+        END;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS article_terms_delete AFTER DELETE ON articles BEGIN
+            DELETE FROM article_terms WHERE article_id = old.id;
+        END;
+    ''')
+    if not table_exists:
+        cursor.execute('''
+            INSERT OR IGNORE INTO article_terms (article_id, term)
+                SELECT a.id, j.value FROM articles a, json_each(a.matched_terms) j WHERE a.matched_terms IS NOT NULL
+        ''')
+
+# Articles saved before matched_terms existed have it NULL, and so no
+# article_terms rows: match them once against the current search terms, the
+# way term_backfill.py does for a new term. Returns the number of articles matched.
+def _match_unmatched_articles(cursor):
+    terms = [row[0] for row in cursor.execute('SELECT term FROM search_terms ORDER BY id')]
+    if not terms:
+        return 0 # Left NULL; the backfill of the first term added matches them
+    matcher = get_term_matcher(terms)
+    matched, last_id = 0, 0
+    while True:
+        rows = cursor.execute('''
+            SELECT a.id, a.title, b.dictionary_id, b.body FROM articles a JOIN article_bodies b ON b.article_id = a.id
+            WHERE a.matched_terms IS NULL AND a.id > ? ORDER BY a.id LIMIT 1000
+        ''', (last_id,)).fetchall()
+        if not rows:
+            return matched
+        cursor.executemany('UPDATE articles SET matched_terms = ? WHERE id = ?',
+                           [(json.dumps(matcher.find_terms(row[1], decompress_body(row[3], row[2]))), row[0]) for row in rows])
+        matched += len(rows)
+        last_id = rows[-1][0]
+
+# FTS5 query matching any of the terms, each as a quoted phrase (so words like
+# OR/NOT and punctuation in a term are taken literally) whose last word may be
+# a prefix ("Transporte" ranks "Transportes" too). Terms without a single word
+# character would be empty phrases and are left out.
+def _fulltext_query(query_terms):
+    phrases = ['"' + term.replace('"', '""') + '"*' for term in query_terms if WORD_CHARACTER_RE.search(term)]
+    return ' OR '.join(phrases)
+
 def init_db():
     with get_db() as db:
         cursor = db.cursor()
+        cursor.execute('PRAGMA journal_mode = WAL') # Persistent: stored in the database file
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS sites (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -28,7 +289,8 @@ def init_db():
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS search_terms (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                term TEXT NOT NULL UNIQUE
+                term TEXT NOT NULL UNIQUE,
+                backfill_pending INTEGER NOT NULL DEFAULT 0 -- 1 until matched against stored articles (see term_backfill.py)
             );
         ''')
         cursor.execute('''
@@ -37,9 +299,13 @@ def init_db():
                 site_id INTEGER NOT NULL,
                 title TEXT NOT NULL,
                 url TEXT NOT NULL UNIQUE,
-                content TEXT NOT NULL,
+                content TEXT NOT NULL, -- '' since bodies moved to article_bodies
+                snippet TEXT, -- Start of the body, for listings
                 published_date TEXT,
                 scraped_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                matched_terms TEXT, -- JSON list of the search terms found in the article
+                simhash INTEGER, -- 64-bit SimHash of the text (see dedup.py), stored signed
+                duplicate_of INTEGER, -- id of the first saved copy when this is a near-duplicate
                 FOREIGN KEY (site_id) REFERENCES sites (id)
             );
         ''')
@@ -60,8 +326,123 @@ def init_db():
             );
         ''')
         cursor.execute("INSERT OR IGNORE INTO scraper_control (id, status) VALUES (1, 'stopped');")
+        # Article bodies, compressed (see body_store.py), apart from the articles
+        # rows so listings never read them
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS article_bodies (
+                article_id INTEGER PRIMARY KEY,
+                dictionary_id INTEGER, -- compression_dictionaries.id, NULL if compressed without one
+                body BLOB NOT NULL,
+                FOREIGN KEY (article_id) REFERENCES articles (id) ON DELETE CASCADE
+            );
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS compression_dictionaries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                dictionary BLOB NOT NULL,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            );
+        ''')
+        # Crawl state that survives restarts: every URL already visited per site,
+        # and the pending frontier so an interrupted crawl resumes where it stopped
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS crawled_urls (
+                site_id INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                crawled_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (site_id, url),
+                FOREIGN KEY (site_id) REFERENCES sites (id) ON DELETE CASCADE
+            ) WITHOUT ROWID;
+        ''')
+        # HTTP validators and body hash of the last fetch of each URL, used for
+        # conditional re-fetches (If-None-Match / If-Modified-Since)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS page_validators (
+                site_id INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                fetched_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (site_id, url),
+                FOREIGN KEY (site_id) REFERENCES sites (id) ON DELETE CASCADE
+            ) WITHOUT ROWID;
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS crawl_frontier (
+                site_id INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                priority REAL NOT NULL DEFAULT 0,
+                lastmod TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0, -- Failed fetches so far; the URL stays pending until FRONTIER_MAX_ATTEMPTS
+                added_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (site_id, url),
+                FOREIGN KEY (site_id) REFERENCES sites (id) ON DELETE CASCADE
+            ) WITHOUT ROWID;
+        ''')
+        # Raw robots.txt per origin (scheme://host[:port]), so it is not
+        # re-downloaded on every run (see robots.py for the TTL)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS robots_cache (
+                origin TEXT PRIMARY KEY,
+                status_code INTEGER,
+                robots_txt TEXT,
+                fetched_at REAL NOT NULL
+            ) WITHOUT ROWID;
+        ''')
+        # Extracted articles that matched no search term when crawled, kept
+        # (compressed like article_bodies) so terms added later can find them
+        # (see term_backfill.py). Saving an article removes its candidate.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS candidate_articles (
+                id INTEGER PRIMARY KEY,
+                site_id INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                url TEXT NOT NULL UNIQUE,
+                published_date TEXT,
+                simhash INTEGER,
+                dictionary_id INTEGER,
+                body BLOB NOT NULL,
+                extracted_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (site_id) REFERENCES sites (id) ON DELETE CASCADE
+            );
+        ''')
+        # Index of the page archive (see archive.py): where each fetch of a URL
+        # is stored. A URL fetched again gets a new row; reprocessing uses the latest.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS archived_responses (
+                id INTEGER PRIMARY KEY,
+                site_id INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                fetched_at TEXT NOT NULL,
+                status_code INTEGER,
+                segment TEXT NOT NULL,
+                record_offset INTEGER NOT NULL,
+                record_length INTEGER NOT NULL,
+                FOREIGN KEY (site_id) REFERENCES sites (id) ON DELETE CASCADE
+            );
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_archived_responses_url ON archived_responses (url, fetched_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_archived_responses_site ON archived_responses (site_id, url)')
+        # Listing order of get_articles (see ARTICLE_SORT_KEY), per site and overall,
+        # so a page is read straight off the index instead of sorting every match
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_articles_site_published ON articles (site_id, IFNULL(published_date, ''), scraped_at, id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_articles_published ON articles (IFNULL(published_date, ''), scraped_at, id)")
+        _migrate_db(cursor)
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_duplicate_of ON articles (duplicate_of) WHERE duplicate_of IS NOT NULL')
+        _drop_legacy_fulltext_index(cursor)
+        _ensure_body_dictionary(cursor)
+        moved_bodies = _move_bodies_out(cursor)
+        _create_fulltext_index(cursor)
+        _create_article_terms(cursor)
+        matched_articles = _match_unmatched_articles(cursor)
         db.commit()
         cursor.close()
+    if matched_articles:
+        print(f"Matched {matched_articles} articles saved without matched terms against the search terms")
+    if moved_bodies:
+        print(f"Compressed {moved_bodies} article bodies into article_bodies; reclaiming the space...")
+        db.execute('VACUUM')
 
 def add_site(url):
     with get_db() as db:
@@ -85,19 +466,37 @@ def get_sites():
         return [dict(site) for site in sites]
 
 def delete_site(site_id):
+    # Rows the crawl queued for this site must land before they are deleted, and
+    # archive index rows before the unused-segment check below. (db_writer
+    # imports this module, hence the import here.)
+    from db_writer import flush_db_writer
+    flush_db_writer()
     with get_db() as db:
         cursor = db.cursor()
         cursor.execute('DELETE FROM sites WHERE id = ?', (site_id,))
+        # Near-duplicates on other sites stop pointing at the articles about to go
+        cursor.execute('UPDATE articles SET duplicate_of = NULL WHERE duplicate_of IN (SELECT id FROM articles WHERE site_id = ?)', (site_id,))
         cursor.execute('DELETE FROM articles WHERE site_id = ?', (site_id,))
         cursor.execute('DELETE FROM site_scraping_progress WHERE site_id = ?', (site_id,))
+        cursor.execute('DELETE FROM crawled_urls WHERE site_id = ?', (site_id,))
+        cursor.execute('DELETE FROM crawl_frontier WHERE site_id = ?', (site_id,))
+        cursor.execute('DELETE FROM page_validators WHERE site_id = ?', (site_id,))
+        # Segments are shared by every site crawled at the time; only the ones left without records go
+        segments = [row[0] for row in cursor.execute('SELECT DISTINCT segment FROM archived_responses WHERE site_id = ?', (site_id,))]
+        cursor.execute('DELETE FROM archived_responses WHERE site_id = ?', (site_id,))
+        cursor.execute('DELETE FROM candidate_articles WHERE site_id = ?', (site_id,))
         db.commit()
+        unused_segments = [segment for segment in segments
+                           if cursor.execute('SELECT 1 FROM archived_responses WHERE segment = ? LIMIT 1', (segment,)).fetchone() is None]
         cursor.close()
+    _clear_article_counts()
+    response_archive.delete_segments(unused_segments)
 
 def add_search_term(term):
     with get_db() as db:
         cursor = db.cursor()
         try:
-            cursor.execute('INSERT INTO search_terms (term) VALUES (?)', (term,))
+            cursor.execute('INSERT INTO search_terms (term, backfill_pending) VALUES (?, 1)', (term,))
             db.commit()
             return True
         except sqlite3.IntegrityError:
@@ -114,6 +513,22 @@ def get_search_terms():
         cursor.close()
         return [dict(term) for term in terms]
 
+# Terms added since the stored articles were last matched, as (id, term)
+def get_backfill_terms():
+    with get_db() as db:
+        cursor = db.cursor()
+        cursor.execute('SELECT id, term FROM search_terms WHERE backfill_pending = 1 ORDER BY id')
+        terms = [(row['id'], row['term']) for row in cursor.fetchall()]
+        cursor.close()
+        return terms
+
+def finish_term_backfill(term_ids):
+    with get_db() as db:
+        cursor = db.cursor()
+        cursor.executemany('UPDATE search_terms SET backfill_pending = 0 WHERE id = ?', [(term_id,) for term_id in term_ids])
+        db.commit()
+        cursor.close()
+
 def delete_search_term(term_id):
     with get_db() as db:
         cursor = db.cursor()
@@ -121,15 +536,57 @@ def delete_search_term(term_id):
         db.commit()
         cursor.close()
 
-def add_article(site_id, title, url, content, published_date):
+# A page that changed since it was saved (incremental scans) updates the stored article.
+# duplicate_of is given as the URL of the first copy and resolved to its id here.
+# The body goes to article_bodies right after, keyed by the article's URL.
+ARTICLE_UPSERT_SQL = (
+    'INSERT INTO articles (site_id, title, url, content, snippet, published_date, matched_terms, simhash, duplicate_of) '
+    "VALUES (?, ?, ?, '', ?, ?, ?, ?, (SELECT id FROM articles WHERE url = ?)) "
+    'ON CONFLICT (url) DO UPDATE SET title = excluded.title, snippet = excluded.snippet, '
+    'published_date = COALESCE(excluded.published_date, articles.published_date), '
+    'matched_terms = COALESCE(excluded.matched_terms, articles.matched_terms), '
+    'simhash = excluded.simhash, duplicate_of = excluded.duplicate_of'
+)
+ARTICLE_BODY_UPSERT_SQL = (
+    'INSERT INTO article_bodies (article_id, dictionary_id, body) VALUES ((SELECT id FROM articles WHERE url = ?), ?, ?) '
+    'ON CONFLICT (article_id) DO UPDATE SET dictionary_id = excluded.dictionary_id, body = excluded.body'
+)
+
+# Parameters of ARTICLE_UPSERT_SQL and ARTICLE_BODY_UPSERT_SQL for one article
+def article_row(site_id, title, url, content, published_date, matched_terms=None, simhash=None, duplicate_of_url=None):
+    dictionary_id, body = compress_body(content)
+    return ((site_id, title, url, make_snippet(content), published_date,
+             json.dumps(matched_terms) if matched_terms else None, simhash, duplicate_of_url),
+            (url, dictionary_id, body))
+
+def _save_article_rows(cursor, rows):
+    cursor.executemany(ARTICLE_UPSERT_SQL, [article for article, _ in rows])
+    cursor.executemany(ARTICLE_BODY_UPSERT_SQL, [body for _, body in rows])
+    cursor.executemany(CANDIDATE_DELETE_SQL, [(article[2],) for article, _ in rows]) # Page changed and now matches
+
+CANDIDATE_UPSERT_SQL = (
+    'INSERT INTO candidate_articles (site_id, title, url, published_date, simhash, dictionary_id, body) '
+    'VALUES (?, ?, ?, ?, ?, ?, ?) '
+    'ON CONFLICT (url) DO UPDATE SET title = excluded.title, '
+    'published_date = COALESCE(excluded.published_date, candidate_articles.published_date), '
+    'simhash = excluded.simhash, dictionary_id = excluded.dictionary_id, body = excluded.body, '
+    'extracted_at = CURRENT_TIMESTAMP'
+)
+CANDIDATE_DELETE_SQL = 'DELETE FROM candidate_articles WHERE url = ?'
+
+# Parameters of CANDIDATE_UPSERT_SQL for one article that matched no term
+def candidate_row(site_id, title, url, content, published_date, simhash=None):
+    dictionary_id, body = compress_body(content)
+    return (site_id, title, url, published_date, simhash, dictionary_id, body)
+
+def add_article(site_id, title, url, content, published_date, matched_terms=None, simhash=None, duplicate_of_url=None):
     with get_db() as db:
         cursor = db.cursor()
         try:
-            cursor.execute(
-                'INSERT OR IGNORE INTO articles (site_id, title, url, content, published_date) VALUES (?, ?, ?, ?, ?)',
-                (site_id, title, url, content, published_date)
-            )
+            _save_article_rows(cursor, [article_row(site_id, title, url, content, published_date, matched_terms,
+                                                    simhash, duplicate_of_url)])
             db.commit()
+            _clear_article_counts()
         except sqlite3.IntegrityError:
             pass
         except Exception as e:
@@ -137,28 +594,124 @@ def add_article(site_id, title, url, content, published_date):
         finally:
             cursor.close()
 
-# MODIFIED: get_articles now accepts page and per_page for pagination
-def get_articles(query_terms=None, site_id=None, order_by='date_desc', start_date=None, end_date=None, page=1, per_page=10):
+# What a listing shows; the body stays in article_bodies (see get_article)
+ARTICLE_LIST_COLUMNS = ', '.join('a.' + column for column in (
+    'id', 'site_id', 'title', 'url', 'snippet', 'published_date', 'scraped_at', 'matched_terms', 'duplicate_of'))
+
+# One article with its full body, decompressed
+def get_article(article_id):
+    with get_db() as db:
+        cursor = db.cursor()
+        cursor.execute(f'''
+            SELECT {ARTICLE_LIST_COLUMNS}, s.url AS site_url, b.body, b.dictionary_id
+            FROM articles a JOIN sites s ON a.site_id = s.id LEFT JOIN article_bodies b ON b.article_id = a.id
+            WHERE a.id = ?
+        ''', (article_id,))
+        row = cursor.fetchone()
+        cursor.close()
+    if row is None:
+        return None
+    article = dict(row)
+    article['content'] = decompress_body(article.pop('body'), article.pop('dictionary_id')) or ''
+    article['matched_terms'] = json.loads(article['matched_terms']) if article['matched_terms'] else []
+    return article
+
+# Sort key of the date orderings, matching the idx_articles_* indexes. Articles
+# without a date sort as '' (i.e. oldest), like NULLs did before.
+ARTICLE_SORT_KEY = ("IFNULL(a.published_date, '')", 'a.scraped_at', 'a.id')
+
+# Total results per filter combination. Keys include MAX(articles.id), so any
+# insert (from this or another process) makes older entries unreachable;
+# deletions clear the cache explicitly.
+_article_counts = {}
+_article_counts_lock = threading.Lock()
+MAX_CACHED_COUNTS = 256
+
+def _clear_article_counts():
+    with _article_counts_lock:
+        _article_counts.clear()
+
+def _count_articles(cursor, count_key, base_sql_query, params):
+    cursor.execute('SELECT MAX(id) FROM articles')
+    count_key = count_key + (cursor.fetchone()[0],)
+    with _article_counts_lock:
+        total_results = _article_counts.get(count_key)
+    if total_results is None:
+        cursor.execute(f"SELECT COUNT(*) FROM ({base_sql_query}) AS subquery", params)
+        total_results = cursor.fetchone()[0]
+        with _article_counts_lock:
+            if len(_article_counts) >= MAX_CACHED_COUNTS:
+                _article_counts.clear()
+            _article_counts[count_key] = total_results
+    return total_results
+
+# Opaque page cursors: the sort key of the row at the edge of a page
+def _encode_cursor(article):
+    key = [article['published_date'] or '', article['scraped_at'], article['id']]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def _decode_cursor(cursor_token):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor_token.encode()))
+    except (ValueError, TypeError):
+        return None
+    if isinstance(key, list) and len(key) == len(ARTICLE_SORT_KEY):
+        return key
+    return None
+
+# query_terms are search terms: an article is listed if the crawl (or the
+# term backfill) matched one of them, as recorded in matched_terms.
+#
+# Pagination: for the date orderings, after/before are cursors from a previous
+# result (next_cursor / prev_cursor) and the page is located with a keyset
+# condition on ARTICLE_SORT_KEY, so page 500 costs the same as page 1. Without
+# a cursor (e.g. jumping to a page number, or order_by='relevance') it falls
+# back to LIMIT/OFFSET. page is still passed along for display.
+#
+# collapse_duplicates lists only the first copy of each near-duplicate cluster,
+# with its number of other copies in duplicate_count; cluster_id lists one
+# cluster (the article with that id and its duplicates).
+def get_articles(query_terms=None, site_id=None, order_by='date_desc', start_date=None, end_date=None, page=1, per_page=10,
+                 after=None, before=None, collapse_duplicates=False, cluster_id=None):
     with get_db() as db:
         cursor = db.cursor()
         
         # Base query for filtering
-        base_sql_query = 'SELECT a.*, s.url as site_url FROM articles a JOIN sites s ON a.site_id = s.id WHERE 1=1'
+        base_sql_query = f'SELECT {ARTICLE_LIST_COLUMNS}, s.url as site_url'
+        if collapse_duplicates:
+            base_sql_query += ', (SELECT COUNT(*) FROM articles d WHERE d.duplicate_of = a.id) AS duplicate_count'
+        base_sql_query += ' FROM articles a JOIN sites s ON a.site_id = s.id'
         params = []
 
+        # Articles that matched any of the terms (see _create_article_terms)
+        query_terms = sorted(set(query_terms or []))
+        fulltext_query = _fulltext_query(query_terms) if order_by == 'relevance' else ''
+        if fulltext_query:
+            # The full-text index only ranks them, by bm25. Articles it does not
+            # find (a term inside a longer word, e.g. "Gás" in "biogás") rank last.
+            base_sql_query += (' LEFT JOIN (SELECT rowid AS article_id, bm25(articles_fts, 5.0, 1.0) AS score'
+                               ' FROM articles_fts WHERE articles_fts MATCH ?) ranked ON ranked.article_id = a.id')
+            params.append(fulltext_query)
+        elif order_by == 'relevance':
+            order_by = 'date_desc' # Nothing to rank against
+        base_sql_query += ' WHERE 1=1'
         if query_terms:
-            term_clauses = []
-            for term in query_terms:
-                term_clauses.append('(a.title LIKE ? OR a.content LIKE ?)')
-                params.append(f'%{term}%')
-                params.append(f'%{term}%')
-            if term_clauses:
-                base_sql_query += ' AND (' + ' OR '.join(term_clauses) + ')'
+            base_sql_query += (' AND EXISTS (SELECT 1 FROM article_terms t WHERE t.article_id = a.id AND t.term IN (' +
+                               ', '.join('?' * len(query_terms)) + '))')
+            params += query_terms
+        if order_by not in ('date_desc', 'date_asc', 'relevance'):
+            order_by = 'date_desc'
 
         if site_id and site_id != 0:
             base_sql_query += ' AND a.site_id = ?'
             params.append(site_id)
 
+        if cluster_id:
+            base_sql_query += ' AND (a.id = ? OR a.duplicate_of = ?)'
+            params += [cluster_id, cluster_id]
+        elif collapse_duplicates:
+            base_sql_query += ' AND a.duplicate_of IS NULL'
+
         if start_date:
             base_sql_query += ' AND published_date >= ?'
             params.append(start_date)
@@ -172,76 +725,268 @@ def get_articles(query_terms=None, site_id=None, order_by='date_desc', start_dat
                 base_sql_query += ' AND published_date <= ?'
                 params.append(end_date)
 
-        # First, get total count without LIMIT/OFFSET
-        count_sql_query = f"SELECT COUNT(*) FROM ({base_sql_query}) AS subquery"
-        cursor.execute(count_sql_query, params)
-        total_results = cursor.fetchone()[0]
+        # Total without LIMIT/OFFSET, cached until the next insert
+        total_results = _count_articles(cursor, (tuple(query_terms), fulltext_query, site_id or 0, start_date, end_date,
+                                                 bool(collapse_duplicates), cluster_id), base_sql_query, params)
 
         # Apply ordering and pagination
-        if order_by == 'date_desc':
-            base_sql_query += ' ORDER BY a.published_date DESC, a.scraped_at DESC'
-        elif order_by == 'date_asc':
-            base_sql_query += ' ORDER BY a.published_date ASC, a.scraped_at ASC'
-        
-        # Calculate OFFSET
-        offset = (page - 1) * per_page
-        sql_query_paginated = f"{base_sql_query} LIMIT ? OFFSET ?"
-        paginated_params = params + [per_page, offset]
+        sort_key = ', '.join(ARTICLE_SORT_KEY)
+        keyset = _decode_cursor(after or before) if order_by != 'relevance' and (after or before) else None
+        backwards = keyset is not None and not after
+        if keyset is not None:
+            # Rows past the cursor, walking away from it (towards older pages when going backwards)
+            descending = (order_by == 'date_desc') != backwards
+            # The bound on the first column alone is what lets SQLite seek the index
+            # (it does not seek on the row-value comparison by itself)
+            base_sql_query += f" AND {ARTICLE_SORT_KEY[0]} {'<=' if descending else '>='} ?"
+            base_sql_query += f" AND ({sort_key}) {'<' if descending else '>'} (?, ?, ?)"
+            params += [keyset[0]] + keyset
+        else:
+            descending = order_by == 'date_desc'
+
+        if order_by == 'relevance':
+            # bm25 is lower for better matches; a hit in the title weighs 5x one in the body
+            base_sql_query += ' ORDER BY ranked.score IS NULL, ranked.score, a.published_date DESC'
+        else:
+            direction = ' DESC' if descending else ' ASC'
+            base_sql_query += ' ORDER BY ' + ', '.join(column + direction for column in ARTICLE_SORT_KEY)
+
+        if keyset is not None:
+            sql_query_paginated = f"{base_sql_query} LIMIT ?"
+            paginated_params = params + [per_page]
+        else:
+            # Calculate OFFSET
+            offset = (page - 1) * per_page
+            # Literal numbers: with a bound LIMIT SQLite skips the automatic index on
+            # the ranked subquery and rescans it for every article (1 s+ per 10k)
+            sql_query_paginated = f"{base_sql_query} LIMIT {int(per_page)} OFFSET {int(offset)}"
+            paginated_params = params
 
         cursor.execute(sql_query_paginated, paginated_params)
         articles = cursor.fetchall()
         cursor.close()
         
+        articles = [dict(article) for article in articles]
+        if backwards:
+            articles.reverse()
+        for article in articles:
+            article['matched_terms'] = json.loads(article['matched_terms']) if article['matched_terms'] else []
+
+        total_pages = (total_results + per_page - 1) // per_page if total_results > 0 else 0
+        cursors_apply = order_by != 'relevance' and articles
         return {
-            'articles': [dict(article) for article in articles],
+            'articles': articles,
             'total_results': total_results,
             'current_page': page,
             'per_page': per_page,
-            'total_pages': (total_results + per_page - 1) // per_page if total_results > 0 else 0
+            'total_pages': total_pages,
+            'order_by': order_by,
+            # Cursors for the neighbouring pages (None where OFFSET paging applies)
+            'next_cursor': _encode_cursor(articles[-1]) if cursors_apply and page < total_pages else None,
+            'prev_cursor': _encode_cursor(articles[0]) if cursors_apply and page > 1 else None
         }
 
+PROGRESS_UPSERT_SQL = 'INSERT OR REPLACE INTO site_scraping_progress (site_id, status, pages_crawled, max_pages_to_crawl) VALUES (?, ?, ?, ?)'
+
 def update_scraper_progress_for_site(site_id, pages_crawled, max_pages_to_crawl, status='running'):
     with get_db() as db:
         cursor = db.cursor()
-        cursor.execute('INSERT OR REPLACE INTO site_scraping_progress (site_id, status, pages_crawled, max_pages_to_crawl) VALUES (?, ?, ?, ?)',
-                       (site_id, status, pages_crawled, max_pages_to_crawl))
+        cursor.execute(PROGRESS_UPSERT_SQL, (site_id, status, pages_crawled, max_pages_to_crawl))
         db.commit()
         cursor.close()
 
-def get_scraper_status():
+def get_crawled_urls(site_id):
     with get_db() as db:
         cursor = db.cursor()
-        
-        overall_status_row = cursor.execute('SELECT status FROM scraper_control WHERE id = 1').fetchone()
-        overall_status = overall_status_row['status'] if overall_status_row else 'stopped'
-        
-        site_progresses = cursor.execute('SELECT site_id, status, pages_crawled, max_pages_to_crawl FROM site_scraping_progress').fetchall()
-        
-        total_pages_crawled = 0
-        total_max_pages_to_crawl = 0
-        active_sites_count = 0
-        
-        for p in site_progresses:
-            if p['status'] == 'running':
-                total_pages_crawled += p['pages_crawled']
-                total_max_pages_to_crawl += p['max_pages_to_crawl']
-                active_sites_count += 1
-        
-        if active_sites_count > 0:
-            global_running_status = 'running'
-        else:
-            global_running_status = 'stopped'
+        cursor.execute('SELECT url FROM crawled_urls WHERE site_id = ?', (site_id,))
+        urls = {row['url'] for row in cursor.fetchall()}
+        cursor.close()
+        return urls
 
-        if overall_status != global_running_status:
-            set_scraper_status(global_running_status)
-            overall_status = global_running_status
+# Pending URLs of a site as (url, priority, lastmod, attempts), where attempts
+# counts the failed fetches of the URL so far
+def get_pending_frontier(site_id):
+    with get_db() as db:
+        cursor = db.cursor()
+        cursor.execute('SELECT url, priority, lastmod, attempts FROM crawl_frontier WHERE site_id = ? ORDER BY priority DESC, added_at ASC', (site_id,))
+        pending = [(row['url'], row['priority'], row['lastmod'], row['attempts']) for row in cursor.fetchall()]
+        cursor.close()
+        return pending
 
-        return {
-            'status': overall_status,
-            'pages_crawled': total_pages_crawled,
-            'max_pages': total_max_pages_to_crawl,
-            'individual_sites': [dict(p) for p in site_progresses]
-        }
+def get_page_validators(site_id):
+    with get_db() as db:
+        cursor = db.cursor()
+        cursor.execute('SELECT url, etag, last_modified, content_hash FROM page_validators WHERE site_id = ?', (site_id,))
+        validators = {row['url']: dict(row) for row in cursor.fetchall()}
+        cursor.close()
+        return validators
+
+# Queues discovered URLs (url, priority, lastmod) for a site, keeping the best
+# priority and the known lastmod of URLs that are already pending
+def add_frontier_urls(site_id, frontier_urls):
+    with get_db() as db:
+        cursor = db.cursor()
+        cursor.executemany('''
+            INSERT INTO crawl_frontier (site_id, url, priority, lastmod) VALUES (?, ?, ?, ?)
+            ON CONFLICT (site_id, url) DO UPDATE SET priority = MAX(priority, excluded.priority),
+                lastmod = COALESCE(excluded.lastmod, lastmod)
+        ''', [(site_id, url, priority, lastmod) for url, priority, lastmod in frontier_urls])
+        db.commit()
+        cursor.close()
+
+CRAWLED_URL_UPSERT_SQL = ('INSERT INTO crawled_urls (site_id, url) VALUES (?, ?) '
+                          'ON CONFLICT (site_id, url) DO UPDATE SET crawled_at = CURRENT_TIMESTAMP')
+FRONTIER_DELETE_SQL = 'DELETE FROM crawl_frontier WHERE site_id = ? AND url = ?'
+FRONTIER_INSERT_SQL = 'INSERT OR IGNORE INTO crawl_frontier (site_id, url, priority) VALUES (?, ?, ?)'
+# A fetch that failed leaves the URL pending, one attempt further
+FRONTIER_FAILURE_SQL = ('INSERT INTO crawl_frontier (site_id, url, priority, attempts) VALUES (?, ?, ?, 1) '
+                        'ON CONFLICT (site_id, url) DO UPDATE SET attempts = attempts + 1')
+VALIDATORS_UPSERT_SQL = '''
+    INSERT INTO page_validators (site_id, url, etag, last_modified, content_hash) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (site_id, url) DO UPDATE SET etag = excluded.etag, last_modified = excluded.last_modified,
+        content_hash = excluded.content_hash, fetched_at = CURRENT_TIMESTAMP
+'''
+
+# Records one processed page in a single transaction: the page moves from the
+# pending frontier to crawled_urls, the links it discovered are queued, and its
+# HTTP validators/content hash (if given) are stored for the next visit.
+def checkpoint_crawled_page(site_id, url, new_frontier_urls=(), validators=None):
+    with get_db() as db:
+        write_batch(db, checkpoints=[(site_id, url, new_frontier_urls, validators)])
+
+# Writes many articles, candidate articles, page checkpoints (site_id, url,
+# new_frontier_urls, validators), failed fetches (site_id, url, priority),
+# progress rows and archive index rows in one transaction, one executemany per
+# statement. Used by db_writer.DatabaseWriter to batch the crawl workers' writes.
+def write_batch(db, articles=(), checkpoints=(), progress_rows=(), archived_responses=(), candidates=(), failed_fetches=()):
+    cursor = db.cursor()
+    try:
+        if candidates:
+            cursor.executemany(CANDIDATE_UPSERT_SQL, candidates)
+        if articles:
+            _save_article_rows(cursor, articles)
+        if failed_fetches:
+            cursor.executemany(FRONTIER_FAILURE_SQL, failed_fetches)
+        if checkpoints:
+            # New links first: a page queued and crawled within the same batch must end up out of the frontier
+            cursor.executemany(FRONTIER_INSERT_SQL, [(site_id, frontier_url, priority)
+                                                     for site_id, _, new_frontier_urls, _ in checkpoints
+                                                     for frontier_url, priority in new_frontier_urls])
+            cursor.executemany(CRAWLED_URL_UPSERT_SQL, [(site_id, url) for site_id, url, _, _ in checkpoints])
+            cursor.executemany(FRONTIER_DELETE_SQL, [(site_id, url) for site_id, url, _, _ in checkpoints])
+            cursor.executemany(VALIDATORS_UPSERT_SQL, [
+                (site_id, url, validators['etag'], validators['last_modified'], validators['content_hash'])
+                for site_id, url, _, validators in checkpoints if validators
+            ])
+        if progress_rows:
+            cursor.executemany(PROGRESS_UPSERT_SQL, progress_rows)
+        if archived_responses:
+            cursor.executemany(ARCHIVED_RESPONSE_INSERT_SQL, archived_responses)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+    if articles:
+        _clear_article_counts()
+
+# Next batch of candidate articles after after_id, bodies still compressed
+def get_candidate_batch(after_id, limit):
+    with get_db() as db:
+        cursor = db.cursor()
+        cursor.execute('''
+            SELECT id, site_id, title, url, published_date, simhash, dictionary_id, body FROM candidate_articles
+            WHERE id > ? ORDER BY id LIMIT ?
+        ''', (after_id, limit))
+        candidates = [dict(row) for row in cursor.fetchall()]
+        cursor.close()
+        return candidates
+
+# Next batch of saved articles after after_id with their compressed bodies
+def get_article_text_batch(after_id, limit):
+    with get_db() as db:
+        cursor = db.cursor()
+        cursor.execute('''
+            SELECT a.id, a.title, a.matched_terms, b.dictionary_id, b.body FROM articles a
+            JOIN article_bodies b ON b.article_id = a.id
+            WHERE a.id > ? ORDER BY a.id LIMIT ?
+        ''', (after_id, limit))
+        articles = [dict(row) for row in cursor.fetchall()]
+        cursor.close()
+        return articles
+
+# Moves candidates that matched a new term into articles, as
+# (candidate, content, matched_terms, duplicate_of_url). The compressed body is
+# moved as is.
+def promote_candidates(promotions):
+    with get_db() as db:
+        cursor = db.cursor()
+        _save_article_rows(cursor, [
+            ((candidate['site_id'], candidate['title'], candidate['url'], make_snippet(content),
+              candidate['published_date'], json.dumps(matched_terms), candidate['simhash'], duplicate_of_url),
+             (candidate['url'], candidate['dictionary_id'], candidate['body']))
+            for candidate, content, matched_terms, duplicate_of_url in promotions
+        ])
+        db.commit()
+        cursor.close()
+    _clear_article_counts()
+
+# Sets matched_terms of saved articles, as (matched terms list, article id)
+def update_matched_terms(updates):
+    with get_db() as db:
+        cursor = db.cursor()
+        cursor.executemany('UPDATE articles SET matched_terms = ? WHERE id = ?',
+                           [(json.dumps(matched_terms), article_id) for matched_terms, article_id in updates])
+        db.commit()
+        cursor.close()
+    _clear_article_counts()
+
+ARCHIVED_RESPONSE_INSERT_SQL = ('INSERT INTO archived_responses (site_id, url, fetched_at, status_code, segment, '
+                                'record_offset, record_length) VALUES (?, ?, ?, ?, ?, ?, ?)')
+
+# Latest archived fetch of every URL of a site, as (url, segment, offset, length)
+def get_archived_responses(site_id):
+    with get_db() as db:
+        cursor = db.cursor()
+        # With MAX(), SQLite takes the other columns from the row holding the maximum
+        cursor.execute('''
+            SELECT url, segment, record_offset, record_length, MAX(id) FROM archived_responses
+            WHERE site_id = ? GROUP BY url
+        ''', (site_id,))
+        responses = [(row['url'], row['segment'], row['record_offset'], row['record_length']) for row in cursor.fetchall()]
+        cursor.close()
+        return responses
+
+# (url, signed simhash) of every article that is not itself a near-duplicate,
+# to fill dedup.near_duplicate_index
+def get_article_fingerprints():
+    with get_db() as db:
+        cursor = db.cursor()
+        cursor.execute('SELECT url, simhash FROM articles WHERE simhash IS NOT NULL AND duplicate_of IS NULL')
+        rows = [(row['url'], row['simhash']) for row in cursor.fetchall()]
+        cursor.close()
+        return rows
+
+def get_robots_txt(origin):
+    with get_db() as db:
+        cursor = db.cursor()
+        cursor.execute('SELECT status_code, robots_txt, fetched_at FROM robots_cache WHERE origin = ?', (origin,))
+        row = cursor.fetchone()
+        cursor.close()
+        return dict(row) if row else None
+
+# status_code is None when robots.txt could not be fetched at all
+def save_robots_txt(origin, status_code, robots_txt, fetched_at):
+    with get_db() as db:
+        cursor = db.cursor()
+        cursor.execute('''
+            INSERT INTO robots_cache (origin, status_code, robots_txt, fetched_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (origin) DO UPDATE SET status_code = excluded.status_code, robots_txt = excluded.robots_txt,
+                fetched_at = excluded.fetched_at
+        ''', (origin, status_code, robots_txt, fetched_at))
+        db.commit()
+        cursor.close()
 
 def set_scraper_status(status):
     with get_db() as db:
@@ -0,0 +1,166 @@
+import atexit
+import queue
+import threading
+import time
+
+import body_store
+from config import Config
+from database import connect_db, write_batch, article_row, candidate_row, train_body_dictionary
+from metrics import time_stage, db_operations
+
+# Single writer for the crawl's hot-path writes (articles, page checkpoints,
+# failed fetches, progress rows, archive index rows, candidate articles).
+#
+# Crawl workers only put operations on a queue; one thread owns a connection
+# and commits them in batches of up to DB_WRITER_BATCH_SIZE operations, or
+# whatever arrived within DB_WRITER_FLUSH_INTERVAL of the first one, with one
+# executemany per statement (see database.write_batch). That replaces a commit
+# (and fsync) per page per worker, and since only this thread writes, workers
+# never wait on the SQLite write lock. Operations are applied in queue order,
+# so a site's final progress row lands after everything that site saved.
+#
+# A database that had too few articles to train the body compression
+# dictionary in init_db gets one from here: every BODY_DICTIONARY_MIN_ARTICLES
+# saved articles, until one is trained.
+
+_STOP = object()
+
+class DatabaseWriter:
+    def __init__(self, batch_size=None, flush_interval=None):
+        self.batch_size = batch_size or Config.DB_WRITER_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else Config.DB_WRITER_FLUSH_INTERVAL
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self.batches_written = 0
+        self.operations_written = 0
+        self._articles_since_training = 0
+
+    def start(self):
+        self._thread.start()
+
+    def add_article(self, site_id, title, url, content, published_date, matched_terms=None, simhash=None,
+                    duplicate_of_url=None):
+        self._queue.put(('article', article_row(site_id, title, url, content, published_date, matched_terms,
+                                                simhash, duplicate_of_url)))
+
+    # An extracted article that matched no search term (see term_backfill.py)
+    def add_candidate(self, site_id, title, url, content, published_date, simhash=None):
+        self._queue.put(('candidate', candidate_row(site_id, title, url, content, published_date, simhash)))
+
+    def checkpoint_crawled_page(self, site_id, url, new_frontier_urls=(), validators=None):
+        self._queue.put(('checkpoint', (site_id, url, list(new_frontier_urls), validators)))
+
+    # A page that could not be fetched stays in crawl_frontier, to be retried by a later run
+    def record_failed_fetch(self, site_id, url, priority):
+        self._queue.put(('failed', (site_id, url, priority)))
+
+    def update_progress(self, site_id, pages_crawled, max_pages_to_crawl, status='running'):
+        self._queue.put(('progress', (site_id, status, pages_crawled, max_pages_to_crawl)))
+
+    def add_archived_response(self, site_id, url, fetched_at, status_code, segment, offset, length):
+        self._queue.put(('archive', (site_id, url, fetched_at, status_code, segment, offset, length)))
+
+    # Blocks until every operation queued so far is committed
+    def flush(self):
+        if self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and batch[-1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, db, operations):
+        articles, candidates, checkpoints, archived_responses, failed_fetches = [], [], [], [], []
+        progress_by_site = {} # Only the latest progress row of each site matters
+        for kind, row in operations:
+            if kind == 'article':
+                articles.append(row)
+            elif kind == 'candidate':
+                candidates.append(row)
+            elif kind == 'checkpoint':
+                checkpoints.append(row)
+            elif kind == 'archive':
+                archived_responses.append(row)
+            elif kind == 'failed':
+                failed_fetches.append(row)
+            else:
+                progress_by_site[row[0]] = row
+        with time_stage('db_write'):
+            write_batch(db, articles, checkpoints, list(progress_by_site.values()), archived_responses, candidates,
+                        failed_fetches)
+        for kind, count in (('article', len(articles)), ('candidate', len(candidates)), ('checkpoint', len(checkpoints)),
+                            ('failed', len(failed_fetches)), ('progress', len(progress_by_site)),
+                            ('archive', len(archived_responses))):
+            if count:
+                db_operations.inc(count, kind=kind)
+        self._articles_since_training += len(articles)
+
+    def _train_dictionary_if_due(self, db):
+        if body_store.current_dictionary_id is not None:
+            return
+        if self._articles_since_training >= Config.BODY_DICTIONARY_MIN_ARTICLES:
+            self._articles_since_training = 0
+            try:
+                train_body_dictionary(db)
+            except Exception as e:
+                print(f"Error training the compression dictionary: {e}")
+
+    def _run(self):
+        db = connect_db()
+        try:
+            while True:
+                batch = self._next_batch()
+                operations = [operation for operation in batch if operation is not _STOP]
+                try:
+                    if operations:
+                        self._write(db, operations)
+                except Exception as e:
+                    # Don't lose the whole batch to one bad row: retry the operations one by one
+                    print(f"Batched write of {len(operations)} operations failed ({e}); retrying one by one")
+                    for operation in operations:
+                        try:
+                            self._write(db, [operation])
+                        except Exception as e:
+                            print(f"Error writing {operation[0]}: {e}")
+                self._train_dictionary_if_due(db)
+                self.batches_written += 1
+                self.operations_written += len(operations)
+                for _ in batch:
+                    self._queue.task_done()
+                if len(operations) < len(batch):
+                    return
+        finally:
+            db.close()
+
+_db_writer = None
+_db_writer_lock = threading.Lock()
+
+def get_db_writer():
+    global _db_writer
+    with _db_writer_lock:
+        if _db_writer is None:
+            _db_writer = DatabaseWriter()
+            _db_writer.start()
+            atexit.register(_db_writer.close) # Commit what is still queued on shutdown
+        return _db_writer
+
+# Commits whatever the DB writer holds, without starting one if none is running
+def flush_db_writer():
+    with _db_writer_lock:
+        writer = _db_writer
+    if writer is not None:
+        writer.flush()
@@ -0,0 +1,116 @@
+import hashlib
+import threading
+
+from config import Config
+from database import get_article_fingerprints
+from term_matcher import fold_text
+
+# Near-duplicate detection for extracted articles (the same wire story
+# published under several URLs, on one site or across sites).
+#
+# Each article gets a 64-bit SimHash of its word 3-shingles, computed in the
+# parse stage (scraper.parse_page). Two texts are near-duplicates when their
+# SimHashes differ in at most DEDUP_MAX_HAMMING bits. Lookups go through a
+# banded LSH index: the hash is cut into DEDUP_BANDS bands and only articles
+# sharing at least one band value are compared. Any pair within
+# DEDUP_BANDS - 1 bits is guaranteed to share a band (pigeonhole).
+
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3
+DEDUP_POLICIES = ('link', 'skip', 'keep')
+
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+
+def simhash(text):
+    words = fold_text(text).split()
+    if len(words) < SHINGLE_SIZE:
+        features = {' '.join(words)} if words else set()
+    else:
+        features = {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    if not features:
+        return None
+
+    hashes = [_feature_hash(feature) for feature in features]
+    half = len(hashes) / 2
+    fingerprint = 0
+    for bit in range(SIMHASH_BITS):
+        mask = 1 << bit
+        if sum(1 for h in hashes if h & mask) > half:
+            fingerprint |= mask
+    return fingerprint
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+# SQLite integers are signed 64-bit
+def to_signed64(value):
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+def to_unsigned64(value):
+    return value + (1 << 64) if value < 0 else value
+
+class NearDuplicateIndex:
+    def __init__(self, bands=None, max_hamming=None):
+        self.bands = bands or Config.DEDUP_BANDS
+        self.max_hamming = max_hamming if max_hamming is not None else Config.DEDUP_MAX_HAMMING
+        self._band_bits = SIMHASH_BITS // self.bands
+        self._buckets = [{} for _ in range(self.bands)] # band -> band value -> [(fingerprint, url)]
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def _band_values(self, fingerprint):
+        mask = (1 << self._band_bits) - 1
+        return [(fingerprint >> (band * self._band_bits)) & mask for band in range(self.bands)]
+
+    def _add_locked(self, fingerprint, url):
+        for band, value in enumerate(self._band_values(fingerprint)):
+            self._buckets[band].setdefault(value, []).append((fingerprint, url))
+
+    # Closest indexed URL within max_hamming bits, ignoring url itself (an
+    # earlier version of the same article); call with the lock held
+    def _closest_locked(self, fingerprint, url):
+        best = None
+        for band, value in enumerate(self._band_values(fingerprint)):
+            for candidate, candidate_url in self._buckets[band].get(value, ()):
+                if candidate_url == url:
+                    continue
+                distance = hamming_distance(fingerprint, candidate)
+                if distance <= self.max_hamming and (best is None or distance < best[0]):
+                    best = (distance, candidate_url)
+        return best[1] if best else None
+
+    # Atomically finds the canonical article for fingerprint, or registers
+    # url as a new canonical one. Returns the canonical URL, or None if url is new.
+    def find_or_add(self, fingerprint, url):
+        with self._lock:
+            canonical_url = self._closest_locked(fingerprint, url)
+            if canonical_url is None:
+                self._add_locked(fingerprint, url)
+            return canonical_url
+
+    # Fills the index from (url, signed simhash) rows of canonical articles
+    def load(self, rows):
+        with self._lock:
+            for url, fingerprint in rows:
+                self._add_locked(to_unsigned64(fingerprint), url)
+            self.loaded = True
+
+    def reset(self):
+        with self._lock:
+            self._buckets = [{} for _ in range(self.bands)]
+            self.loaded = False
+
+near_duplicate_index = NearDuplicateIndex()
+
+_near_duplicate_index_lock = threading.Lock()
+
+# URL of an already saved article that fingerprint is a near-duplicate of, or
+# None (url is then registered as a new article). The index is filled from the
+# DB the first time it is needed.
+def find_near_duplicate(fingerprint, url):
+    if not near_duplicate_index.loaded:
+        with _near_duplicate_index_lock:
+            if not near_duplicate_index.loaded:
+                near_duplicate_index.load(get_article_fingerprints())
+    return near_duplicate_index.find_or_add(fingerprint, url)
@@ -0,0 +1,220 @@
+import gzip
+import heapq
+import io
+import itertools
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin, urlparse
+
+import requests
+from lxml import etree
+
+from config import Config
+from fetcher import fetch_stream
+from frontier import canonicalize_url
+
+# Discovery stage: finds article URLs through sitemaps (robots.txt Sitemap:
+# entries, sitemap indexes, gzipped sitemaps) and RSS/Atom feeds, together
+# with their lastmod/pubDate, to seed a site's crawl frontier.
+#
+# Sitemaps are parsed as a stream with lxml.etree.iterparse, clearing each
+# entry once read, and only the best DISCOVERY_MAX_URLS entries are kept in a
+# bounded heap, so memory stays flat even for sitemaps with 100k+ URLs.
+
+FEED_LINK_TYPES = ('application/rss+xml', 'application/atom+xml')
+
+# Reader that refuses to go past max_bytes, so a runaway document is cut off
+class _LimitedReader(io.RawIOBase):
+    def __init__(self, stream, max_bytes):
+        self._stream = stream
+        self._remaining = max_bytes
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._remaining <= 0:
+            raise ValueError('document exceeds the maximum allowed size')
+        data = self._stream.read(min(len(buffer), self._remaining))
+        self._remaining -= len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+def _open_document_stream(response, max_bytes):
+    stream = io.BufferedReader(_LimitedReader(response.raw, max_bytes))
+    # .xml.gz files are served as gzip *content* (not Content-Encoding), so sniff the magic bytes
+    if stream.peek(2)[:2] == b'\x1f\x8b':
+        return io.BufferedReader(_LimitedReader(gzip.GzipFile(fileobj=stream), max_bytes))
+    return stream
+
+# W3C datetime (sitemaps, Atom) or RFC 822 (RSS pubDate) -> aware datetime
+def parse_feed_date(value):
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed_date = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            parsed_date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if parsed_date.tzinfo is None:
+        parsed_date = parsed_date.replace(tzinfo=timezone.utc)
+    return parsed_date
+
+def _localname(element):
+    tag = element.tag
+    if not isinstance(tag, str): # Comments and processing instructions
+        return ''
+    return tag.rsplit('}', 1)[-1]
+
+def _child_text(element, *names):
+    for child in element:
+        if _localname(child) in names and child.text and child.text.strip():
+            return child.text.strip()
+    return None
+
+def _descendant_text(element, name):
+    for descendant in element.iter():
+        if _localname(descendant) == name and descendant.text and descendant.text.strip():
+            return descendant.text.strip()
+    return None
+
+def _atom_link(entry):
+    for child in entry:
+        if _localname(child) == 'link' and child.get('rel', 'alternate') == 'alternate' and child.get('href'):
+            return child.get('href')
+    return None
+
+# Yields (kind, url, date_text) for every entry of a sitemap, sitemap index,
+# RSS or Atom document, where kind is 'sitemap' for child sitemaps and 'page'
+# otherwise. Each entry is freed as soon as it has been read.
+def iter_document_entries(stream):
+    for _, element in etree.iterparse(stream, events=('end',), recover=True, huge_tree=True,
+                                      resolve_entities=False, no_network=True):
+        tag = _localname(element)
+        if tag == 'url':
+            # Google News sitemaps nest the date in <news:news><news:publication_date>
+            entry = ('page', _child_text(element, 'loc'),
+                     _descendant_text(element, 'publication_date') or _child_text(element, 'lastmod'))
+        elif tag == 'sitemap':
+            entry = ('sitemap', _child_text(element, 'loc'), _child_text(element, 'lastmod'))
+        elif tag == 'item':
+            entry = ('page', _child_text(element, 'link'), _child_text(element, 'pubDate', 'date', 'published'))
+        elif tag == 'entry':
+            entry = ('page', _atom_link(element), _child_text(element, 'published', 'updated'))
+        else:
+            continue
+
+        if entry[1]:
+            yield entry
+
+        # Free the entry and any already-processed siblings
+        element.clear()
+        parent = element.getparent()
+        if parent is not None:
+            while element.getprevious() is not None:
+                del parent[0]
+
+# Priority of a discovered URL: its frontier priority plus a freshness bonus
+# (up to +4 for today's articles, fading out over a week).
+def discovery_priority(url_priority, published_date):
+    if published_date is None:
+        return url_priority
+    age_days = max(0.0, (datetime.now(timezone.utc) - published_date).total_seconds() / 86400)
+    return url_priority + max(0.0, 4.0 - age_days * 4.0 / 7.0)
+
+# One walk over a site's sitemaps (following indexes, newest child sitemaps
+# first) and feeds. Documents are read one per read_next_document() call, so
+# the caller can schedule every request like a page fetch; at most
+# max_sitemaps are read in total.
+class SiteDiscovery:
+    # url_priority(url) is the frontier's priority function.
+    def __init__(self, base_url, url_priority, max_urls=None, max_sitemaps=None, max_age_days=None):
+        self.base_url = base_url
+        self.host = urlparse(canonicalize_url(base_url)).netloc
+        self.url_priority = url_priority
+        self.max_urls = max_urls or Config.DISCOVERY_MAX_URLS
+        self.max_sitemaps = max_sitemaps or Config.DISCOVERY_MAX_SITEMAPS
+        self.max_age_days = max_age_days if max_age_days is not None else Config.DISCOVERY_MAX_AGE_DAYS
+        self.documents_read = 0
+        self._best = [] # Bounded min-heap of (priority, sequence, url, published_iso)
+        self._sequence = itertools.count()
+        self._seen_urls = set()
+        self._pending_documents = [] # (url, lastmod), next to read first
+        self._queued_documents = set()
+
+    def add_documents(self, sitemap_urls=(), feed_urls=()):
+        self._queue_documents([(url, None) for url in list(sitemap_urls) + list(feed_urls)])
+
+    def _queue_documents(self, documents, first=False):
+        documents = [(url, lastmod) for url, lastmod in documents if url not in self._queued_documents]
+        self._queued_documents.update(url for url, _ in documents)
+        self._pending_documents = documents + self._pending_documents if first else self._pending_documents + documents
+
+    def has_pending(self):
+        return bool(self._pending_documents) and self.documents_read < self.max_sitemaps
+
+    # Reads the next document; the child sitemaps of an index are read next
+    def read_next_document(self):
+        document_url, _ = self._pending_documents.pop(0)
+        child_sitemaps = self._read_document(document_url)
+        oldest = datetime.min.replace(tzinfo=timezone.utc)
+        child_sitemaps.sort(key=lambda child: child[1] or oldest, reverse=True)
+        self._queue_documents(child_sitemaps, first=True)
+
+    def _offer(self, url, date_text):
+        canonical_url = canonicalize_url(url)
+        if urlparse(canonical_url).netloc != self.host or canonical_url in self._seen_urls:
+            return
+        published_date = parse_feed_date(date_text)
+        if published_date and self.max_age_days and \
+           (datetime.now(timezone.utc) - published_date).days > self.max_age_days:
+            return # Old archive entries would only eat the page budget
+        self._seen_urls.add(canonical_url)
+
+        priority = discovery_priority(self.url_priority(canonical_url), published_date)
+        entry = (priority, next(self._sequence), url, published_date.isoformat() if published_date else None)
+        if len(self._best) < self.max_urls:
+            heapq.heappush(self._best, entry)
+        elif entry[0] > self._best[0][0]:
+            heapq.heapreplace(self._best, entry)
+
+    # Reads one sitemap/feed and returns the child sitemaps it lists as (url, lastmod)
+    def _read_document(self, document_url):
+        self.documents_read += 1
+        child_sitemaps = []
+        try:
+            response = fetch_stream(document_url, max_bytes=Config.SITEMAP_MAX_BYTES)
+        except requests.exceptions.RequestException as e:
+            print(f"    Discovery could not fetch {document_url}: {e}")
+            return child_sitemaps
+        try:
+            stream = _open_document_stream(response, Config.SITEMAP_MAX_BYTES)
+            for kind, url, date_text in iter_document_entries(stream):
+                url = urljoin(document_url, url)
+                if kind == 'sitemap':
+                    child_sitemaps.append((url, parse_feed_date(date_text)))
+                else:
+                    self._offer(url, date_text)
+        except (etree.LxmlError, OSError, ValueError, EOFError, requests.exceptions.RequestException) as e:
+            print(f"    Discovery stopped reading {document_url}: {e}")
+        finally:
+            response.close()
+        return child_sitemaps
+
+    # Discovered (url, priority, published_iso), best first
+    def results(self):
+        return [(url, priority, published_iso)
+                for priority, _, url, published_iso in sorted(self._best, reverse=True)]
+
+def find_feed_links(page_url, document):
+    # RSS/Atom feeds advertised by a page through <link rel="alternate" type="...">
+    feed_links = []
+    for link_element in document.xpath('//link[@href]'):
+        rel = (link_element.get('rel') or '').lower().split()
+        link_type = (link_element.get('type') or '').lower()
+        if 'alternate' in rel and link_type in FEED_LINK_TYPES:
+            feed_links.append(urljoin(page_url, link_element.get('href')))
+    return feed_links
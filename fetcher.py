@@ -0,0 +1,195 @@
+import codecs
+import re
+import threading
+import requests
+from requests.compat import chardet
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import MaxRetryError
+from urllib3.util.retry import Retry
+
+from config import Config
+from metrics import time_stage
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# urllib3 only decodes brotli bodies when a brotli package is installed,
+# so only advertise 'br' when we can actually decode it.
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+# 503 (and 429) are not retried here: they mean "slow down", which is handled
+# per host by politeness.HostRateLimiter without blocking the worker thread.
+RETRY_STATUS_CODES = (500, 502, 504)
+
+class ResponseTooLargeError(requests.exceptions.RequestException):
+    pass
+
+CHARSET_RE = re.compile(r'charset\s*=\s*["\']?\s*([\w.:-]+)', re.I)
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.I)
+META_CHARSET_SNIFF_BYTES = 4096 # Browsers look for <meta charset> in the first 1024 bytes; some pages are sloppier
+
+def _encoding_name(label):
+    try:
+        name = codecs.lookup(label).name
+    except LookupError:
+        return None
+    return 'cp1252' if name == 'iso8859-1' else name # What browsers actually use for "ISO-8859-1"
+
+# Decodes an HTML body like a browser (and newspaper3k's own download) would:
+# a UTF-8 BOM, else the charset of the Content-Type header, else the page's
+# <meta charset> / http-equiv declaration, else UTF-8 when the bytes are valid
+# UTF-8, else the encoding detected from the bytes. (requests' response.text
+# assumes ISO-8859-1 for text/html without a charset, which turns UTF-8 pages
+# into "AÃ§Ã£o".)
+def decode_html(content, content_type=None):
+    if content.startswith(codecs.BOM_UTF8):
+        return content[len(codecs.BOM_UTF8):].decode('utf-8', errors='replace')
+    declared = CHARSET_RE.search(content_type or '')
+    encoding = _encoding_name(declared.group(1)) if declared else None
+    if encoding is None:
+        meta = META_CHARSET_RE.search(content[:META_CHARSET_SNIFF_BYTES])
+        encoding = _encoding_name(meta.group(1).decode('ascii')) if meta else None
+    if encoding is None:
+        try:
+            return content.decode('utf-8')
+        except UnicodeDecodeError:
+            encoding = _encoding_name(chardet.detect(content)['encoding'] or '') or 'cp1252'
+    return content.decode(encoding, errors='replace')
+
+# Connections that report the time to open them (DNS, TCP and TLS) as the
+# 'connect' stage (see metrics.py). Reused keep-alive connections skip it.
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        with time_stage('connect'):
+            super().connect()
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        with time_stage('connect'):
+            super().connect()
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+# One Session shared by every crawler thread. Its adapters keep a pool of
+# keep-alive connections per host, so consecutive pages of the same site reuse
+# the same TCP/TLS connection instead of handshaking again.
+_session = None
+_session_lock = threading.Lock()
+
+def _build_session():
+    retry = Retry(
+        total=Config.FETCH_MAX_RETRIES,
+        connect=Config.FETCH_MAX_RETRIES,
+        read=Config.FETCH_MAX_RETRIES,
+        status=Config.FETCH_MAX_RETRIES,
+        backoff_factor=Config.FETCH_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        respect_retry_after_header=False, # Else a 429/503 with Retry-After is retried after sleeping it out
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False # Let the caller see the final response and decide
+    )
+    adapter = HTTPAdapter(
+        pool_connections=Config.FETCH_POOL_CONNECTIONS, # Number of hosts to keep pools for
+        pool_maxsize=Config.FETCH_POOL_MAXSIZE,         # Connections kept alive per host
+        max_retries=retry
+    )
+    adapter.poolmanager.pool_classes_by_scheme = {'http': _TimedHTTPConnectionPool, 'https': _TimedHTTPSConnectionPool}
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({
+        'User-Agent': USER_AGENT,
+        'Accept-Encoding': ACCEPT_ENCODING,
+        'Connection': 'keep-alive'
+    })
+    return session
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+def close_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+# Fetch a URL through the shared pooled session.
+# Returns the requests.Response with its body already read (so .content and .text
+# work as usual). Raises ResponseTooLargeError when the body exceeds max_bytes.
+def fetch(url, headers=None, timeout=None, max_bytes=None):
+    timeout = timeout if timeout is not None else Config.FETCH_TIMEOUT
+    max_bytes = max_bytes if max_bytes is not None else Config.FETCH_MAX_RESPONSE_BYTES
+
+    response = get_session().get(url, headers=headers, timeout=timeout, stream=True)
+    try:
+        declared_length = response.headers.get('Content-Length')
+        if max_bytes and declared_length and declared_length.isdigit() and int(declared_length) > max_bytes:
+            raise ResponseTooLargeError(f"Response too large ({declared_length} bytes) for {url}")
+
+        # Read the (decompressed) body in chunks so an endless or huge response is cut off early
+        chunks = []
+        received = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            received += len(chunk)
+            if max_bytes and received > max_bytes:
+                raise ResponseTooLargeError(f"Response exceeded {max_bytes} bytes for {url}")
+            chunks.append(chunk)
+        response._content = b''.join(chunks)
+        response._content_consumed = True
+    finally:
+        # Hands the connection back to the pool (keep-alive) once the body is read
+        response.close()
+    return response
+
+# HTTP requests a fetch cost: one per redirect hop, plus the re-sends the Retry
+# policy made for each hop (RETRY_STATUS_CODES, resets, timeouts)
+def request_attempts(response):
+    attempts = 0
+    for hop in response.history + [response]:
+        retries = getattr(hop.raw, 'retries', None)
+        attempts += 1 + (len(retries.history) if retries is not None else 0)
+    return attempts
+
+# Same for a fetch that raised: giving up after retries means every one was sent
+def failed_request_attempts(error):
+    if error.args and isinstance(error.args[0], MaxRetryError):
+        return Config.FETCH_MAX_RETRIES + 1
+    return 1
+
+# Streaming variant of fetch for large documents (e.g. sitemaps): returns the
+# response without reading the body. The caller reads response.raw and must
+# close the response. Raises for HTTP errors and declared oversize bodies.
+def fetch_stream(url, headers=None, timeout=None, max_bytes=None):
+    timeout = timeout if timeout is not None else Config.FETCH_TIMEOUT
+    max_bytes = max_bytes if max_bytes is not None else Config.FETCH_MAX_RESPONSE_BYTES
+
+    response = get_session().get(url, headers=headers, timeout=timeout, stream=True)
+    try:
+        response.raise_for_status()
+        declared_length = response.headers.get('Content-Length')
+        if max_bytes and declared_length and declared_length.isdigit() and int(declared_length) > max_bytes:
+            raise ResponseTooLargeError(f"Response too large ({declared_length} bytes) for {url}")
+    except Exception:
+        response.close()
+        raise
+    response.raw.decode_content = True # Undo Content-Encoding (gzip/br) transparently
+    return response
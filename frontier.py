@@ -0,0 +1,141 @@
+import heapq
+import itertools
+import re
+from urllib.parse import urlsplit, urlunsplit, urldefrag, parse_qsl, urlencode, quote, unquote
+
+# Query parameters that only track where a click came from; they never change
+# the page, so they are dropped before a URL is queued.
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid',
+                   'ref', 'ref_src', 'ref_url', 'amp', 'outputtype', '_ga', 'cmpid'}
+TRACKING_PARAM_PREFIXES = ('utm_', 'pk_', 'mtm_')
+
+DEFAULT_PORTS = {'http': '80', 'https': '443'}
+PATH_SAFE_CHARS = "/:@!$&'()*+,;=~" # Left unescaped in paths, besides letters, digits and -._
+ENCODED_SLASH_RE = re.compile('%2f', re.IGNORECASE)
+
+# Canonical form used as the frontier's identity for a URL: lower-case scheme and
+# host, no default port, no fragment, no tracking parameters, sorted query
+# string, percent-encoded path (so "/ação" and "/a%C3%A7%C3%A3o" match) and no
+# trailing slash except on the root path. It only serves to
+# recognise the same page behind different links: it is not always a URL the
+# server answers without a redirect (e.g. WordPress permalinks end in a slash),
+# so the crawler fetches and stores the link as it was found.
+def canonicalize_url(url):
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    try:
+        port = parts.port
+    except ValueError: # Malformed port such as "host:abc"
+        port = None
+    netloc = host
+    if port is not None and str(port) != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{port}"
+    if parts.username:
+        netloc = f"{parts.username}{':' + parts.password if parts.password else ''}@{netloc}"
+
+    # Escapes normalised segment by segment, keeping an escaped '/' (%2F) escaped
+    path = '%2F'.join(quote(unquote(part), safe=PATH_SAFE_CHARS) for part in ENCODED_SLASH_RE.split(parts.path))
+    path = re.sub(r'/{2,}', '/', path) or '/'
+    if len(path) > 1 and path.endswith('/'):
+        path = path.rstrip('/') or '/'
+
+    query_params = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PARAM_PREFIXES)
+    ]
+    query = urlencode(sorted(query_params))
+
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+# --- Priority functions: higher scores are crawled first ---
+
+DATE_IN_PATH_RE = re.compile(r'/(19|20)\d{2}[/-](0?[1-9]|1[0-2])([/-]|$)|/(19|20)\d{2}(0[1-9]|1[0-2])([0-2]\d|3[01])(/|$)')
+ARTICLE_EXTENSION_RE = re.compile(r'\.(s?html?|ghtml|php|aspx?)$')
+NUMERIC_ID_RE = re.compile(r'\d{5,}')
+PAGINATION_RE = re.compile(r'/(page|pagina)/\d+|[?&](page|pagina)=\d+')
+
+# Favours URLs that look like individual articles (date segments, long slugs,
+# numeric ids) over section fronts and paginated listings, so the page budget
+# of a site is spent on pages that actually yield articles.
+def article_url_priority(url):
+    parts = urlsplit(url)
+    path = parts.path.lower()
+    segments = [segment for segment in path.split('/') if segment]
+    last_segment = segments[-1] if segments else ''
+
+    score = 0
+    if DATE_IN_PATH_RE.search(path):
+        score += 3
+    if last_segment.count('-') >= 3 or last_segment.count('_') >= 3:
+        score += 2 # Slug such as /prefeitura-anuncia-novas-obras
+    if ARTICLE_EXTENSION_RE.search(last_segment):
+        score += 1
+    if NUMERIC_ID_RE.search(last_segment):
+        score += 1
+    if len(segments) <= 1:
+        score -= 1 # Home page or a section front
+    if PAGINATION_RE.search(path + ('?' + parts.query if parts.query else '')):
+        score -= 2
+    return score
+
+# Breadth-first order, i.e. the crawler's behaviour before priorities existed
+def fifo_priority(url):
+    return 0
+
+PRIORITY_FUNCTIONS = {
+    'article': article_url_priority,
+    'fifo': fifo_priority
+}
+
+# Crawl frontier of one site: a heap ordered by priority (FIFO among equal
+# priorities) plus a hashed seen-set of canonical URLs, so push, pop and the
+# duplicate check are all O(log n) or better regardless of queue size. The
+# heap holds the URLs as they were pushed (without their #fragment).
+class CrawlFrontier:
+    SEED_PRIORITY = float('inf')
+
+    def __init__(self, priority_func=article_url_priority):
+        self.priority_func = priority_func
+        self._heap = [] # (-priority, sequence, url)
+        self._sequence = itertools.count()
+        self._seen = set()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __bool__(self):
+        return bool(self._heap)
+
+    def __contains__(self, url):
+        return canonicalize_url(url) in self._seen
+
+    # Queues url unless it (in canonical form) was queued before.
+    # Returns the queued URL if it was added, None otherwise.
+    def push(self, url, priority=None):
+        canonical_url = canonicalize_url(url)
+        if canonical_url in self._seen:
+            return None
+        self._seen.add(canonical_url)
+        return self._push(url, canonical_url, priority)
+
+    def _push(self, url, canonical_url, priority):
+        url = urldefrag(url.strip())[0]
+        if priority is None:
+            priority = self.priority_func(canonical_url)
+        heapq.heappush(self._heap, (-priority, next(self._sequence), url))
+        return url
+
+    def pop(self):
+        return heapq.heappop(self._heap)[2]
+
+    # Queues a URL that was already popped once (e.g. its host asked to slow
+    # down), bypassing the seen-set
+    def requeue(self, url, priority=None):
+        canonical_url = canonicalize_url(url)
+        self._seen.add(canonical_url)
+        self._push(url, canonical_url, priority)
+
+    # Marks a URL as known without queueing it (e.g. crawled in an earlier run)
+    def mark_seen(self, url):
+        self._seen.add(canonicalize_url(url))
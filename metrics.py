@@ -0,0 +1,220 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from config import Config
+
+# In-process crawl metrics.
+#
+# The crawl's hot path records into a few counters and histograms: time per
+# stage (see STAGES), HTTP status codes, fetch errors and body bytes per host.
+# /metrics renders them in the Prometheus text format; a run's JSON summary is
+# the difference between two snapshots (summary_since). Recording is a dict
+# update under a lock, cheap next to any of the stages it measures.
+
+# dns       DNS lookup (async engine only; the other engine counts it in connect)
+# connect   opening a new connection, DNS lookup and TLS handshake included
+#           (keep-alive reuse skips it)
+# download  a whole fetch: request, waiting for the server, reading the body
+# parse     newspaper3k extraction (in the parse pool)
+# links     outlink and feed extraction (in the parse pool)
+# fingerprint  SimHash of the article text (in the parse pool)
+# match     search term matching
+# dedup     near-duplicate lookup
+# db_write  one batch committed by the DB writer thread
+# archive   compressing and appending the page to the archive (archive.py)
+# wait      sleeping for the host's politeness delay
+# discovery reading sitemaps and feeds
+STAGES = ('dns', 'connect', 'download', 'parse', 'links', 'fingerprint', 'match', 'dedup', 'db_write', 'archive', 'wait', 'discovery')
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _format_labels(label_names, key, extra=()):
+    pairs = list(zip(label_names, key)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    type_name = 'counter'
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {} # label values tuple -> count
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render_samples(self):
+        return [f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}'
+                for key, value in sorted(self.snapshot().items())]
+
+class Histogram:
+    type_name = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._values = {} # label values tuple -> [per-bucket counts (last one is +Inf), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts_and_sum = self._values.get(key)
+            if counts_and_sum is None:
+                counts_and_sum = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts_and_sum[0][bucket] += 1
+            counts_and_sum[1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+
+    def render_samples(self):
+        lines = []
+        for key, (counts, total) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, key, [("le", le)])} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.label_names, key)} {cumulative}')
+        return lines
+
+    # Estimated q-quantile of a bucket count list, interpolating inside the
+    # bucket like Prometheus' histogram_quantile
+    def quantile(self, counts, q):
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        cumulative, lower = 0, 0.0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            if count and cumulative + count >= rank:
+                if bound == float('inf'):
+                    return lower # Past the last bucket: its lower bound is all we know
+                return lower + (bound - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = bound
+        return lower
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def counter(self, name, help_text, label_names=()):
+        return self._metrics.setdefault(name, Counter(name, help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=STAGE_BUCKETS):
+        return self._metrics.setdefault(name, Histogram(name, help_text, label_names, buckets))
+
+    # Prometheus text exposition format (version 0.0.4)
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.type_name}')
+            lines.extend(metric.render_samples())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+crawl_metrics = MetricsRegistry()
+stage_seconds = crawl_metrics.histogram('crawl_stage_seconds', 'Time spent in each crawl stage', ('stage',))
+http_responses = crawl_metrics.counter('crawl_http_responses_total', 'HTTP responses received, by host and status code', ('host', 'status'))
+fetch_errors = crawl_metrics.counter('crawl_fetch_errors_total', 'Fetches that got no response, by host and error type', ('host', 'error'))
+downloaded_bytes = crawl_metrics.counter('crawl_downloaded_bytes_total', 'Response body bytes read (after Content-Encoding decoding), by host', ('host',))
+pages_crawled = crawl_metrics.counter('crawl_pages_total', 'Pages taken from the frontier and fetched')
+articles_saved = crawl_metrics.counter('crawl_articles_saved_total', 'Articles matching the search terms queued for saving')
+db_operations = crawl_metrics.counter('crawl_db_operations_total', 'Operations committed by the DB writer, by kind', ('kind',))
+
+def observe_stage(stage, seconds):
+    stage_seconds.observe(seconds, stage=stage)
+
+@contextmanager
+def time_stage(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+def record_response(host, status_code, body_bytes=0):
+    http_responses.inc(host=host, status=status_code)
+    if body_bytes:
+        downloaded_bytes.inc(body_bytes, host=host)
+
+def record_fetch_error(host, error):
+    fetch_errors.inc(host=host, error=type(error).__name__)
+
+def _nested_counts(label_values):
+    nested = {}
+    for (first, second), value in label_values.items():
+        nested.setdefault(first, {})[second] = value
+    return nested
+
+# What happened between two crawl_metrics.snapshot()s, as plain JSON-able data
+def summary_since(before, after=None):
+    after = after if after is not None else crawl_metrics.snapshot()
+
+    def delta(name):
+        previous = before.get(name, {})
+        changes = {}
+        for key, value in after.get(name, {}).items():
+            if isinstance(value, tuple): # Histogram: (bucket counts, sum)
+                old_counts, old_total = previous.get(key, ([0] * len(value[0]), 0.0))
+                counts = [new - old for new, old in zip(value[0], old_counts)]
+                if sum(counts):
+                    changes[key] = (counts, value[1] - old_total)
+            elif value - previous.get(key, 0):
+                changes[key] = value - previous.get(key, 0)
+        return changes
+
+    stages = {}
+    for (stage,), (counts, total) in delta('crawl_stage_seconds').items():
+        count = sum(counts)
+        stages[stage] = {
+            'count': count,
+            'total_seconds': round(total, 3),
+            'mean_ms': round(total / count * 1000, 2),
+            'p50_ms': round(stage_seconds.quantile(counts, 0.5) * 1000, 2),
+            'p95_ms': round(stage_seconds.quantile(counts, 0.95) * 1000, 2)
+        }
+    return {
+        'stages': {stage: stages[stage] for stage in STAGES if stage in stages},
+        'pages': delta('crawl_pages_total').get((), 0),
+        'articles_saved': delta('crawl_articles_saved_total').get((), 0),
+        'http_responses': _nested_counts(delta('crawl_http_responses_total')),
+        'fetch_errors': _nested_counts(delta('crawl_fetch_errors_total')),
+        'downloaded_bytes': {host: value for (host,), value in delta('crawl_downloaded_bytes_total').items()},
+        'db_operations': {kind: value for (kind,), value in delta('crawl_db_operations_total').items()}
+    }
+
+# Writes a run report as RUN_REPORTS_DIR/<name>.json and returns its path
+def save_run_report(name, report):
+    os.makedirs(Config.RUN_REPORTS_DIR, exist_ok=True)
+    path = os.path.join(Config.RUN_REPORTS_DIR, f'{name}.json')
+    with open(path, 'w', encoding='utf-8') as report_file:
+        json.dump(report, report_file, indent=2, ensure_ascii=False)
+    return path
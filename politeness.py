@@ -0,0 +1,90 @@
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+MAX_BACKOFF_DELAY = 300 # Seconds, ceiling for the adaptive per-host delay
+THROTTLE_STATUS_CODES = (429, 503) # Responses that mean "slow down"
+
+# Parses a Retry-After header (delta-seconds or HTTP-date) into seconds from now.
+def parse_retry_after(value):
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+# Central next-allowed-time scheduler keyed by host.
+#
+# Every request to a host reserves a slot with try_acquire(); the host is then
+# unavailable until now + its delay. The delay is the robots.txt Crawl-delay
+# when known (default_delay otherwise), doubled on each 429/503 and decayed
+# back on success. A Retry-After header pushes the next slot further out.
+# Callers look at next_allowed_time() (the crawl scheduler) or await it (the
+# asyncio engine) instead of sleeping on a host.
+class HostRateLimiter:
+    def __init__(self, default_delay):
+        self.default_delay = default_delay
+        self._lock = threading.Lock()
+        self._next_allowed = {}  # host -> time.monotonic() of the next permitted request
+        self._crawl_delays = {}  # host -> Crawl-delay from robots.txt (None if not declared)
+        self._backoff = {}       # host -> multiplier applied after 429/503
+
+    def set_crawl_delay(self, host, crawl_delay):
+        with self._lock:
+            self._crawl_delays[host] = crawl_delay
+
+    def get_delay(self, host):
+        with self._lock:
+            return self._get_delay_locked(host)
+
+    def _get_delay_locked(self, host):
+        crawl_delay = self._crawl_delays.get(host)
+        base_delay = crawl_delay if crawl_delay is not None else self.default_delay
+        return min(MAX_BACKOFF_DELAY, base_delay * self._backoff.get(host, 1))
+
+    def next_allowed_time(self, host):
+        with self._lock:
+            return self._next_allowed.get(host, 0.0)
+
+    # Reserves the next request slot for host if it is free right now.
+    # Returns (True, now) on success, (False, next_allowed_time) otherwise.
+    def try_acquire(self, host):
+        with self._lock:
+            now = time.monotonic()
+            next_allowed = self._next_allowed.get(host, 0.0)
+            if next_allowed > now:
+                return False, next_allowed
+            self._next_allowed[host] = now + self._get_delay_locked(host)
+            return True, now
+
+    # Called on 429 Too Many Requests / 503 Service Unavailable.
+    def record_throttled(self, host, retry_after=None):
+        with self._lock:
+            self._backoff[host] = min(MAX_BACKOFF_DELAY, self._backoff.get(host, 1) * 2)
+            wait_for = self._get_delay_locked(host)
+            if retry_after is not None:
+                wait_for = max(wait_for, min(MAX_BACKOFF_DELAY, retry_after))
+            self._next_allowed[host] = max(self._next_allowed.get(host, 0.0), time.monotonic() + wait_for)
+
+    def record_success(self, host):
+        with self._lock:
+            backoff = self._backoff.get(host)
+            if backoff is not None:
+                if backoff <= 2:
+                    del self._backoff[host]
+                else:
+                    self._backoff[host] = backoff / 2
+
+    def reset(self):
+        with self._lock:
+            self._next_allowed.clear()
+            self._crawl_delays.clear()
+            self._backoff.clear()
@@ -0,0 +1,110 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+from contextlib import contextmanager, nullcontext
+
+from config import Config
+
+# Optional profiler of one crawl run (Config.CRAWL_PROFILER, or the 'profile'
+# field of /start_scrape):
+#   'cprofile'  deterministic profile of the crawl worker threads, merged and
+#               saved as a .prof file (open it with pstats or snakeviz)
+#   'sample'    a thread takes a stack sample of every other thread each
+#               CRAWL_PROFILE_INTERVAL seconds and saves the counts in the
+#               collapsed-stack format of flamegraph.pl / speedscope; much
+#               lower overhead, and it also sees threads cProfile is not
+#               attached to (DB writer, Flask)
+# The parse pool's processes are not covered by either; their time shows up
+# in the run report's parse/links stages (see metrics.py).
+
+PROFILERS = ('cprofile', 'sample')
+
+class RunProfiler:
+    def __init__(self, kind):
+        if kind not in PROFILERS:
+            raise ValueError(f"Unknown profiler {kind!r}, expected one of {PROFILERS}")
+        self.kind = kind
+        self._lock = threading.Lock()
+        self._stats = None # pstats.Stats merged from every profiled thread
+        self._stack_counts = {} # collapsed stack -> samples
+        self._stopped = threading.Event()
+        self._sampler = None
+        if kind == 'sample':
+            self._sampler = threading.Thread(target=self._sample_loop, name='crawl-profiler', daemon=True)
+            self._sampler.start()
+
+    # Profiles the calling thread for the duration of the block ('cprofile' only)
+    def thread(self):
+        if self.kind != 'cprofile':
+            return nullcontext()
+        return self._profile_thread()
+
+    @contextmanager
+    def _profile_thread(self):
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self._lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profile)
+                else:
+                    self._stats.add(profile)
+
+    def _sample_loop(self):
+        own_id = threading.get_ident()
+        while not self._stopped.wait(Config.CRAWL_PROFILE_INTERVAL):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                collapsed = ';'.join(reversed(stack))
+                self._stack_counts[collapsed] = self._stack_counts.get(collapsed, 0) + 1
+
+    # Stops profiling and writes RUN_REPORTS_DIR/<name>.prof or .folded.
+    # Returns the path, or None if nothing was recorded.
+    def stop(self, name):
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        os.makedirs(Config.RUN_REPORTS_DIR, exist_ok=True)
+        if self.kind == 'cprofile':
+            with self._lock:
+                if self._stats is None:
+                    return None
+                path = os.path.join(Config.RUN_REPORTS_DIR, f'{name}.prof')
+                self._stats.dump_stats(path)
+            return path
+        if not self._stack_counts:
+            return None
+        path = os.path.join(Config.RUN_REPORTS_DIR, f'{name}.folded')
+        with open(path, 'w', encoding='utf-8') as folded_file:
+            for stack, count in sorted(self._stack_counts.items(), key=lambda item: -item[1]):
+                folded_file.write(f"{stack} {count}\n")
+        return path
+
+    # Top functions by cumulative time ('cprofile') or by samples ('sample')
+    def top(self, limit=15):
+        if self.kind == 'cprofile':
+            with self._lock:
+                if self._stats is None:
+                    return ''
+                output = io.StringIO()
+                self._stats.stream = output
+                self._stats.sort_stats('cumulative').print_stats(limit)
+                return output.getvalue()
+        own_samples = {}
+        for stack, count in self._stack_counts.items():
+            leaf = stack.rsplit(';', 1)[-1]
+            own_samples[leaf] = own_samples.get(leaf, 0) + count
+        return '\n'.join(f"{count:>8}  {function}" for function, count in
+                         sorted(own_samples.items(), key=lambda item: -item[1])[:limit])
@@ -0,0 +1,125 @@
+import threading
+import time
+
+from config import Config
+from archive import read_record
+from database import close_db, get_archived_responses, update_scraper_progress_for_site
+from db_writer import get_db_writer
+from dedup import simhash
+from metrics import observe_stage
+from run_state import CrawlRun
+from scraper import SiteCrawl, extract_article_details_with_newspaper, get_parse_pool, finish_run
+
+# 'reprocess' scan mode: re-runs extraction and term matching over the latest
+# archived copy of every page of the selected sites (see archive.py), without
+# touching the network. Use it after changing the extraction, the search terms
+# or the dedup settings, instead of crawling every site again.
+#
+# Records are re-extracted in the parse pool; each task gets only the index
+# entry and reads and decompresses the record itself, so pages never cross
+# process boundaries. Results come back in order to one thread, which matches,
+# dedups and saves them through the same SiteCrawl.handle_article as a crawl
+# (saved articles are updated in place). The frontier and crawled_urls are
+# left alone, and articles that no longer match are not removed.
+
+CHUNK_SIZE = 16 # Records per parse pool task
+
+# Runs in the parse pool. Returns {'article', 'timings'} like parse_page, or
+# None if the record could not be read.
+def reextract_archived_page(url, segment, offset, length):
+    try:
+        html = read_record(segment, offset, length)['html']
+    except Exception as e:
+        print(f"    Could not read archived {url} ({segment}@{offset}): {e}")
+        return None
+    timings = {}
+    started = time.perf_counter()
+    article_data = extract_article_details_with_newspaper(url, html)
+    timings['parse'] = time.perf_counter() - started
+    if article_data:
+        started = time.perf_counter()
+        article_data['simhash'] = simhash(f"{article_data['title']}\n{article_data['content'] or ''}")
+        timings['fingerprint'] = time.perf_counter() - started
+    return {'article': article_data, 'timings': timings}
+
+# Same interface as crawl_scheduler.CrawlScheduler, for /start_scrape
+class ReprocessScheduler:
+    def __init__(self, app):
+        self.app = app
+        self._thread = None
+        self._pages_pending = 0
+        self._sites_pending = 0
+        self.run = None
+
+    # Must be called from inside an app context, like CrawlScheduler.start
+    def start(self, sites, search_terms, mode='reprocess', run=None):
+        self.run = run or CrawlRun(mode)
+        get_db_writer().flush() # Queued progress rows of a previous run must not overwrite the ones below
+        crawls, jobs = [], []
+        for site_info in sites:
+            crawl = SiteCrawl(site_info['id'], site_info['url'], search_terms, mode=mode, run=self.run)
+            archived_responses = get_archived_responses(crawl.site_id)
+            crawl.max_pages = len(archived_responses)
+            self.run.start_site(crawl.site_id, crawl.max_pages, crawl.base_url)
+            update_scraper_progress_for_site(crawl.site_id, 0, crawl.max_pages, status='running')
+            crawls.append(crawl)
+            jobs += [(crawl, archived_response) for archived_response in archived_responses]
+        self._pages_pending = len(jobs)
+        self._sites_pending = len(crawls)
+        print(f"--- Reprocessing {len(jobs)} archived pages of {len(crawls)} sites ---")
+
+        self._thread = threading.Thread(target=self._run, args=(crawls, jobs), name='reprocess', daemon=True)
+        self._thread.start()
+
+    def _run(self, crawls, jobs):
+        with self.app.app_context():
+            try:
+                with self.run.profile_thread():
+                    self._reprocess(jobs)
+            except Exception as e:
+                print(f"Reprocessing failed: {e}")
+            finally:
+                try:
+                    for crawl in crawls:
+                        crawl.finish()
+                    finish_run(self.run)
+                finally:
+                    self._sites_pending = 0
+                    close_db()
+
+    def _reprocess(self, jobs):
+        if not jobs:
+            return
+        records = list(zip(*(archived_response for _, archived_response in jobs))) # urls, segments, offsets, lengths
+        parse_pool = get_parse_pool()
+        if parse_pool is not None:
+            results = parse_pool.map(reextract_archived_page, *records, chunksize=CHUNK_SIZE)
+        else:
+            results = map(reextract_archived_page, *records)
+        try:
+            for (crawl, (url, _, _, _)), reextracted in zip(jobs, results):
+                if crawl.stop_requested():
+                    print("Reprocessing received global stop signal. Stopping.")
+                    break
+                self._pages_pending -= 1
+                crawl.pages_crawled_count += 1
+                crawl.report_progress()
+                if reextracted is None:
+                    continue
+                for stage, seconds in reextracted['timings'].items():
+                    observe_stage(stage, seconds)
+                crawl.handle_article(url, reextracted['article'])
+        finally:
+            if hasattr(results, 'close'):
+                results.close() # Cancels the pool's pending tasks after a stop
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def get_stats(self):
+        return {
+            'workers': max(Config.PARSE_PROCESSES, 1),
+            'active_workers': max(Config.PARSE_PROCESSES, 1) if self.is_running() else 0,
+            'queue_depth': self._pages_pending, # Archived pages still to reprocess
+            'sites_pending': self._sites_pending
+        }
@@ -0,0 +1,106 @@
+import threading
+import time
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+from config import Config
+from database import get_robots_txt, save_robots_txt
+from fetcher import fetch, USER_AGENT
+from frontier import canonicalize_url
+
+# robots.txt compliance layer.
+#
+# Each origin's robots.txt is fetched at most once per ROBOTS_CACHE_TTL: the
+# raw file is stored in the robots_cache table (so a new run or a restart does
+# not pay the round-trip again) and kept parsed in memory, so allow/deny checks
+# for every frontier URL are dictionary lookups plus RobotFileParser matching.
+#
+# Status handling follows RFC 9309: 2xx is parsed, 4xx means no restrictions,
+# 5xx or an unreachable server means "disallow everything" for a short while
+# (ROBOTS_ERROR_TTL) instead of the full TTL.
+
+class RobotsRules:
+    def __init__(self, origin, status_code, robots_txt, fetched_at):
+        self.origin = origin
+        self.status_code = status_code
+        self.fetched_at = fetched_at
+        self._parser = RobotFileParser()
+        if status_code is not None and 200 <= status_code < 300:
+            self._parser.parse((robots_txt or '').splitlines())
+        elif status_code is not None and 400 <= status_code < 500:
+            self._parser.allow_all = True
+        else:
+            self._parser.disallow_all = True
+        self._parser.modified() # RobotFileParser answers False to everything until this is set
+
+    def is_expired(self):
+        ttl = Config.ROBOTS_CACHE_TTL if self.status_code is not None and self.status_code < 500 else Config.ROBOTS_ERROR_TTL
+        return time.time() - self.fetched_at > ttl
+
+    def can_fetch(self, url):
+        return self._parser.can_fetch(USER_AGENT, url)
+
+    @property
+    def crawl_delay(self):
+        return self._parser.crawl_delay(USER_AGENT)
+
+    @property
+    def sitemaps(self):
+        return self._parser.site_maps() or []
+
+def origin_of(url):
+    parsed_url = urlparse(canonicalize_url(url))
+    return f"{parsed_url.scheme}://{parsed_url.netloc}"
+
+class RobotsCache:
+    def __init__(self):
+        self._rules = {} # origin -> RobotsRules
+        self._lock = threading.Lock()
+        self._origin_locks = {}
+
+    def _origin_lock(self, origin):
+        with self._lock:
+            return self._origin_locks.setdefault(origin, threading.Lock())
+
+    # Rules for the origin of url: from memory, then the DB, then the network.
+    # Needs an app context (the DB layer goes through get_db).
+    def get_rules(self, url):
+        origin = origin_of(url)
+        rules = self._rules.get(origin)
+        if rules is not None and not rules.is_expired():
+            return rules
+
+        # One fetch per origin even when several workers ask at once
+        with self._origin_lock(origin):
+            rules = self._rules.get(origin)
+            if rules is not None and not rules.is_expired():
+                return rules
+
+            stored = get_robots_txt(origin)
+            if stored is not None:
+                rules = RobotsRules(origin, stored['status_code'], stored['robots_txt'], stored['fetched_at'])
+            if rules is None or rules.is_expired():
+                rules = self._fetch_rules(origin)
+            self._rules[origin] = rules
+            return rules
+
+    def _fetch_rules(self, origin):
+        status_code, robots_txt = None, None
+        try:
+            response = fetch(f"{origin}/robots.txt")
+            status_code, robots_txt = response.status_code, response.text
+        except requests.exceptions.RequestException as e:
+            print(f"Could not read robots.txt for {origin}: {e}")
+        fetched_at = time.time()
+        save_robots_txt(origin, status_code, robots_txt, fetched_at)
+        return RobotsRules(origin, status_code, robots_txt, fetched_at)
+
+    # In-memory check; only rules already loaded with get_rules are consulted,
+    # anything else is allowed (get_rules is called when a site's crawl starts).
+    def is_allowed(self, url):
+        rules = self._rules.get(origin_of(url))
+        return rules is None or rules.can_fetch(url)
+
+robots_cache = RobotsCache()
@@ -0,0 +1,182 @@
+import queue
+import threading
+import time
+from contextlib import nullcontext
+
+from config import Config
+from metrics import crawl_metrics, summary_since, save_run_report
+from profiling import RunProfiler
+
+# In-process state of the current crawl run.
+#
+# Crawl workers update per-site counters here and check the run's stop Event
+# on every page; /scraper_status and /stop_scrape read and signal through it.
+# None of that touches SQLite: site_scraping_progress is only checkpointed
+# every RUN_STATE_CHECKPOINT_INTERVAL seconds per site (and when a site
+# finishes), see SiteCrawl.report_progress.
+#
+# Saved articles and run start/end are also published as events to the
+# subscribers of the registry (the /scraper_events SSE streams). When the run
+# finishes, its report (stage timings, HTTP statuses, errors, bytes; see
+# metrics.summary_since) is saved to RUN_REPORTS_DIR along with the output of
+# the run's profiler, if it has one.
+
+# 'default' crawls only URLs not seen before; 'incremental' re-checks known
+# pages with conditional requests and re-parses only the ones that changed;
+# 'reprocess' re-extracts the archived pages without fetching anything (see
+# reprocess.py)
+SCAN_MODES = ('default', 'incremental', 'reprocess')
+
+class CrawlRun:
+    # mode is one of SCAN_MODES; publish(event_type, data) receives the run's events (see RunRegistry.publish);
+    # profiler is one of profiling.PROFILERS, or None
+    def __init__(self, mode='default', publish=None, profiler=None):
+        self.mode = mode
+        self._publish = publish or (lambda event_type, data: None)
+        self.started_at = time.time()
+        self.finished_at = None
+        self.metrics_start = crawl_metrics.snapshot()
+        self.profiler = RunProfiler(profiler) if profiler else None
+        self.report_path = None
+        self.profile_path = None
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._sites = {} # site_id -> {'site_id', 'site_url', 'status', 'pages_crawled', 'max_pages_to_crawl', 'articles_saved'}
+        self._last_checkpoint = {} # site_id -> time.monotonic() of the last DB checkpoint
+
+    def start_site(self, site_id, max_pages, site_url=None):
+        with self._lock:
+            self._sites[site_id] = {'site_id': site_id, 'site_url': site_url, 'status': 'running', 'pages_crawled': 0,
+                                    'max_pages_to_crawl': max_pages, 'articles_saved': 0}
+            self._last_checkpoint[site_id] = time.monotonic()
+
+    def update_site(self, site_id, pages_crawled=None, status=None):
+        with self._lock:
+            site = self._sites[site_id]
+            if pages_crawled is not None:
+                site['pages_crawled'] = pages_crawled
+            if status is not None:
+                site['status'] = status
+
+    def record_article(self, site_id, title, url, matched_terms=()):
+        with self._lock:
+            self._sites[site_id]['articles_saved'] += 1
+        self._publish('article', {'site_id': site_id, 'title': title, 'url': url, 'matched_terms': list(matched_terms)})
+
+    # True (and the timer restarts) when the site's progress should be written to the DB again
+    def checkpoint_due(self, site_id):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_checkpoint.get(site_id, 0.0) < Config.RUN_STATE_CHECKPOINT_INTERVAL:
+                return False
+            self._last_checkpoint[site_id] = now
+            return True
+
+    def request_stop(self):
+        self.stop_event.set()
+
+    def stop_requested(self):
+        return self.stop_event.is_set()
+
+    # Wraps the work of a crawl thread, so the run's profiler (if any) sees it
+    def profile_thread(self):
+        return self.profiler.thread() if self.profiler else nullcontext()
+
+    def finish(self):
+        self.finished_at = time.time()
+        name = time.strftime('run-%Y%m%d-%H%M%S', time.localtime(self.started_at))
+        if self.profiler:
+            self.profile_path = self.profiler.stop(name)
+            print(f"Run profile ({self.profiler.kind}) saved to {self.profile_path}\n{self.profiler.top(10)}")
+        if Config.RUN_REPORTS_DIR:
+            self.report_path = save_run_report(name, self.report())
+            print(f"Run report saved to {self.report_path}")
+        self._publish('finished', self.snapshot())
+
+    def is_finished(self):
+        return self.finished_at is not None
+
+    # Status of the run for /scraper_status, from memory
+    def snapshot(self):
+        with self._lock:
+            sites = [dict(site) for site in self._sites.values()]
+        running_sites = [site for site in sites if site['status'] == 'running']
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        total_pages = sum(site['pages_crawled'] for site in sites)
+        if self.is_finished():
+            status = 'stopped'
+        elif self.stop_requested():
+            status = 'stopping'
+        else:
+            status = 'running'
+        return {
+            'status': status,
+            'pages_crawled': sum(site['pages_crawled'] for site in running_sites),
+            'max_pages': sum(site['max_pages_to_crawl'] for site in running_sites),
+            'articles_saved': sum(site['articles_saved'] for site in sites),
+            'pages_per_sec': round(total_pages / elapsed, 2) if elapsed > 0 else 0.0,
+            'individual_sites': sites
+        }
+
+    # Summary of the run (so far, while it is running), as saved by finish()
+    def report(self):
+        snapshot = self.snapshot()
+        sites = snapshot['individual_sites']
+        finished_at = self.finished_at or time.time()
+        return {
+            'mode': self.mode,
+            'status': snapshot['status'],
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+            'duration_seconds': round(finished_at - self.started_at, 2),
+            'pages_crawled': sum(site['pages_crawled'] for site in sites),
+            'articles_saved': snapshot['articles_saved'],
+            'pages_per_sec': snapshot['pages_per_sec'],
+            'sites': sites,
+            'metrics': summary_since(self.metrics_start),
+            'profile': self.profile_path
+        }
+
+# Holds the run started last by /start_scrape (None before the first one) and
+# fans its events out to subscribers, each with its own bounded queue so a
+# slow client only loses its own events.
+class RunRegistry:
+    SUBSCRIBER_QUEUE_SIZE = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.current_run = None
+        self._subscribers = set()
+
+    def start_run(self, mode='default', profiler=None):
+        with self._lock:
+            self.current_run = CrawlRun(mode, publish=self.publish, profiler=profiler)
+        self.publish('started', {'mode': mode})
+        return self.current_run
+
+    def subscribe(self):
+        subscription = queue.Queue(maxsize=self.SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event_type, data):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait((event_type, data))
+            except queue.Full:
+                pass # That client is not reading; it still gets the periodic status
+
+    def stop_current_run(self):
+        run = self.current_run
+        if run is not None and not run.is_finished():
+            run.request_stop()
+            return True
+        return False
+
+run_registry = RunRegistry()
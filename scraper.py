@@ -1,41 +1,142 @@
 import requests
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
 from urllib.parse import urljoin, urlparse
-from datetime import datetime
 import time
 from newspaper import Article, ArticleException
-import re
+import hashlib
+import threading
+import asyncio
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
-# For accessing Flask app context in the thread
-from flask import current_app
+try:
+    import aiohttp # Only needed by the asyncio engine (Config.CRAWL_ENGINE = 'async')
+except ImportError:
+    aiohttp = None
+
+from config import Config
+from fetcher import fetch, decode_html, request_attempts, failed_request_attempts, USER_AGENT, ACCEPT_ENCODING, RETRY_STATUS_CODES, ResponseTooLargeError
+from politeness import HostRateLimiter, parse_retry_after, THROTTLE_STATUS_CODES
+from frontier import CrawlFrontier, canonicalize_url, PRIORITY_FUNCTIONS
+from discovery import SiteDiscovery, find_feed_links
+from robots import robots_cache
+from term_matcher import get_term_matcher
+from dedup import simhash, to_signed64, find_near_duplicate
+from db_writer import get_db_writer
+from archive import response_archive
+from run_state import CrawlRun
+from metrics import time_stage, observe_stage, record_response, record_fetch_error, pages_crawled, articles_saved
 
 # Import DB functions within the thread
-from database import get_db, add_article, get_scraper_status, set_scraper_status, update_scraper_progress_for_site
+from database import set_scraper_status, update_scraper_progress_for_site, \
+                     get_crawled_urls, get_pending_frontier, get_page_validators, add_frontier_urls
 
 MAX_PAGES_PER_SITE = 50 # Limit the number of pages to crawl per site to prevent endless crawling
-CRAWL_DELAY = 1 # Seconds to wait between requests to the same domain
+CRAWL_DELAY = 1 # Seconds to wait between requests to the same domain (unless robots.txt sets a Crawl-delay)
+
+# Shared by every crawl of this process, so two sites on the same host
+# (e.g. example.com/a and example.com/b) are throttled together.
+host_rate_limiter = HostRateLimiter(CRAWL_DELAY)
 
-# Dictionary to store crawled URLs per site to avoid re-scraping in the SAME RUN.
-# This is in-memory. For persistence across app restarts, you would store this in DB.
+# In-memory cache of the URLs already crawled per site. It is loaded from the
+# crawled_urls table when a site's crawl starts, so pages visited in earlier
+# runs (or before a restart) are not fetched again.
 _crawled_urls_per_site_session = {}
 
-def get_html(url):
+# Counters to confirm each crawled page costs exactly one HTTP fetch.
+# 'fetches' counts every request sent (redirect hops and retries included),
+# bumped by fetch_page and the async fetch; 'pages' by the crawl loop.
+_fetch_stats = {'fetches': 0, 'pages': 0}
+_fetch_stats_lock = threading.Lock()
+
+def _count_fetch_stat(key, amount=1):
+    with _fetch_stats_lock:
+        _fetch_stats[key] += amount
+
+def get_fetch_stats():
+    with _fetch_stats_lock:
+        fetches = _fetch_stats['fetches']
+        pages = _fetch_stats['pages']
+    return {
+        'fetches': fetches,
+        'pages': pages,
+        'fetches_per_page': round(fetches / pages, 2) if pages else 0.0
+    }
+
+def reset_fetch_stats():
+    with _fetch_stats_lock:
+        _fetch_stats['fetches'] = 0
+        _fetch_stats['pages'] = 0
+
+def _record_response_for_politeness(url, status_code, headers):
+    host = urlparse(url).netloc
+    if status_code in THROTTLE_STATUS_CODES:
+        # Server asked us to slow down: push this host's next slot out
+        host_rate_limiter.record_throttled(host, parse_retry_after(headers.get('Retry-After')))
+    elif status_code < 400:
+        host_rate_limiter.record_success(host)
+
+# url is where the response came from, i.e. the requested URL after redirects
+def _fetched_page(url, status_code, html_content, headers):
+    return {
+        'url': url,
+        'status_code': status_code,
+        'html': html_content, # None on 304 Not Modified and on 429/503
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified')
+    }
+
+# Fetches url, optionally with conditional headers (see SiteCrawl.conditional_headers).
+# Returns a dict with url (after redirects), status_code, html, etag and
+# last_modified, or None on error. A 429/503 is returned without a body, so the caller can retry the page later.
+def fetch_page(url, headers=None):
+    host = urlparse(url).netloc
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=15)
+        with time_stage('download'):
+            response = fetch(url, headers=headers) # Pooled keep-alive session with retries (see fetcher.py)
+        _count_fetch_stat('fetches', request_attempts(response)) # Redirects and retries cost a request each
+        record_response(host, response.status_code, len(response.content))
+        _record_response_for_politeness(url, response.status_code, response.headers)
+        if response.status_code == 304 or response.status_code in THROTTLE_STATUS_CODES:
+            return _fetched_page(response.url if response.history else url, response.status_code, None, response.headers)
         response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
-        return response.text
+        html_content = decode_html(response.content, response.headers.get('Content-Type'))
+        return _fetched_page(response.url if response.history else url, response.status_code, html_content, response.headers)
     except requests.exceptions.RequestException as e:
+        if not isinstance(e, requests.exceptions.HTTPError): # Those were counted by status code
+            _count_fetch_stat('fetches', failed_request_attempts(e))
+            record_fetch_error(host, e)
         print(f"Error fetching {url}: {e}")
         return None
 
-def extract_article_details_with_newspaper(article_url):
+def get_html(url):
+    fetched_page = fetch_page(url)
+    return fetched_page['html'] if fetched_page else None
+
+def content_hash(html_content):
+    return hashlib.sha1(html_content.encode('utf-8', 'replace')).hexdigest()
+
+def extract_article_details_with_newspaper(article_url, html_content=None):
+    if html_content is None:
+        # Go through the shared fetcher rather than newspaper's own requests.get
+        html_content = get_html(article_url)
+        if not html_content:
+            return None
+    article_data, _ = _extract_with_newspaper(article_url, html_content)
+    return article_data
+
+# Returns (article_data, document) where document is the untouched lxml tree
+# newspaper3k built from the HTML (None if parsing failed), so callers can
+# reuse it instead of parsing the page a second time.
+def _extract_with_newspaper(article_url, html_content):
+    article = None
     try:
         # Pass article_url and a language for better parsing
-        article = Article(article_url, language='pt')
-        article.download() # Downloads the article's HTML
+        # fetch_images=False: newspaper would otherwise download candidate images with its own requests
+        article = Article(article_url, language='pt', fetch_images=False)
+        # Reuse the HTML already fetched by get_html instead of downloading the page again
+        article.download(input_html=html_content)
         article.parse()    # Parses the HTML to extract content
 
         title = article.title if article.title else 'Título Não Encontrado'
@@ -43,114 +144,649 @@ def extract_article_details_with_newspaper(article_url):
         # Convert datetime object to ISO format string for consistent storage in DB
         published_date = article.publish_date.isoformat() if article.publish_date else None
 
-        return {'title': title, 'content': content, 'published_date': published_date, 'url': article_url}
-    except ArticleException as e:
-        # print(f"Error extracting with newspaper3k from {article_url}: {e}") # Keep this for debugging if needed
-        return None # Return None if newspaper3k fails to extract a valid article
+        return {'title': title, 'content': content, 'published_date': published_date, 'url': article_url}, article.clean_doc
+    except ArticleException:
+        return None, None # Return None if newspaper3k fails to extract a valid article
     except Exception as e:
         print(f"General error with newspaper3k on {article_url}: {e}")
+        # clean_doc is a copy taken before newspaper's own cleaning, so it is still usable
+        return None, getattr(article, 'clean_doc', None)
+
+def _html_document(page_url, html_content):
+    if not html_content:
         return None
+    try:
+        return lxml.html.fromstring(html_content)
+    except (etree.ParserError, ValueError) as e:
+        print(f"    Could not parse links of {page_url}: {e}")
+        return None
+
+def extract_outlinks(page_url, html_content=None, document=None):
+    # Absolute URLs of every <a href> in the page, in document order, without duplicates.
+    # Reads the lxml tree newspaper3k already built when given one; otherwise parses
+    # html_content with lxml (much faster than BeautifulSoup's html.parser).
+    if document is None:
+        document = _html_document(page_url, html_content)
+        if document is None:
+            return []
+
+    # Relative links resolve against <base href> when the page declares one
+    link_base_url = page_url
+    base_hrefs = document.xpath('//base/@href')
+    if base_hrefs and base_hrefs[0].strip():
+        link_base_url = urljoin(page_url, base_hrefs[0].strip())
+
+    outlinks = []
+    seen = set()
+    for href in document.xpath('//a/@href'):
+        full_url = urljoin(link_base_url, href.strip())
+        if full_url not in seen:
+            seen.add(full_url)
+            outlinks.append(full_url)
+    return outlinks
 
-def scrape_website_threaded(app_context, site_id, base_url, search_terms):
-    with app_context: # Activate Flask app context for DB operations within this thread
-        print(f"\n--- Thread started for site: {base_url} (ID: {site_id}) ---")
-        print(f"Search terms for this run: {search_terms}")
-        
-        if site_id not in _crawled_urls_per_site_session:
-            _crawled_urls_per_site_session[site_id] = set()
+# Parse/extract stage of the pipeline: everything CPU-bound about a page.
+# Runs in a worker process (see get_parse_pool), so it only takes and returns
+# plain picklable data: the article fields, the page's outlinks and the
+# RSS/Atom feeds it advertises.
+def parse_page(page_url, html_content):
+    # Stage timings travel back with the result (the pool's processes have their own metrics)
+    timings = {}
+    started = time.perf_counter()
+    # The single fetched response feeds newspaper3k, and newspaper's lxml tree feeds the link extractor
+    article_data, document = _extract_with_newspaper(page_url, html_content)
+    if document is None:
+        document = _html_document(page_url, html_content)
+    timings['parse'] = time.perf_counter() - started
+    if article_data:
+        started = time.perf_counter()
+        # Fingerprinted here, in the parse pool, rather than on the crawl worker
+        article_data['simhash'] = simhash(f"{article_data['title']}\n{article_data['content'] or ''}")
+        timings['fingerprint'] = time.perf_counter() - started
+    started = time.perf_counter()
+    outlinks = extract_outlinks(page_url, document=document) if document is not None else []
+    feeds = find_feed_links(page_url, document) if document is not None else []
+    timings['links'] = time.perf_counter() - started
+    return {
+        'article': article_data,
+        'outlinks': outlinks,
+        'feeds': feeds,
+        'timings': timings
+    }
 
-        crawled_urls_for_site = _crawled_urls_per_site_session[site_id]
-        to_crawl_urls = [base_url] # Start crawling from the base URL
-        parsed_base_netloc = urlparse(base_url).netloc # Get the domain for internal links filtering
+# Process pool for parse_page, created on first use. 'spawn' is used because
+# the crawler forks from a multi-threaded Flask process, where 'fork' can
+# deadlock on locks held by other threads.
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
 
-        pages_crawled_count = 0
+def get_parse_pool():
+    global _parse_pool
+    if Config.PARSE_PROCESSES <= 0:
+        return None # Parse in the calling thread
+    if _parse_pool is None:
+        with _parse_pool_lock:
+            if _parse_pool is None:
+                _parse_pool = ProcessPoolExecutor(max_workers=Config.PARSE_PROCESSES,
+                                                  mp_context=multiprocessing.get_context('spawn'))
+    return _parse_pool
+
+def shutdown_parse_pool():
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=True)
+            _parse_pool = None
+
+def parse_page_in_pool(page_url, html_content):
+    parse_pool = get_parse_pool()
+    if parse_pool is None:
+        return parse_page(page_url, html_content)
+    return parse_pool.submit(parse_page, page_url, html_content).result()
+
+# Crawl state of one site. The crawl is advanced one page at a time through
+# crawl_next_page(), so the shared worker pool in crawl_scheduler.py can
+# interleave many sites; the asyncio engine below drives it step by step too.
+class SiteCrawl:
+    # mode is one of SCAN_MODES: 'default' skips URLs crawled in earlier runs,
+    # 'incremental' revisits them with conditional requests and only re-parses
+    # pages that changed. run is the run_state.CrawlRun the site belongs to
+    # (progress counters and stop signal); a standalone crawl gets its own.
+    def __init__(self, site_id, base_url, search_terms, max_pages=None, mode='default', run=None):
+        self.site_id = site_id
+        self.run = run or CrawlRun(mode)
+        self.base_url = base_url
+        self.search_terms = search_terms
+        self.term_matcher = get_term_matcher(search_terms) # Shared by every site crawling the same terms
+        self.max_pages = max_pages or MAX_PAGES_PER_SITE # Read at crawl time, so benchmarks can raise it
+        self.mode = mode
+        self.page_validators = {} # canonical url -> ETag/Last-Modified/content hash from the last fetch
+
+        # Canonical forms of the crawled URLs (see frontier.canonicalize_url);
+        # pages are fetched and stored under the URL they were found with
+        self.crawled_urls_for_site = _crawled_urls_per_site_session.setdefault(site_id, set())
+        # Priority queue + seen-set of canonical URLs (see frontier.py)
+        self.frontier = CrawlFrontier(PRIORITY_FUNCTIONS.get(Config.FRONTIER_PRIORITY, PRIORITY_FUNCTIONS['article']))
+        # Seeds are entry pages whose links change between runs, so they are
+        # fetched on every scan even though they were crawled before (canonical forms)
+        self.seed_urls = {canonicalize_url(base_url)}
+        self.parsed_base_netloc = urlparse(canonicalize_url(base_url)).netloc # Get the domain for internal links filtering
+        self.host = self.parsed_base_netloc # Key used by host_rate_limiter
+        self.pages_crawled_count = 0
+        self.discovered_dates = {} # url -> lastmod/pubDate found by the discovery stage
+        self.robots_rules = None # robots.RobotsRules of the site, loaded by load_robots
+        self.sitemaps_discovered = False
+        self.feeds_discovered = False
+        self.discoveries = [] # SiteDiscovery walks with documents left to read, oldest first
+        self.throttled_retries = {} # url -> times it was re-queued after a 429/503 this run
+
+    def start(self):
+        print(f"\n--- Crawl started for site: {self.base_url} (ID: {self.site_id}) ---")
+        print(f"Search terms for this run: {self.search_terms}")
+
+        # Load the persisted crawl state: URLs visited in earlier runs are skipped,
+        # and URLs still pending from an interrupted/over-budget run are resumed
+        crawled_urls = get_crawled_urls(self.site_id)
+        self.crawled_urls_for_site.update(canonicalize_url(url) for url in crawled_urls)
+        self.frontier.push(self.base_url, priority=CrawlFrontier.SEED_PRIORITY) # Start crawling from the base URL
+        pending_urls = get_pending_frontier(self.site_id)
+        for pending_url, priority, lastmod, attempts in pending_urls:
+            if lastmod:
+                self.discovered_dates[pending_url] = lastmod
+            if attempts >= Config.FRONTIER_MAX_ATTEMPTS:
+                self.frontier.mark_seen(pending_url) # Failed too often; not even links to it are followed
+            elif not self.is_crawled(pending_url):
+                self.frontier.push(pending_url, priority=priority)
+        if pending_urls:
+            print(f"  Resuming {len(self.frontier) - len(self.seed_urls)} pending URLs, {len(self.crawled_urls_for_site)} already crawled")
+
+        self.page_validators = {canonicalize_url(url): validators
+                                for url, validators in get_page_validators(self.site_id).items()}
+        if self.mode == 'incremental':
+            # Re-check every known page; unchanged ones cost a 304 and no parsing
+            for crawled_url in crawled_urls:
+                self.frontier.push(crawled_url)
 
         # Initial progress update for this specific site
-        # Status 'running' is default, and max_pages_to_crawl is MAX_PAGES_PER_SITE for this site
-        update_scraper_progress_for_site(site_id, 0, MAX_PAGES_PER_SITE, status='running')
+        # Status 'running' is default, and max_pages_to_crawl is max_pages for this site.
+        # Written directly (not through the DB writer) so the global status reads
+        # 'running' as soon as start_scrape returns; queued rows of a previous run
+        # are committed first so they cannot overwrite it.
+        get_db_writer().flush()
+        self.run.start_site(self.site_id, self.max_pages, self.base_url)
+        update_scraper_progress_for_site(self.site_id, 0, self.max_pages, status='running')
 
-        try: # Added try-finally to ensure progress is updated on exit
-            while to_crawl_urls and pages_crawled_count < MAX_PAGES_PER_SITE:
-                # Check for global stop signal from the database
-                if get_scraper_status()['status'] == 'stopped': # Get 'status' key from the dict
-                    print(f"Scraper for {base_url} received global stop signal. Stopping.")
-                    break
+    def has_work(self):
+        return bool(self.discoveries) or bool(self.frontier) and self.pages_crawled_count < self.max_pages
 
-                current_url = to_crawl_urls.pop(0)
+    def is_crawled(self, url):
+        return canonicalize_url(url) in self.crawled_urls_for_site
 
-                if current_url in crawled_urls_for_site:
-                    print(f"  Skipping already crawled in this session: {current_url}")
-                    continue
+    # Takes the next step of the crawl, making at most one request: loading
+    # robots.txt, reading a sitemap/feed document, or processing the next URL
+    # of the frontier. Returns True if the network was (or may have been)
+    # used, False if a URL was skipped without touching it. Politeness is the
+    # caller's job (see host_rate_limiter).
+    def crawl_next_page(self):
+        if self.robots_rules is None:
+            self.load_robots()
+            return True
+        if not self.sitemaps_discovered:
+            self.discover_from_sitemaps()
+        if self.discoveries:
+            self.discover_next_document()
+            return True
+
+        current_url = self.next_url()
+        if current_url is None:
+            return False
+
+        fetched_page = fetch_page(current_url, self.conditional_headers(current_url))
+        self.process_page(current_url, fetched_page)
+        return True
+
+    # Loads the site's robots.txt rules (cached per origin, see robots.py) once
+    # per run: Crawl-delay goes to host_rate_limiter, Sitemap: entries to discovery
+    def load_robots(self):
+        self.robots_rules = robots_cache.get_rules(self.base_url)
+        crawl_delay = self.robots_rules.crawl_delay
+        if crawl_delay is not None:
+            print(f"  Using Crawl-delay of {crawl_delay}s for {self.host}")
+        host_rate_limiter.set_crawl_delay(self.host, crawl_delay)
+
+    # Discovery stage: seeds the frontier from the sitemaps declared in robots.txt
+    # (or /sitemap.xml), once per run. Requires load_robots to have run. Only
+    # queues the documents; see discover_next_document.
+    def discover_from_sitemaps(self):
+        self.sitemaps_discovered = True
+        if not Config.DISCOVERY_ENABLED:
+            return
+        sitemap_urls = self.robots_rules.sitemaps or [f"{urlparse(self.base_url).scheme}://{self.host}/sitemap.xml"]
+        self._start_discovery(sitemap_urls=sitemap_urls)
+
+    # Seeds the frontier from the RSS/Atom feeds advertised by a seed page, once per run
+    def discover_from_feeds(self, feed_urls):
+        self.feeds_discovered = True
+        if not Config.DISCOVERY_ENABLED:
+            return
+        self._start_discovery(feed_urls=feed_urls)
+
+    def _start_discovery(self, sitemap_urls=(), feed_urls=()):
+        site_discovery = SiteDiscovery(self.base_url, self.frontier.priority_func)
+        site_discovery.add_documents(sitemap_urls, feed_urls)
+        if site_discovery.has_pending():
+            self.discoveries.append(site_discovery)
+
+    # Reads one sitemap/feed document (one request, scheduled by the caller like
+    # a page fetch). When a walk has nothing left to read, its best URLs go to
+    # the frontier.
+    def discover_next_document(self):
+        site_discovery = self.discoveries[0]
+        with time_stage('discovery'):
+            site_discovery.read_next_document()
+            if not site_discovery.has_pending():
+                self.discoveries.pop(0)
+                self._queue_discovered_urls(site_discovery)
+
+    def _queue_discovered_urls(self, site_discovery):
+        new_frontier_urls = []
+        for url, priority, lastmod in site_discovery.results():
+            if lastmod:
+                self.discovered_dates[url] = lastmod
+            if self.is_crawled(url) and self.mode != 'incremental':
+                continue
+            if not robots_cache.is_allowed(url):
+                continue
+            if self.frontier.push(url, priority=priority):
+                new_frontier_urls.append((url, priority, lastmod))
+        if new_frontier_urls:
+            add_frontier_urls(self.site_id, new_frontier_urls)
+        print(f"  Discovery queued {len(new_frontier_urls)} URLs from {site_discovery.documents_read} sitemap/feed documents for {self.base_url}")
+
+    # Pops the next URL to fetch and counts it against the page budget.
+    # Returns None if the popped URL was already crawled.
+    def next_url(self):
+        current_url = self.frontier.pop() # Highest-priority URL
+        canonical_url = canonicalize_url(current_url)
+
+        # Incremental scans queue known URLs on purpose (each once per run, thanks to the frontier's seen-set)
+        if canonical_url in self.crawled_urls_for_site and canonical_url not in self.seed_urls and self.mode != 'incremental':
+            print(f"  Skipping already crawled: {current_url}")
+            return None
+        # Seeds and URLs resumed from an earlier run were queued before robots.txt was read
+        if not robots_cache.is_allowed(current_url):
+            print(f"  Skipping, disallowed by robots.txt: {current_url}")
+            return None
+
+        # Increment and update progress for this site BEFORE processing the page
+        # This makes the progress bar smoother and updates for each page attempt
+        self.pages_crawled_count += 1
+        self.report_progress()
+
+        print(f"  Crawling ({self.pages_crawled_count}/{self.max_pages}): {current_url}")
+        self.crawled_urls_for_site.add(canonical_url) # Mark this URL as crawled for the current session
+        _count_fetch_stat('pages')
+        pages_crawled.inc()
+        return current_url
 
-                # Increment and update progress for this site BEFORE processing the page
-                # This makes the progress bar smoother and updates for each page attempt
-                pages_crawled_count += 1
-                update_scraper_progress_for_site(site_id, pages_crawled_count, MAX_PAGES_PER_SITE, status='running') 
-
-                print(f"  Crawling ({pages_crawled_count}/{MAX_PAGES_PER_SITE}): {current_url}")
-                crawled_urls_for_site.add(current_url) # Mark this URL as crawled for the current session
-                
-                html_content = get_html(current_url)
-                if not html_content:
-                    print(f"    Failed to fetch HTML for {current_url}. Skipping processing and links extraction.")
-                    time.sleep(CRAWL_DELAY)
+    # Progress goes to the run's in-memory counters on every page and to the
+    # site_scraping_progress table only every RUN_STATE_CHECKPOINT_INTERVAL
+    # seconds, or always when status is given (i.e. the site is done).
+    def report_progress(self, status=None):
+        self.run.update_site(self.site_id, self.pages_crawled_count, status)
+        if status is not None or self.run.checkpoint_due(self.site_id):
+            get_db_writer().update_progress(self.site_id, self.pages_crawled_count, self.max_pages, status=status or 'running')
+
+    def stop_requested(self):
+        return self.run.stop_requested()
+
+    # If-None-Match / If-Modified-Since from the last fetch of url, if any
+    def conditional_headers(self, current_url):
+        validators = self.page_validators.get(canonicalize_url(current_url))
+        headers = {}
+        if validators:
+            if validators['etag']:
+                headers['If-None-Match'] = validators['etag']
+            if validators['last_modified']:
+                headers['If-Modified-Since'] = validators['last_modified']
+        return headers
+
+    # True when the page has not changed since its last crawl: the server said
+    # 304 Not Modified, or the body hashes to the same value. The page is then
+    # checkpointed without being parsed.
+    def is_unchanged(self, current_url, fetched_page):
+        previous = self.page_validators.get(canonicalize_url(current_url))
+        if fetched_page['status_code'] == 304:
+            print(f"    Not modified since last crawl (304): {current_url}")
+        elif previous and previous['content_hash'] and previous['content_hash'] == content_hash(fetched_page['html']):
+            print(f"    Content unchanged since last crawl: {current_url}")
+        else:
+            return False
+        get_db_writer().checkpoint_crawled_page(self.site_id, current_url, validators=self._validators_of(fetched_page, previous))
+        return True
+
+    def _validators_of(self, fetched_page, previous=None):
+        previous = previous or {}
+        return {
+            'etag': fetched_page['etag'] or previous.get('etag'),
+            'last_modified': fetched_page['last_modified'] or previous.get('last_modified'),
+            'content_hash': content_hash(fetched_page['html']) if fetched_page['html'] else previous.get('content_hash')
+        }
+
+    # Parses the fetched page of current_url (None if the fetch failed) in the
+    # parse pool, then handles the result. Unchanged pages are not parsed.
+    def process_page(self, current_url, fetched_page):
+        if fetched_page and fetched_page['status_code'] in THROTTLE_STATUS_CODES and self.requeue_throttled(current_url):
+            return
+        if not fetched_page or fetched_page['html'] is None and fetched_page['status_code'] != 304:
+            print(f"    Failed to fetch HTML for {current_url}. Left pending for a later run.")
+            self.record_failed_fetch(current_url)
+            return
+        if self.is_unchanged(current_url, fetched_page):
+            return
+        self.handle_parsed_page(current_url, parse_page_in_pool(fetched_page['url'], fetched_page['html']), fetched_page)
+
+    # Only pages that answered 200 or 304 are checkpointed as crawled; a failed
+    # one (error status, timeout, reset connection...) stays in crawl_frontier
+    # with one more attempt, so the next run retries it
+    def record_failed_fetch(self, current_url):
+        canonical_url = canonicalize_url(current_url)
+        self.crawled_urls_for_site.discard(canonical_url)
+        priority = CrawlFrontier.SEED_PRIORITY if canonical_url in self.seed_urls else self.frontier.priority_func(canonical_url)
+        get_db_writer().record_failed_fetch(self.site_id, current_url, priority)
+
+    # The host answered current_url with 429/503: host_rate_limiter has already
+    # pushed the host's next slot out, so the page goes back to the frontier to
+    # be fetched after the backoff, without counting against max_pages.
+    # Returns False once the page used up its FETCH_THROTTLED_RETRIES.
+    def requeue_throttled(self, current_url):
+        retries = self.throttled_retries.get(current_url, 0)
+        if retries >= Config.FETCH_THROTTLED_RETRIES:
+            return False
+        self.throttled_retries[current_url] = retries + 1
+        canonical_url = canonicalize_url(current_url)
+        priority = CrawlFrontier.SEED_PRIORITY if canonical_url in self.seed_urls else None
+        self.frontier.requeue(current_url, priority)
+        self.crawled_urls_for_site.discard(canonical_url)
+        self.pages_crawled_count -= 1
+        self.report_progress()
+        print(f"    Host asked to slow down, will retry after the backoff: {current_url}")
+        return True
+
+    # Appends a fetched page to the response archive (see archive.py) and
+    # queues its index row. A failing archive never stops the crawl.
+    def archive_page(self, current_url, fetched_page):
+        if not Config.ARCHIVE_ENABLED or not fetched_page['html']:
+            return
+        try:
+            with time_stage('archive'):
+                segment, offset, length, fetched_at = response_archive.append(
+                    current_url, fetched_page['status_code'], fetched_page['html'],
+                    fetched_page['etag'], fetched_page['last_modified'])
+        except OSError as e:
+            print(f"    Could not archive {current_url}: {e}")
+            return
+        get_db_writer().add_archived_response(self.site_id, current_url, fetched_at, fetched_page['status_code'],
+                                              segment, offset, length)
+
+    # Matches search terms against the extracted article, saves it and queues
+    # the internal links of a page already run through parse_page. fetched_page,
+    # when given, is also archived.
+    def handle_parsed_page(self, current_url, parsed_page, fetched_page=None):
+        site_id = self.site_id
+        page_url = fetched_page['url'] if fetched_page else current_url # Differs from current_url after a redirect
+        if fetched_page:
+            self.archive_page(page_url, fetched_page)
+        for stage, seconds in parsed_page.get('timings', {}).items():
+            observe_stage(stage, seconds)
+        self.handle_article(current_url, parsed_page['article'])
+
+        # Feeds advertised by the site's entry page feed the discovery stage
+        if canonicalize_url(current_url) in self.seed_urls and parsed_page.get('feeds') and not self.feeds_discovered:
+            self.discover_from_feeds(parsed_page['feeds'])
+
+        # Follow the internal links of the current page to continue crawling
+        new_frontier_urls = []
+        for full_url in parsed_page['outlinks']:
+            # Filtered on the canonical form (no #fragment, tracking params...); queued as found
+            parsed_full_url = urlparse(canonicalize_url(full_url))
+
+            # Criteria for following internal links:
+            # 1. The domain must match the base site's domain.
+            # 2. The URL must not have been crawled already in this session, nor be in the queue
+            #    (the frontier's seen-set checks this on canonical URLs).
+            # 3. It should not be a common media file (png, jpg, pdf, etc.).
+            # 4. It should not be a common navigation/admin/category path (can be refined).
+            # 5. robots.txt must allow it.
+            if parsed_full_url.netloc == self.parsed_base_netloc and \
+               not any(ext in parsed_full_url.path.lower() for ext in ['.png', '.jpg', '.gif', '.css', '.js', '.pdf', '.xml', '.rss', '.mp4', '.avi', '.zip']) and \
+               not any(kw in parsed_full_url.path.lower() or kw in parsed_full_url.query.lower() for kw in ['/category/', '/tag/', '/author/', '/feed/', '/wp-content/', '/wp-admin/', '/login', '/logout', '/register', '/search']):
+
+                if not self.is_crawled(full_url) and robots_cache.is_allowed(full_url):
+                    priority = self.frontier.priority_func(parsed_full_url.geturl())
+                    queued_url = self.frontier.push(full_url, priority=priority)
+                    if queued_url:
+                        new_frontier_urls.append((queued_url, priority))
+                # print(f"    Added to queue: {full_url}") # Uncomment for debugging link additions
+
+        # Persist the page as crawled and its new links as pending, so a restart resumes from here
+        validators = self._validators_of(fetched_page) if fetched_page else None
+        get_db_writer().checkpoint_crawled_page(site_id, current_url, new_frontier_urls, validators)
+        if canonicalize_url(page_url) != canonicalize_url(current_url):
+            # The page is known under the URL it redirected to as well
+            self.frontier.mark_seen(page_url)
+            self.crawled_urls_for_site.add(canonicalize_url(page_url))
+            get_db_writer().checkpoint_crawled_page(site_id, page_url)
+
+    # Saves the article extracted from current_url (None if extraction failed)
+    # if it mentions a search term, applying the near-duplicate policy
+    def handle_article(self, current_url, article_data):
+        site_id = self.site_id
+        if article_data and article_data['content'] and article_data['title'] != 'Título Não Encontrado':
+            # Every term is checked in a single case/accent-insensitive pass (see term_matcher.py)
+            with time_stage('match'):
+                matched_terms = self.term_matcher.find_terms(article_data['title'], article_data['content'])
+            found_terms_in_article = bool(matched_terms)
+            fingerprint = article_data.get('simhash')
+            duplicate_of_url = None
+            if found_terms_in_article and fingerprint is not None and Config.DEDUP_POLICY != 'keep':
+                # Same story already saved under another URL (see dedup.py)
+                with time_stage('dedup'):
+                    duplicate_of_url = find_near_duplicate(fingerprint, article_data['url'])
+            if found_terms_in_article and duplicate_of_url and Config.DEDUP_POLICY == 'skip':
+                print(f"    Near-duplicate of {duplicate_of_url}, not saved: {article_data['url']}")
+            elif found_terms_in_article:
+                get_db_writer().add_article( # Queued; committed in a batch by the DB writer thread
+                    site_id=site_id,
+                    title=article_data['title'],
+                    url=article_data['url'],
+                    content=article_data['content'],
+                    # Fall back to the sitemap/feed date when newspaper3k found none
+                    published_date=article_data['published_date'] or self.discovered_dates.get(current_url),
+                    matched_terms=matched_terms,
+                    simhash=to_signed64(fingerprint) if fingerprint is not None else None,
+                    duplicate_of_url=duplicate_of_url
+                )
+                self.run.record_article(site_id, article_data['title'], article_data['url'], matched_terms)
+                articles_saved.inc()
+                print(f"      Terms found {matched_terms}! Article saved: {article_data['title']} at {article_data['url']}")
+            else:
+                print(f"    No search terms found in article: {article_data['title']} (URL: {current_url})")
+                if Config.CANDIDATE_STORE_ENABLED:
+                    # Kept for search terms added later (see term_backfill.py)
+                    get_db_writer().add_candidate(
+                        site_id=site_id,
+                        title=article_data['title'],
+                        url=article_data['url'],
+                        content=article_data['content'],
+                        published_date=article_data['published_date'] or self.discovered_dates.get(current_url),
+                        simhash=to_signed64(fingerprint) if fingerprint is not None else None
+                    )
+        else:
+            print(f"    Newspaper3k failed to extract meaningful content/title for {current_url}")
+
+    def finish(self):
+        print(f"--- Finished crawling for site: {self.base_url}. Total pages crawled: {self.pages_crawled_count} ---\n")
+        print(f"Fetch stats so far: {get_fetch_stats()}")
+        # When the crawl finishes (either by completing or stopping),
+        # mark this specific site's progress as completed or stopped.
+        # This is crucial for overall status aggregation.
+        final_status = 'completed'
+        if self.stop_requested(): # Check if global stop was issued
+            final_status = 'stopped_by_user'
+
+        self.report_progress(final_status)
+
+# Ends a run once all of its sites are done: commits whatever the DB writer
+# still holds, then marks the scraper stopped. Needs an app context.
+def finish_run(run):
+    get_db_writer().flush()
+    set_scraper_status('stopped')
+    run.finish()
+
+# --- Asyncio engine (Config.CRAWL_ENGINE = 'async') ---
+# Drives the same SiteCrawl objects as the threaded engine, so progress rows,
+# term matching and saved articles are identical. All fetches share one event
+# loop and one aiohttp session; everything that blocks (DB writes, newspaper3k,
+# BeautifulSoup) runs in a small thread pool.
+
+async def _fetch_page_async(session, url, headers=None):
+    with time_stage('download'):
+        return await _fetch_with_retries_async(session, url, headers)
+
+async def _fetch_with_retries_async(session, url, headers):
+    host = urlparse(url).netloc
+    for attempt in range(Config.FETCH_MAX_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(Config.FETCH_BACKOFF_FACTOR * (2 ** (attempt - 1)))
+        _count_fetch_stat('fetches') # Every attempt is a request
+        try:
+            async with session.get(url, headers=headers) as response:
+                _count_fetch_stat('fetches', len(response.history)) # Redirects cost a request each
+                _record_response_for_politeness(url, response.status, response.headers)
+                if response.status == 304 or response.status >= 400:
+                    record_response(host, response.status)
+                if response.status == 304 or response.status in THROTTLE_STATUS_CODES:
+                    return _fetched_page(str(response.url) if response.history else url, response.status, None, response.headers)
+                if response.status in RETRY_STATUS_CODES and attempt < Config.FETCH_MAX_RETRIES:
                     continue
+                if response.status >= 400:
+                    print(f"Error fetching {url}: HTTP {response.status}")
+                    return None
+
+                body = bytearray()
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    body.extend(chunk)
+                    if len(body) > Config.FETCH_MAX_RESPONSE_BYTES:
+                        print(f"Error fetching {url}: response exceeded {Config.FETCH_MAX_RESPONSE_BYTES} bytes")
+                        record_fetch_error(host, ResponseTooLargeError())
+                        return None
+                record_response(host, response.status, len(body))
+                html_content = decode_html(bytes(body), response.headers.get('Content-Type'))
+                return _fetched_page(str(response.url) if response.history else url, response.status, html_content, response.headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            record_fetch_error(host, e)
+            if attempt < Config.FETCH_MAX_RETRIES:
+                continue
+            print(f"Error fetching {url}: {e!r}")
+            return None
+    return None
+
+async def _wait_for_host_async(host):
+    while True:
+        acquired, next_allowed = host_rate_limiter.try_acquire(host)
+        if acquired:
+            return
+        await asyncio.sleep(max(0.0, next_allowed - time.monotonic()))
+
+async def _crawl_site_async(crawl, session, executor, semaphore, stats):
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(executor, crawl.load_robots)
+        crawl.discover_from_sitemaps()
+
+        while crawl.has_work():
+            # Check for the run's stop signal (set by /stop_scrape)
+            if crawl.stop_requested():
+                print(f"Scraper for {crawl.base_url} received global stop signal. Stopping.")
+                break
+
+            if crawl.discoveries:
+                # Sitemap/feed documents are spaced like pages, one request per slot
+                with time_stage('wait'):
+                    await _wait_for_host_async(crawl.host)
+                await loop.run_in_executor(executor, crawl.discover_next_document)
+                continue
+
+            current_url = await loop.run_in_executor(executor, crawl.next_url)
+            if current_url is None:
+                continue
+
+            with time_stage('wait'):
+                await _wait_for_host_async(crawl.host) # Be polite to the server
+            async with semaphore:
+                stats['in_flight'] += 1
+                try:
+                    fetched_page = await _fetch_page_async(session, current_url, crawl.conditional_headers(current_url))
+                finally:
+                    stats['in_flight'] -= 1
 
-                article_data = extract_article_details_with_newspaper(current_url)
-
-                if article_data and article_data['content'] and article_data['title'] != 'Título Não Encontrado':
-                    found_terms_in_article = False
-                    for term in search_terms:
-                        # Perform case-insensitive search for terms in title and content
-                        if term.lower() in article_data['content'].lower() or term.lower() in article_data['title'].lower():
-                            add_article( # Add article to database
-                                site_id=site_id,
-                                title=article_data['title'],
-                                url=article_data['url'],
-                                content=article_data['content'],
-                                published_date=article_data['published_date']
-                            )
-                            found_terms_in_article = True
-                            break # Found a term, no need to check other terms for this article
-                    if found_terms_in_article:
-                        print(f"      Term found! Article saved: {article_data['title']} at {article_data['url']}")
-                    else:
-                        print(f"    No search terms found in article: {article_data['title']} (URL: {current_url})")
-                else:
-                    print(f"    Newspaper3k failed to extract meaningful content/title for {current_url}")
-
-                # Find all internal links in the current page to continue crawling
-                soup = BeautifulSoup(html_content, 'html.parser')
-                for link_element in soup.find_all('a', href=True):
-                    href = link_element.get('href')
-                    full_url = urljoin(current_url, href)
-                    parsed_full_url = urlparse(full_url)
-
-                    # Criteria for following internal links:
-                    # 1. The domain must match the base site's domain.
-                    # 2. The URL must not have been crawled already in this session, nor be in the queue.
-                    # 3. It should not be just a fragment (#).
-                    # 4. It should not be a common media file (png, jpg, pdf, etc.).
-                    # 5. It should not be a common navigation/admin/category path (can be refined).
-                    if parsed_full_url.netloc == parsed_base_netloc and \
-                       full_url not in crawled_urls_for_site and \
-                       full_url not in to_crawl_urls and \
-                       not full_url.startswith(current_url + '#') and \
-                       not any(ext in parsed_full_url.path.lower() for ext in ['.png', '.jpg', '.gif', '.css', '.js', '.pdf', '.xml', '.rss', '.mp4', '.avi', '.zip']) and \
-                       not any(kw in parsed_full_url.path.lower() or kw in parsed_full_url.query.lower() for kw in ['/category/', '/tag/', '/author/', '/feed/', '/wp-content/', '/wp-admin/', '/login', '/logout', '/register', '/search']):
-                        
-                        to_crawl_urls.append(full_url)
-                        # print(f"    Added to queue: {full_url}") # Uncomment for debugging link additions
-                
-                time.sleep(CRAWL_DELAY) # Be polite to the server
-            
-            print(f"--- Finished crawling for site: {base_url}. Total pages crawled: {pages_crawled_count} ---\n")
-        finally:
-            # When the thread finishes (either by completing or stopping),
-            # mark this specific site's progress as completed or stopped.
-            # This is crucial for overall status aggregation.
-            final_status = 'completed'
-            if get_scraper_status()['status'] == 'stopped': # Check if global stop was issued
-                final_status = 'stopped_by_user'
-            
-            update_scraper_progress_for_site(site_id, pages_crawled_count, MAX_PAGES_PER_SITE, status=final_status)
\ No newline at end of file
+            if not fetched_page or fetched_page['status_code'] in THROTTLE_STATUS_CODES:
+                await loop.run_in_executor(executor, crawl.process_page, current_url, fetched_page)
+                continue
+            if await loop.run_in_executor(executor, crawl.is_unchanged, current_url, fetched_page):
+                continue
+            # CPU-bound parsing goes to the process pool when there is one
+            parsed_page = await loop.run_in_executor(get_parse_pool() or executor, parse_page, fetched_page['url'], fetched_page['html'])
+            await loop.run_in_executor(executor, crawl.handle_parsed_page, current_url, parsed_page, fetched_page)
+    except Exception as e:
+        print(f"Error crawling {crawl.base_url}: {e}")
+    finally:
+        await loop.run_in_executor(executor, crawl.finish)
+        stats['sites_pending'] -= 1
+
+# dns and connect stage timings from aiohttp's request tracing
+def _stage_trace_config():
+    trace_config = aiohttp.TraceConfig()
+
+    def add_stage(stage, start_signal, end_signal):
+        async def on_start(session, context, params):
+            setattr(context, stage, time.perf_counter())
+        async def on_end(session, context, params):
+            observe_stage(stage, time.perf_counter() - getattr(context, stage))
+        start_signal.append(on_start)
+        end_signal.append(on_end)
+
+    add_stage('dns', trace_config.on_dns_resolvehost_start, trace_config.on_dns_resolvehost_end)
+    add_stage('connect', trace_config.on_connection_create_start, trace_config.on_connection_create_end)
+    return trace_config
+
+def _push_app_context(app):
+    # Executor threads live for the whole run; give each one its own app context
+    # (and therefore its own DB connection through get_db)
+    app.app_context().push()
+
+# Crawls already-started SiteCrawl objects concurrently. stats is updated in
+# place with 'in_flight' (fetches on the wire) and 'sites_pending'.
+async def scrape_sites_async(app, crawls, max_concurrency=None, stats=None):
+    if aiohttp is None:
+        raise RuntimeError("The asyncio crawl engine requires the 'aiohttp' package")
+
+    max_concurrency = max_concurrency or Config.ASYNC_MAX_CONCURRENCY
+    stats = stats if stats is not None else {}
+    stats['in_flight'] = 0
+    stats['sites_pending'] = len(crawls)
+
+    executor = ThreadPoolExecutor(max_workers=Config.ASYNC_EXECUTOR_THREADS,
+                                  thread_name_prefix='crawl-parse',
+                                  initializer=_push_app_context, initargs=(app,))
+    connector = aiohttp.TCPConnector(limit=max_concurrency, limit_per_host=Config.FETCH_POOL_MAXSIZE)
+    timeout = aiohttp.ClientTimeout(total=Config.FETCH_TIMEOUT)
+    headers = {'User-Agent': USER_AGENT, 'Accept-Encoding': ACCEPT_ENCODING}
+    semaphore = asyncio.Semaphore(max_concurrency)
+    try:
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers,
+                                         trace_configs=[_stage_trace_config()]) as session:
+            await asyncio.gather(*(_crawl_site_async(crawl, session, executor, semaphore, stats) for crawl in crawls))
+    finally:
+        executor.shutdown(wait=True)
@@ -4,12 +4,16 @@ document.addEventListener('DOMContentLoaded', function() {
     const searchForm = document.getElementById('searchForm');
     
     const startButton = document.getElementById('startButton');
+    const incrementalButton = document.getElementById('incrementalButton');
+    const reprocessButton = document.getElementById('reprocessButton');
     const stopButton = document.getElementById('stopButton');
     const currentStatusSpan = document.getElementById('currentStatus');
     const articlesContainer = document.getElementById('articles_container');
 
     const progressBarContainer = document.getElementById('progressBarContainer');
     const progressBar = document.getElementById('progressBar');                   
+    const crawlStatsDiv = document.getElementById('crawlStats');
+    const liveArticlesList = document.getElementById('liveArticles');
 
     const importSitesForm = document.getElementById('importSitesForm');
     const exportSitesButton = document.getElementById('exportSitesButton');
@@ -42,77 +46,178 @@ document.addEventListener('DOMContentLoaded', function() {
         try {
             const response = await fetch('/scraper_status');
             const data = await response.json();
-            
-            const status = data.status.toUpperCase();
-            const pagesCrawled = data.pages_crawled;
-            const maxPages = data.max_pages;
-
-            currentStatusSpan.textContent = status;
-
-            // Update progress bar
-            if (status === 'RUNNING' || status === 'STOPPING') {
-                progressBarContainer.style.display = 'block';
-                const percentage = maxPages > 0 ? Math.round((pagesCrawled / maxPages) * 100) : 0;
-                progressBar.style.width = `${percentage}%`;
-                progressBar.textContent = `${percentage}% (${pagesCrawled}/${maxPages})`;
-            } else {
-                progressBarContainer.style.display = 'none';
-                progressBar.style.width = '0%';
-                progressBar.textContent = '0%';
-            }
-
-
-            if (status === 'RUNNING') {
-                startButton.disabled = true;
-                stopButton.disabled = false;
-            } else {
-                // If status changes from RUNNING to STOPPED, it means it finished or was stopped.
-                // In this case, automatically trigger the search to display results.
-                // We check if the start button was previously disabled, indicating a running scraper.
-                if (startButton.disabled === true && status === 'STOPPED') {
-                    console.log("Scraper finished or stopped. Triggering automatic search...");
-                    triggerSearchFormSubmission(); 
-                }
-                startButton.disabled = false;
-                stopButton.disabled = true;
-            }
+            applyScraperStatus(data);
         } catch (error) {
             console.error('Error fetching scraper status:', error);
             currentStatusSpan.textContent = 'ERRO';
             startButton.disabled = false; 
+            if (incrementalButton) incrementalButton.disabled = false;
+            if (reprocessButton) reprocessButton.disabled = false;
             stopButton.disabled = false;
             progressBarContainer.style.display = 'none';
         }
     }
 
-    if (startButton) {
-        startButton.addEventListener('click', async function() {
-            startButton.disabled = true;
-            stopButton.disabled = true;
-            currentStatusSpan.textContent = 'INICIANDO...';
+    // Renders a /scraper_status payload (polled, or pushed by /scraper_events)
+    function applyScraperStatus(data) {
+        const status = data.status.toUpperCase();
+        const pagesCrawled = data.pages_crawled;
+        const maxPages = data.max_pages;
+
+        currentStatusSpan.textContent = status;
+
+        // Update progress bar
+        if (status === 'RUNNING' || status === 'STOPPING') {
             progressBarContainer.style.display = 'block';
+            const percentage = maxPages > 0 ? Math.round((pagesCrawled / maxPages) * 100) : 0;
+            progressBar.style.width = `${percentage}%`;
+            progressBar.textContent = `${percentage}% (${pagesCrawled}/${maxPages})`;
+            renderCrawlStats(data);
+        } else {
+            progressBarContainer.style.display = 'none';
             progressBar.style.width = '0%';
             progressBar.textContent = '0%';
-            articlesContainer.innerHTML = '<p style="text-align: center; color: #007bff;">Scraper iniciando a varredura em background. Monitore o console para ver o progresso.</p>';
-            showFeedback('Scraper iniciando a varredura...', true); 
-            try {
-                const response = await fetch('/start_scrape', { method: 'POST' });
-                const data = await response.json();
-                console.log(data.status);
-                if (response.status !== 202) {
-                    alert(data.status); 
-                    showFeedback(`Erro ao iniciar: ${data.status}`, false); 
-                    updateScraperStatus();
-                } else {
-                    showFeedback(data.status, true); 
-                    updateScraperStatus();
-                }
-            } catch (error) {
-                console.error('Error starting scraper:', error);
-                currentStatusSpan.textContent = 'FALHA AO INICIAR';
-                showFeedback('Falha ao iniciar o scraper. Verifique o console.', false); 
-                updateScraperStatus(); 
+        }
+
+
+        if (status === 'RUNNING') {
+            startButton.disabled = true;
+            if (incrementalButton) incrementalButton.disabled = true;
+            if (reprocessButton) reprocessButton.disabled = true;
+            stopButton.disabled = false;
+        } else {
+            // If status changes from RUNNING to STOPPED, it means it finished or was stopped.
+            // In this case, automatically trigger the search to display results.
+            // We check if the start button was previously disabled, indicating a running scraper.
+            if (startButton.disabled === true && status === 'STOPPED') {
+                console.log("Scraper finished or stopped. Triggering automatic search...");
+                triggerSearchFormSubmission(); 
+            }
+            startButton.disabled = false;
+            if (incrementalButton) incrementalButton.disabled = false;
+            if (reprocessButton) reprocessButton.disabled = false;
+            stopButton.disabled = true;
+        }
+    }
+
+    // Per-site progress and crawl speed under the progress bar
+    function renderCrawlStats(data) {
+        if (!crawlStatsDiv || !data.sites) return;
+        crawlStatsDiv.textContent = '';
+        const summary = document.createElement('p');
+        summary.textContent = `${data.pages_per_sec || 0} páginas/s · ${data.articles_saved || 0} notícias salvas`;
+        crawlStatsDiv.appendChild(summary);
+        data.sites.forEach(function(site) {
+            const line = document.createElement('p');
+            line.textContent = `${site.site_url || site.site_id}: ${site.pages_crawled}/${site.max_pages_to_crawl} páginas, ${site.articles_saved} notícias (${site.status})`;
+            crawlStatsDiv.appendChild(line);
+        });
+    }
+
+    // Newest saved articles first, as they are found
+    function addLiveArticle(article) {
+        if (!liveArticlesList) return;
+        const item = document.createElement('li');
+        const link = document.createElement('a');
+        link.href = article.url;
+        link.target = '_blank';
+        link.rel = 'noopener noreferrer';
+        link.textContent = article.title;
+        item.appendChild(link);
+        if (article.matched_terms && article.matched_terms.length) {
+            item.appendChild(document.createTextNode(` (${article.matched_terms.join(', ')})`));
+        }
+        liveArticlesList.insertBefore(item, liveArticlesList.firstChild);
+        while (liveArticlesList.children.length > 10) {
+            liveArticlesList.removeChild(liveArticlesList.lastChild);
+        }
+    }
+
+    // Live progress through Server-Sent Events; polling every 3s is the fallback
+    // for browsers without EventSource or when the stream cannot be kept open
+    function startPolling() {
+        if (!statusCheckInterval) {
+            statusCheckInterval = setInterval(updateScraperStatus, 3000);
+        }
+    }
+
+    function connectScraperEvents() {
+        if (!window.EventSource) {
+            startPolling();
+            return;
+        }
+        const events = new EventSource('/scraper_events');
+        events.addEventListener('status', function(e) {
+            applyScraperStatus(JSON.parse(e.data));
+        });
+        events.addEventListener('started', function() {
+            if (liveArticlesList) liveArticlesList.textContent = '';
+        });
+        events.addEventListener('article', function(e) {
+            addLiveArticle(JSON.parse(e.data));
+        });
+        events.onerror = function() {
+            // The browser retries by itself; poll meanwhile so the page stays current
+            startPolling();
+        };
+        events.onopen = function() {
+            if (statusCheckInterval) {
+                clearInterval(statusCheckInterval);
+                statusCheckInterval = null;
             }
+        };
+    }
+
+    // mode: 'default' (only new pages), 'incremental' (re-check known pages, parse only changed ones)
+    // or 'reprocess' (re-extract the archived pages, no network)
+    async function startScrape(mode) {
+        startButton.disabled = true;
+        if (incrementalButton) incrementalButton.disabled = true;
+        if (reprocessButton) reprocessButton.disabled = true;
+        stopButton.disabled = true;
+        currentStatusSpan.textContent = 'INICIANDO...';
+        progressBarContainer.style.display = 'block';
+        progressBar.style.width = '0%';
+        progressBar.textContent = '0%';
+        articlesContainer.innerHTML = '<p style="text-align: center; color: #007bff;">Scraper iniciando a varredura em background. Monitore o console para ver o progresso.</p>';
+        showFeedback('Scraper iniciando a varredura...', true); 
+        try {
+            const formData = new FormData();
+            formData.append('mode', mode);
+            const response = await fetch('/start_scrape', { method: 'POST', body: formData });
+            const data = await response.json();
+            console.log(data.status);
+            if (response.status !== 202) {
+                alert(data.status); 
+                showFeedback(`Erro ao iniciar: ${data.status}`, false); 
+                updateScraperStatus();
+            } else {
+                showFeedback(data.status, true); 
+                updateScraperStatus();
+            }
+        } catch (error) {
+            console.error('Error starting scraper:', error);
+            currentStatusSpan.textContent = 'FALHA AO INICIAR';
+            showFeedback('Falha ao iniciar o scraper. Verifique o console.', false); 
+            updateScraperStatus(); 
+        }
+    }
+
+    if (startButton) {
+        startButton.addEventListener('click', function() {
+            startScrape('default');
+        });
+    }
+
+    if (incrementalButton) {
+        incrementalButton.addEventListener('click', function() {
+            startScrape('incremental');
+        });
+    }
+
+    if (reprocessButton) {
+        reprocessButton.addEventListener('click', function() {
+            startScrape('reprocess');
         });
     }
 
@@ -148,7 +253,7 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
-    statusCheckInterval = setInterval(updateScraperStatus, 3000); 
+    connectScraperEvents();
     updateScraperStatus(); 
 
     // --- Search Form Logic ---
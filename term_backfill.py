@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+
+from config import Config
+from body_store import decompress_body
+from database import close_db, get_backfill_terms, finish_term_backfill, get_article_text_batch, \
+                     get_candidate_batch, promote_candidates, update_matched_terms
+from dedup import find_near_duplicate, to_unsigned64
+from term_matcher import get_term_matcher
+
+# Retroactive matching of new search terms.
+#
+# A crawl only saves articles that mention one of the terms it started with;
+# the others go to the candidate store (candidate_articles). Terms added
+# through /add_term or /import_terms are marked backfill_pending, and this
+# background job matches them, all pending terms in one pass with the same
+# TermMatcher the crawl uses:
+#   - against the saved articles, adding the new terms to matched_terms;
+#   - against the candidates, moving the ones that match into articles (with
+#     the near-duplicate policy applied, as a crawl would).
+# Both tables are read in id order, TERM_BACKFILL_BATCH_SIZE rows at a time,
+# and each batch is committed on its own, so the job never holds the write
+# lock for long. A term is marked done once both passes are over; if the
+# process stops first, the next request (or the next start) runs it again,
+# which is harmless since the results are merged.
+#
+# Matching needs each body decompressed and scanned (term semantics are the
+# term matcher's: substrings unless TERM_MATCH_WHOLE_WORDS, which FTS5 tokens
+# cannot express), so a pass costs about as much as reading the corpus once;
+# still far from a recrawl.
+
+class TermBackfill:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._requested = False
+        self.last_result = None # Summary of the last finished pass
+
+    # Asks for a pass over the pending terms; app is the Flask app, whose
+    # context the job's DB access runs in
+    def request(self, app):
+        with self._lock:
+            self._requested = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, args=(app,), name='term-backfill', daemon=True)
+                self._thread.start()
+
+    def is_running(self):
+        with self._lock:
+            return self._thread is not None
+
+    # Consumes a request, or retires the thread when there is none. Together
+    # with request() this makes sure a term added while a pass is finishing
+    # still gets its own pass.
+    def _take_request(self):
+        with self._lock:
+            if not self._requested:
+                self._thread = None
+                return False
+            self._requested = False
+            return True
+
+    def _run(self, app):
+        try:
+            with app.app_context():
+                try:
+                    while self._take_request():
+                        terms = get_backfill_terms()
+                        if terms:
+                            self._backfill(terms)
+                finally:
+                    close_db()
+        except Exception as e:
+            print(f"Term backfill failed: {e}")
+            with self._lock:
+                self._thread = None
+
+    def _backfill(self, terms):
+        term_names = [term for _, term in terms]
+        print(f"--- Matching new search terms {term_names} against stored articles ---")
+        started = time.perf_counter()
+        matcher = get_term_matcher(term_names)
+        # Saved articles first, so the candidates promoted next are not scanned twice
+        articles_scanned, articles_flagged = self._match_articles(matcher)
+        candidates_scanned, candidates_promoted = self._match_candidates(matcher)
+        finish_term_backfill([term_id for term_id, _ in terms])
+        self.last_result = {
+            'terms': term_names,
+            'articles_scanned': articles_scanned,
+            'articles_flagged': articles_flagged,
+            'candidates_scanned': candidates_scanned,
+            'candidates_promoted': candidates_promoted,
+            'seconds': round(time.perf_counter() - started, 2)
+        }
+        print(f"--- New terms found in {articles_flagged} of {articles_scanned} saved articles and "
+              f"{candidates_promoted} of {candidates_scanned} candidates ({self.last_result['seconds']}s) ---")
+
+    def _match_articles(self, matcher):
+        after_id, scanned, flagged = 0, 0, 0
+        while True:
+            articles = get_article_text_batch(after_id, Config.TERM_BACKFILL_BATCH_SIZE)
+            if not articles:
+                return scanned, flagged
+            after_id = articles[-1]['id']
+            scanned += len(articles)
+            updates = []
+            for article in articles:
+                found_terms = matcher.find_terms(article['title'], decompress_body(article['body'], article['dictionary_id']))
+                matched_terms = json.loads(article['matched_terms']) if article['matched_terms'] else []
+                new_terms = [term for term in found_terms if term not in matched_terms]
+                if new_terms:
+                    updates.append((matched_terms + new_terms, article['id']))
+            if updates:
+                update_matched_terms(updates)
+                flagged += len(updates)
+
+    def _match_candidates(self, matcher):
+        after_id, scanned, promoted = 0, 0, 0
+        while True:
+            candidates = get_candidate_batch(after_id, Config.TERM_BACKFILL_BATCH_SIZE)
+            if not candidates:
+                return scanned, promoted
+            after_id = candidates[-1]['id']
+            scanned += len(candidates)
+            promotions = []
+            for candidate in candidates:
+                content = decompress_body(candidate['body'], candidate['dictionary_id'])
+                matched_terms = matcher.find_terms(candidate['title'], content)
+                if not matched_terms:
+                    continue
+                duplicate_of_url = None
+                if candidate['simhash'] is not None and Config.DEDUP_POLICY != 'keep':
+                    duplicate_of_url = find_near_duplicate(to_unsigned64(candidate['simhash']), candidate['url'])
+                if duplicate_of_url and Config.DEDUP_POLICY == 'skip':
+                    continue # Stays a candidate, as a crawl would not save it either
+                promotions.append((candidate, content, matched_terms, duplicate_of_url))
+                print(f"      Terms found {matched_terms}! Article saved: {candidate['title']} at {candidate['url']}")
+            if promotions:
+                promote_candidates(promotions)
+                promoted += len(promotions)
+
+term_backfill = TermBackfill()
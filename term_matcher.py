@@ -0,0 +1,95 @@
+import functools
+import re
+import unicodedata
+
+from config import Config
+
+# Multi-term matcher for the article filter.
+#
+# All search terms are folded (case, accents, whitespace) and compiled once
+# into a single regex shaped like a trie, so a text is folded once and scanned
+# once no matter how many terms there are: at every position the regex follows
+# at most one branch per character, as an Aho-Corasick automaton would.
+# Python's re has no overlapping matches, so the pattern is a lookahead that
+# reports the longest term starting at each position; shorter terms contained
+# in it (e.g. "rio" inside "rio de janeiro") are added from a table built at
+# compile time.
+
+WHITESPACE_RE = re.compile(r'\s+')
+TEXT_SEPARATOR = ' \x00 ' # Keeps a term from matching across the title/content boundary
+
+# Case- and accent-insensitive form used on both terms and texts:
+# "Ação Pública" -> "acao publica", "São  Paulo\n" -> "sao paulo "
+def fold_text(text):
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    without_accents = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return WHITESPACE_RE.sub(' ', without_accents)
+
+def _trie_pattern(node, word_end):
+    # node maps a character to its child node; the '' key marks the end of a term
+    alternatives = []
+    for char in sorted(key for key in node if key):
+        alternatives.append(re.escape(char) + _trie_pattern(node[char], word_end))
+    if '' in node:
+        alternatives.append(word_end) # Last, so longer terms win over their prefixes
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return '(?:' + '|'.join(alternatives) + ')'
+
+class TermMatcher:
+    def __init__(self, terms, whole_words=False):
+        self.whole_words = whole_words
+        self._terms_by_folded = {} # folded term -> original terms ("São Paulo" and "sao paulo" fold alike)
+        self._term_order = {term: index for index, term in reversed(list(enumerate(terms)))}
+        for term in terms:
+            folded_term = fold_text(term).strip()
+            if folded_term:
+                self._terms_by_folded.setdefault(folded_term, []).append(term)
+
+        trie = {}
+        for folded_term in self._terms_by_folded:
+            node = trie
+            for char in folded_term:
+                node = node.setdefault(char, {})
+            node[''] = True
+
+        self._pattern = None
+        if trie:
+            word_start, word_end = (r'(?<!\w)', r'(?!\w)') if whole_words else ('', '')
+            self._pattern = re.compile(f'{word_start}(?=({_trie_pattern(trie, word_end)}))')
+
+        # Terms found inside each longer term, under the same word-boundary rule
+        self._contained_terms = {}
+        for folded_term in self._terms_by_folded:
+            self._contained_terms[folded_term] = [
+                other for other in self._terms_by_folded
+                if other != folded_term and self._occurs_in(other, folded_term)
+            ]
+
+    def _occurs_in(self, needle, haystack):
+        if needle not in haystack or not self.whole_words:
+            return needle in haystack
+        return re.search(rf'(?<!\w){re.escape(needle)}(?!\w)', haystack) is not None
+
+    # Original terms found in any of the texts, in one pass over their folded concatenation
+    def find_terms(self, *texts):
+        if self._pattern is None:
+            return []
+        folded_text = TEXT_SEPARATOR.join(fold_text(text) for text in texts if text)
+        found = set()
+        for match in self._pattern.finditer(folded_text):
+            found.add(match.group(1))
+        for folded_term in list(found):
+            found.update(self._contained_terms[folded_term])
+        matched_terms = {term for folded_term in found for term in self._terms_by_folded[folded_term]}
+        return sorted(matched_terms, key=self._term_order.get) # In search term order
+
+# Compiled once per distinct term list, so every site of a run shares it
+@functools.lru_cache(maxsize=8)
+def _cached_term_matcher(terms, whole_words):
+    return TermMatcher(terms, whole_words)
+
+def get_term_matcher(terms, whole_words=None):
+    if whole_words is None:
+        whole_words = Config.TERM_MATCH_WHOLE_WORDS
+    return _cached_term_matcher(tuple(terms), whole_words)
@@ -0,0 +1,74 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import db_writer
+
+# A fresh database.db in a temporary directory, with an app context open
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DATABASE', str(tmp_path / 'database.db'))
+    database._clear_article_counts()
+    with Flask(__name__).app_context():
+        database.init_db()
+        yield database.get_db()
+        database.close_db()
+
+# DB writer committing into the db fixture's database, in place of the
+# process-wide one get_db_writer() would start
+@pytest.fixture
+def database_writer(db, monkeypatch):
+    writer = db_writer.DatabaseWriter(flush_interval=0.01)
+    writer.start()
+    monkeypatch.setattr(db_writer, '_db_writer', writer)
+    yield writer
+    writer.close()
+
+# Local HTTP server for tests that go through the network code. Tests fill
+# server.routes with path -> (status, headers, body), or a function of the
+# request headers returning one; every request is recorded in
+# server.requests as (path, headers).
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _FixtureHandler)
+        self.routes = {}
+        self.requests = []
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        route = self.server.routes.get(self.path, (404, {}, b'not found'))
+        status, headers, body = route(self.headers) if callable(route) else route
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def http_server():
+    server = FixtureServer()
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
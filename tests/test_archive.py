@@ -0,0 +1,36 @@
+import gzip
+
+from archive import ResponseArchive, build_record, parse_record, read_record
+
+def test_record_round_trip():
+    record, fetched_at = build_record('https://example.com/ação', 200, '<p>Ação</p>', etag='"abc"',
+                                      last_modified='Wed, 01 May 2024 10:00:00 GMT')
+    assert parse_record(gzip.decompress(record)) == {
+        'url': 'https://example.com/ação',
+        'fetched_at': fetched_at,
+        'status_code': 200,
+        'html': '<p>Ação</p>',
+        'etag': '"abc"',
+        'last_modified': 'Wed, 01 May 2024 10:00:00 GMT'
+    }
+
+def test_appended_records_read_back_from_their_index_entries(tmp_path):
+    archive = ResponseArchive(directory=str(tmp_path))
+    pages = [('https://example.com/%d' % index, '<html>página %d</html>' % index) for index in range(3)]
+    entries = [archive.append(url, 200, html) for url, html in pages]
+    archive.close_segment()
+
+    assert len({segment for segment, _, _, _ in entries}) == 1
+    for (url, html), (segment, offset, length, _) in zip(pages, entries):
+        record = read_record(segment, offset, length, directory=str(tmp_path))
+        assert (record['url'], record['html'], record['etag']) == (url, html, None)
+
+def test_a_full_segment_is_closed_and_a_new_one_started(tmp_path):
+    archive = ResponseArchive(directory=str(tmp_path), segment_max_bytes=1)
+    first = archive.append('https://example.com/1', 200, 'um')
+    second = archive.append('https://example.com/2', 404, 'dois')
+    archive.close_segment()
+
+    assert first[0] != second[0]
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([first[0], second[0]])
+    assert read_record(*second[:3], directory=str(tmp_path))['status_code'] == 404
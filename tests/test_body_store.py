@@ -0,0 +1,59 @@
+import pytest
+
+import body_store
+import database
+from body_store import MissingDictionaryError, compress_body, decompress_body, make_snippet, train_dictionary
+
+BODY = ('A Agência Reguladora de Serviços Públicos anunciou nesta terça-feira o reajuste da tarifa de água e esgoto. '
+        'Segundo a agência, o reajuste da tarifa de água vale a partir do próximo mês para todos os municípios.')
+
+def _samples():
+    return [BODY.replace('terça-feira', day) + f' Notícia {index}.'
+            for index, day in enumerate(['segunda-feira', 'quarta-feira', 'quinta-feira', 'sexta-feira'] * 5)]
+
+@pytest.fixture
+def dictionaries(monkeypatch):
+    monkeypatch.setattr(body_store, '_dictionaries', {})
+    monkeypatch.setattr(body_store, 'current_dictionary_id', None)
+    monkeypatch.setattr(body_store, 'dictionaries_loaded', False)
+    monkeypatch.setattr(body_store, '_dictionary_source', None)
+
+def test_round_trip_with_and_without_a_dictionary(dictionaries):
+    dictionary_id, plain_body = compress_body(BODY)
+    assert dictionary_id is None
+    assert decompress_body(plain_body, dictionary_id) == BODY
+
+    body_store.load_dictionaries([(1, train_dictionary(_samples()))])
+    dictionary_id, body = compress_body(BODY)
+    assert dictionary_id == 1
+    assert decompress_body(body, dictionary_id) == BODY
+    assert len(body) < len(plain_body) / 2
+    assert decompress_body(plain_body) == BODY # Bodies saved before the dictionary still read
+    assert decompress_body(None) is None
+
+def test_new_bodies_use_the_newest_dictionary(dictionaries):
+    body_store.load_dictionaries([(1, train_dictionary(_samples()[:10])), (2, train_dictionary(_samples()))])
+    assert compress_body(BODY)[0] == 2
+
+def test_a_dictionary_trained_elsewhere_is_reloaded_from_the_database(db, dictionaries):
+    # Another process trained and stored dictionary 1 after this one loaded its dictionaries
+    dictionary = train_dictionary(_samples())
+    db.execute('INSERT INTO compression_dictionaries (id, dictionary) VALUES (1, ?)', (dictionary,))
+    db.commit()
+    body_store.load_dictionaries([(1, dictionary)])
+    body = compress_body(BODY)[1]
+    body_store._dictionaries.clear()
+
+    body_store.set_dictionary_source(database._stored_dictionaries)
+    assert decompress_body(body, 1) == BODY
+    with pytest.raises(MissingDictionaryError):
+        decompress_body(body, 2)
+
+def test_an_unknown_dictionary_without_a_source_is_an_error(dictionaries):
+    with pytest.raises(MissingDictionaryError):
+        decompress_body(b'\x00', 7)
+
+def test_snippets_collapse_whitespace_and_are_cut_at_the_length():
+    assert make_snippet('  Tarifa\n\nde   água ', length=50) == 'Tarifa de água'
+    snippet = make_snippet(BODY, length=40)
+    assert len(snippet) <= 40 and snippet.endswith('...') and BODY.startswith(snippet[:-3])
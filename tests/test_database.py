@@ -0,0 +1,106 @@
+import database
+import db_writer
+from archive import ResponseArchive
+from db_writer import DatabaseWriter
+
+SITES = ['https://jornal1.exemplo.com.br', 'https://jornal2.exemplo.com.br']
+
+# 45 articles over two sites, several sharing a date (ties broken by id) and
+# some without one; every third one matched 'Gás'
+def _save_articles(db):
+    db.executemany('INSERT INTO sites (url) VALUES (?)', [(url,) for url in SITES])
+    rows = []
+    for index in range(45):
+        published_date = None if index % 10 == 0 else f'2024-05-{index % 7 + 1:02d}'
+        matched_terms = ['Gás'] if index % 3 == 0 else ['Energia']
+        rows.append(database.article_row(index % 2 + 1, f'Notícia {index}', f'{SITES[index % 2]}/noticia-{index}',
+                                         f'Texto da notícia {index}.', published_date, matched_terms))
+    database.write_batch(db, rows)
+
+def _offset_listing(per_page, **query):
+    first_page = database.get_articles(per_page=per_page, **query)
+    ids = []
+    for page in range(1, first_page['total_pages'] + 1):
+        ids += [article['id'] for article in database.get_articles(page=page, per_page=per_page, **query)['articles']]
+    return ids
+
+def _cursor_listing(per_page, **query):
+    result = database.get_articles(per_page=per_page, **query)
+    pages = [[article['id'] for article in result['articles']]]
+    while result['next_cursor']:
+        result = database.get_articles(page=result['current_page'] + 1, per_page=per_page,
+                                       after=result['next_cursor'], **query)
+        pages.append([article['id'] for article in result['articles']])
+    return pages, result
+
+def test_cursor_walk_matches_the_offset_listing(db):
+    _save_articles(db)
+    for query in ({}, {'order_by': 'date_asc'}, {'site_id': 2}, {'query_terms': ['Gás']},
+                  {'query_terms': ['Gás', 'Energia'], 'start_date': '2024-05-02', 'end_date': '2024-05-05'}):
+        pages, _ = _cursor_listing(7, **query)
+        assert sum(pages, []) == _offset_listing(7, **query), query
+
+def test_walking_back_with_prev_cursor_returns_the_same_pages(db):
+    _save_articles(db)
+    pages, result = _cursor_listing(7)
+    backwards = [[article['id'] for article in result['articles']]]
+    while result['prev_cursor']:
+        result = database.get_articles(page=result['current_page'] - 1, per_page=7, before=result['prev_cursor'])
+        backwards.append([article['id'] for article in result['articles']])
+    assert backwards[::-1] == pages
+
+def test_term_filter_lists_the_articles_that_matched_a_term(db):
+    _save_articles(db)
+    result = database.get_articles(['Gás'], per_page=100)
+    assert result['total_results'] == 15
+    assert all('Gás' in article['matched_terms'] for article in result['articles'])
+    assert database.get_articles(['Gás', 'Energia'])['total_results'] == 45
+    assert database.get_articles(['Transporte'])['total_results'] == 0
+
+def test_term_filter_follows_matched_terms_updates(db):
+    _save_articles(db)
+    article_id = database.get_articles(['Energia'])['articles'][0]['id']
+    database.update_matched_terms([(['Energia', 'Gás'], article_id)])
+    assert database.get_articles(['Gás'])['total_results'] == 16
+    db.execute('DELETE FROM articles WHERE id = ?', (article_id,))
+    db.commit()
+    assert db.execute('SELECT COUNT(*) FROM article_terms WHERE article_id = ?', (article_id,)).fetchone()[0] == 0
+
+def test_relevance_ranks_title_hits_first_and_keeps_every_matched_article(db):
+    db.execute('INSERT INTO sites (url) VALUES (?)', (SITES[0],))
+    rows = [database.article_row(1, title, f'{SITES[0]}/{index}', content, '2024-05-01', ['Gás'])
+            for index, (title, content) in enumerate([
+                ('Usina de biogás inaugurada', 'A usina fica no interior.'), # Only inside a word
+                ('Economia', 'O preço do gás subiu.'),
+                ('Gás de cozinha mais caro', 'O gás subiu de novo.')
+            ])]
+    database.write_batch(db, rows)
+
+    result = database.get_articles(['Gás'], order_by='relevance')
+    assert result['order_by'] == 'relevance'
+    assert [article['title'] for article in result['articles']] == \
+        ['Gás de cozinha mais caro', 'Economia', 'Usina de biogás inaugurada']
+    assert result['total_results'] == database.get_articles(['Gás'])['total_results'] == 3
+
+def test_deleting_a_site_keeps_segments_the_db_writer_still_indexes(db, tmp_path, monkeypatch):
+    archive = ResponseArchive(directory=str(tmp_path / 'archive'))
+    monkeypatch.setattr(database, 'response_archive', archive)
+    db.executemany('INSERT INTO sites (url) VALUES (?)', [(url,) for url in SITES])
+    db.commit()
+    entries = [archive.append(f'{url}/pagina', 200, '<html></html>') for url in SITES]
+    archive.close_segment()
+    segment = entries[0][0]
+    db.execute('INSERT INTO archived_responses (site_id, url, fetched_at, status_code, segment, record_offset, record_length)'
+               ' VALUES (?, ?, ?, ?, ?, ?, ?)', (1, f'{SITES[0]}/pagina', entries[0][3], 200) + entries[0][:3])
+    db.commit()
+
+    # The other site's index row is still waiting in the writer's batch window
+    writer = DatabaseWriter(flush_interval=1.0)
+    writer.start()
+    monkeypatch.setattr(db_writer, '_db_writer', writer)
+    writer.add_archived_response(2, f'{SITES[1]}/pagina', entries[1][3], 200, *entries[1][:3])
+    database.delete_site(1)
+    writer.close()
+
+    assert (tmp_path / 'archive' / segment).exists()
+    assert [row['site_id'] for row in db.execute('SELECT site_id FROM archived_responses')] == [2]
@@ -0,0 +1,68 @@
+import pytest
+
+from db_writer import DatabaseWriter
+
+SITE = 'https://jornal.exemplo.com.br'
+
+@pytest.fixture
+def writer(db):
+    db.execute('INSERT INTO sites (url) VALUES (?)', (SITE,))
+    db.commit()
+    writers = []
+
+    def start(**kwargs):
+        database_writer = DatabaseWriter(**kwargs)
+        database_writer.start()
+        writers.append(database_writer)
+        return database_writer
+    yield start
+    for database_writer in writers:
+        database_writer.close()
+
+def _urls(db, table):
+    return sorted(row['url'] for row in db.execute(f'SELECT url FROM {table}'))
+
+def test_operations_queued_together_are_committed_in_one_batch(db, writer):
+    database_writer = writer(batch_size=100, flush_interval=0.5)
+    for index in range(5):
+        database_writer.add_article(1, f'Notícia {index}', f'{SITE}/noticia-{index}', 'Texto sobre saneamento.',
+                                    '2024-05-01', ['Saneamento'])
+        database_writer.checkpoint_crawled_page(1, f'{SITE}/noticia-{index}', [(f'{SITE}/noticia-{index + 1}', 1.0)])
+        database_writer.update_progress(1, index + 1, 10)
+    database_writer.flush()
+
+    assert (database_writer.batches_written, database_writer.operations_written) == (1, 15)
+    assert _urls(db, 'articles') == [f'{SITE}/noticia-{index}' for index in range(5)]
+    assert _urls(db, 'crawled_urls') == [f'{SITE}/noticia-{index}' for index in range(5)]
+    # noticia-1..4 were queued and crawled within the batch; only noticia-5 is left
+    assert _urls(db, 'crawl_frontier') == [f'{SITE}/noticia-5']
+    # Only the latest progress row of the site is written
+    assert db.execute('SELECT pages_crawled FROM site_scraping_progress WHERE site_id = 1').fetchone()[0] == 5
+
+def test_batches_are_capped_at_batch_size(db, writer):
+    database_writer = writer(batch_size=3, flush_interval=0.5)
+    for index in range(7):
+        database_writer.record_failed_fetch(1, f'{SITE}/noticia-{index}', 1.0)
+    database_writer.record_failed_fetch(1, f'{SITE}/noticia-0', 1.0)
+    database_writer.flush()
+
+    assert database_writer.batches_written == 3
+    assert db.execute(f"SELECT attempts FROM crawl_frontier WHERE url = '{SITE}/noticia-0'").fetchone()[0] == 2
+
+def test_a_bad_operation_does_not_lose_the_rest_of_its_batch(db, writer, capsys):
+    database_writer = writer(batch_size=100, flush_interval=0.5)
+    database_writer.add_article(1, 'Boa', f'{SITE}/boa', 'Texto.', '2024-05-01', ['Gás'])
+    database_writer.add_article(1, None, f'{SITE}/sem-titulo', 'Texto.', '2024-05-01', ['Gás']) # title is NOT NULL
+    database_writer.checkpoint_crawled_page(1, f'{SITE}/boa')
+    database_writer.flush()
+
+    assert 'retrying one by one' in capsys.readouterr().out
+    assert _urls(db, 'articles') == [f'{SITE}/boa']
+    assert _urls(db, 'crawled_urls') == [f'{SITE}/boa']
+
+def test_close_commits_what_is_still_queued(db, writer):
+    database_writer = writer(batch_size=100, flush_interval=60)
+    database_writer.add_article(1, 'Última', f'{SITE}/ultima', 'Texto.', '2024-05-01', ['Gás'])
+    database_writer.close()
+
+    assert _urls(db, 'articles') == [f'{SITE}/ultima']
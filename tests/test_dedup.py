@@ -0,0 +1,58 @@
+import random
+
+import database
+import dedup
+from dedup import NearDuplicateIndex, find_near_duplicate, hamming_distance, simhash, to_signed64, to_unsigned64
+
+WORDS = ('governo estado prefeitura obras saneamento água esgoto bairro cidade moradores tarifa reajuste agência '
+         'reguladora contrato concessão investimento milhões reais região metropolitana projeto prazo anos').split()
+
+def _story(seed, length=300):
+    generator = random.Random(seed)
+    return ' '.join(generator.choice(WORDS) for _ in range(length))
+
+def test_an_edited_copy_is_within_the_hamming_threshold_and_another_story_is_not():
+    original = _story(2)
+    words = original.split()
+    words[150] = 'tarifaço'
+    edited = ' '.join(words)
+
+    assert hamming_distance(simhash(original), simhash(edited)) <= dedup.Config.DEDUP_MAX_HAMMING
+    assert hamming_distance(simhash(original), simhash(_story(3))) > dedup.Config.DEDUP_MAX_HAMMING
+    assert simhash(original.upper().replace('ÁGUA', 'AGUA')) == simhash(original) # Case and accents are folded
+    assert simhash('') is None
+
+def test_signed_round_trip_for_sqlite():
+    for fingerprint in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        assert -(1 << 63) <= to_signed64(fingerprint) < (1 << 63)
+        assert to_unsigned64(to_signed64(fingerprint)) == fingerprint
+
+def test_the_index_finds_every_fingerprint_within_max_hamming():
+    index = NearDuplicateIndex(bands=6, max_hamming=5)
+    fingerprint = simhash(_story(3))
+    assert index.find_or_add(fingerprint, 'https://a.exemplo.com.br/1') is None
+
+    # Five flipped bits in five different bands still leave one band equal
+    near = fingerprint
+    for band in range(5):
+        near ^= 1 << (band * 10 + 3)
+    assert index.find_or_add(near, 'https://b.exemplo.com.br/1') == 'https://a.exemplo.com.br/1'
+
+    far = near ^ (1 << 63)
+    assert index.find_or_add(far, 'https://c.exemplo.com.br/1') is None
+    # A URL is not a duplicate of its own earlier version
+    assert index.find_or_add(fingerprint, 'https://a.exemplo.com.br/1') is None
+
+def test_the_index_is_loaded_from_saved_articles(db, monkeypatch):
+    monkeypatch.setattr(dedup, 'near_duplicate_index', NearDuplicateIndex())
+    fingerprint = simhash(_story(4))
+    db.execute("INSERT INTO sites (url) VALUES ('https://jornal.exemplo.com.br')")
+    database.write_batch(db, [database.article_row(1, 'Original', 'https://jornal.exemplo.com.br/1', _story(4),
+                                                   '2024-05-01', ['Saneamento'], to_signed64(fingerprint))])
+
+    duplicate_url = 'https://jornal.exemplo.com.br/2'
+    assert find_near_duplicate(fingerprint ^ 1, duplicate_url) == 'https://jornal.exemplo.com.br/1'
+    database.write_batch(db, [database.article_row(1, 'Cópia', duplicate_url, _story(4), '2024-05-01', ['Saneamento'],
+                                                   to_signed64(fingerprint ^ 1), 'https://jornal.exemplo.com.br/1')])
+    rows = db.execute('SELECT url, duplicate_of FROM articles ORDER BY id').fetchall()
+    assert [tuple(row) for row in rows] == [('https://jornal.exemplo.com.br/1', None), (duplicate_url, 1)]
@@ -0,0 +1,104 @@
+import gzip
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import lxml.html
+
+from discovery import SiteDiscovery, find_feed_links, parse_feed_date
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+def _days_ago(days):
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+def _urlset(entries):
+    urls = ''.join(f'<url><loc>{url}</loc><lastmod>{lastmod}</lastmod></url>' for url, lastmod in entries)
+    return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="{SITEMAP_NS}">{urls}</urlset>'.encode('utf-8')
+
+def _discovery(base_url, **kwargs):
+    return SiteDiscovery(base_url, lambda url: 0.0, **kwargs)
+
+def _read_all(discovery):
+    while discovery.has_pending():
+        discovery.read_next_document()
+    return discovery.results()
+
+def test_sitemap_index_children_are_read_newest_first_gzipped_or_not(http_server):
+    base_url = http_server.base_url
+    http_server.routes['/sitemap.xml'] = (200, {'Content-Type': 'application/xml'}, (
+        f'<sitemapindex xmlns="{SITEMAP_NS}">'
+        f'<sitemap><loc>{base_url}/antigo.xml</loc><lastmod>{_days_ago(30).isoformat()}</lastmod></sitemap>'
+        f'<sitemap><loc>/recente.xml.gz</loc><lastmod>{_days_ago(0).isoformat()}</lastmod></sitemap>'
+        '</sitemapindex>').encode('utf-8'))
+    http_server.routes['/recente.xml.gz'] = (200, {'Content-Type': 'application/octet-stream'}, gzip.compress(_urlset([
+        (f'{base_url}/noticia-hoje', _days_ago(0).isoformat()),
+        (f'{base_url}/noticia-semana', _days_ago(5).isoformat()),
+        ('https://outro.exemplo.com.br/noticia', _days_ago(0).isoformat()), # Other host
+    ])))
+    http_server.routes['/antigo.xml'] = (200, {}, _urlset([
+        (f'{base_url}/noticia-hoje', _days_ago(0).isoformat()), # Already seen
+        (f'{base_url}/arquivo-2019', '2019-01-01'),             # Past DISCOVERY_MAX_AGE_DAYS
+    ]))
+
+    discovery = _discovery(base_url, max_age_days=365)
+    discovery.add_documents(sitemap_urls=[f'{base_url}/sitemap.xml'])
+    results = _read_all(discovery)
+
+    assert [path for path, _ in http_server.requests] == ['/sitemap.xml', '/recente.xml.gz', '/antigo.xml']
+    assert [url for url, _, _ in results] == [f'{base_url}/noticia-hoje', f'{base_url}/noticia-semana']
+    assert results[0][1] > results[1][1] > 0 # Fresher articles get a bigger bonus
+
+def test_rss_and_atom_feeds(http_server):
+    base_url = http_server.base_url
+    http_server.routes['/rss'] = (200, {'Content-Type': 'application/rss+xml'}, (
+        '<rss version="2.0"><channel><title>Jornal</title>'
+        f'<item><title>Um</title><link>{base_url}/rss-1</link><pubDate>{format_datetime(_days_ago(1))}</pubDate></item>'
+        f'<item><title>Dois</title><link>/rss-2</link></item>'
+        '</channel></rss>').encode('utf-8'))
+    http_server.routes['/atom'] = (200, {'Content-Type': 'application/atom+xml'}, (
+        '<feed xmlns="http://www.w3.org/2005/Atom"><title>Jornal</title>'
+        f'<entry><title>Três</title><link rel="self" href="{base_url}/atom-self"/>'
+        f'<link href="{base_url}/atom-1"/><updated>{_days_ago(0).isoformat()}</updated></entry>'
+        '</feed>').encode('utf-8'))
+
+    discovery = _discovery(base_url)
+    discovery.add_documents(feed_urls=[f'{base_url}/rss', f'{base_url}/atom'])
+    results = _read_all(discovery)
+
+    assert [url for url, _, _ in results] == [f'{base_url}/atom-1', f'{base_url}/rss-1', f'{base_url}/rss-2']
+    assert results[2][2] is None # No pubDate
+
+def test_only_the_best_max_urls_are_kept_and_max_sitemaps_are_read(http_server):
+    base_url = http_server.base_url
+    http_server.routes['/sitemap-1.xml'] = (200, {}, _urlset(
+        [(f'{base_url}/noticia-{days}', _days_ago(days).isoformat()) for days in range(6)]))
+    http_server.routes['/sitemap-2.xml'] = (200, {}, _urlset([(f'{base_url}/nunca-lido', _days_ago(0).isoformat())]))
+
+    discovery = _discovery(base_url, max_urls=2, max_sitemaps=1)
+    discovery.add_documents(sitemap_urls=[f'{base_url}/sitemap-1.xml', f'{base_url}/sitemap-2.xml'])
+    results = _read_all(discovery)
+
+    assert [url for url, _, _ in results] == [f'{base_url}/noticia-0', f'{base_url}/noticia-1']
+    assert [path for path, _ in http_server.requests] == ['/sitemap-1.xml']
+
+def test_a_missing_or_broken_document_is_skipped(http_server):
+    base_url = http_server.base_url
+    http_server.routes['/quebrado.xml'] = (200, {}, _urlset([(f'{base_url}/noticia', '2024-05-01')])[:-20])
+
+    discovery = _discovery(base_url, max_age_days=0)
+    discovery.add_documents(sitemap_urls=[f'{base_url}/nao-existe.xml', f'{base_url}/quebrado.xml'])
+    assert [url for url, _, _ in _read_all(discovery)] == [f'{base_url}/noticia']
+
+def test_feed_dates():
+    assert parse_feed_date('2024-05-01') == datetime(2024, 5, 1, tzinfo=timezone.utc)
+    assert parse_feed_date('2024-05-01T10:00:00Z') == datetime(2024, 5, 1, 10, tzinfo=timezone.utc)
+    assert parse_feed_date('Wed, 01 May 2024 10:00:00 -0300') == datetime(2024, 5, 1, 13, tzinfo=timezone.utc)
+    assert parse_feed_date('ontem') is None
+
+def test_feed_links_advertised_by_a_page():
+    document = lxml.html.fromstring(
+        '<html><head><link rel="alternate" type="application/rss+xml" href="/feed">'
+        '<link rel="alternate" type="application/atom+xml" href="https://jornal.exemplo.com.br/atom">'
+        '<link rel="stylesheet" href="/estilo.css"></head><body></body></html>')
+    assert find_feed_links('https://jornal.exemplo.com.br/noticia', document) == [
+        'https://jornal.exemplo.com.br/feed', 'https://jornal.exemplo.com.br/atom']
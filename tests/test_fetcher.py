@@ -0,0 +1,14 @@
+from fetcher import decode_html
+
+PAGE = '<html><head>{meta}</head><body>Ação</body></html>'
+
+def test_content_type_charset_wins():
+    assert 'Ação' in decode_html(PAGE.format(meta='').encode('cp1252'), 'text/html; charset=ISO-8859-1')
+
+def test_meta_charset_is_used_without_a_header_charset():
+    html = PAGE.format(meta='<meta charset="windows-1252">').encode('cp1252')
+    assert 'Ação' in decode_html(html, 'text/html')
+
+def test_undeclared_utf8_is_not_read_as_latin1():
+    assert 'Ação' in decode_html(PAGE.format(meta='').encode('utf-8'), 'text/html')
+    assert decode_html(b'\xef\xbb\xbf' + 'Ação'.encode('utf-8')) == 'Ação'
@@ -0,0 +1,23 @@
+from frontier import canonicalize_url
+
+def test_scheme_and_host_are_lowercased_and_default_ports_dropped():
+    assert canonicalize_url('HTTPS://Example.COM:443/Noticia') == 'https://example.com/Noticia'
+    assert canonicalize_url('http://example.com:8080/a') == 'http://example.com:8080/a'
+
+def test_fragment_and_trailing_slash_are_dropped_except_on_the_root():
+    assert canonicalize_url('https://example.com/politica/#comentarios') == 'https://example.com/politica'
+    assert canonicalize_url('https://example.com') == 'https://example.com/'
+    assert canonicalize_url('https://example.com//a//b/') == 'https://example.com/a/b'
+
+def test_tracking_parameters_are_dropped_and_the_rest_sorted():
+    url = 'https://example.com/a?utm_source=x&b=2&fbclid=y&a=1&pk_campaign=z'
+    assert canonicalize_url(url) == 'https://example.com/a?a=1&b=2'
+
+def test_percent_escapes_are_normalised():
+    assert canonicalize_url('https://example.com/ação') == canonicalize_url('https://example.com/a%C3%A7%C3%A3o')
+    assert canonicalize_url('https://example.com/a%c3%a7') == 'https://example.com/a%C3%A7'
+    assert canonicalize_url('https://example.com/%7Euser') == 'https://example.com/~user'
+
+def test_an_escaped_slash_stays_escaped():
+    assert canonicalize_url('https://example.com/a%2Fb') == 'https://example.com/a%2Fb'
+    assert canonicalize_url('https://example.com/a%2Fb') != canonicalize_url('https://example.com/a/b')
@@ -0,0 +1,57 @@
+import time
+from email.utils import formatdate
+
+import scraper
+from politeness import HostRateLimiter, parse_retry_after, MAX_BACKOFF_DELAY
+
+HOST = 'jornal.exemplo.com.br'
+
+def test_retry_after_in_seconds_or_as_an_http_date():
+    assert parse_retry_after('120') == 120.0
+    assert 3590 < parse_retry_after(formatdate(time.time() + 3600, usegmt=True)) <= 3600
+    assert parse_retry_after(formatdate(time.time() - 3600, usegmt=True)) == 0.0
+    assert parse_retry_after('amanhã') is None
+    assert parse_retry_after(None) is None
+
+def test_a_host_is_busy_for_its_delay_after_each_request():
+    limiter = HostRateLimiter(default_delay=10)
+    acquired, now = limiter.try_acquire(HOST)
+    assert acquired
+    acquired, next_allowed = limiter.try_acquire(HOST)
+    assert not acquired and 9 < next_allowed - now <= 10
+    assert limiter.try_acquire('outro.exemplo.com.br')[0] # Other hosts are not held up
+
+    limiter.set_crawl_delay(HOST, 3)
+    assert limiter.get_delay(HOST) == 3
+
+def test_throttling_doubles_the_delay_and_successes_bring_it_back():
+    limiter = HostRateLimiter(default_delay=2)
+    limiter.record_throttled(HOST)
+    limiter.record_throttled(HOST)
+    assert limiter.get_delay(HOST) == 8
+    limiter.record_success(HOST)
+    assert limiter.get_delay(HOST) == 4
+    limiter.record_success(HOST)
+    assert limiter.get_delay(HOST) == 2
+
+    for _ in range(20):
+        limiter.record_throttled(HOST)
+    assert limiter.get_delay(HOST) == MAX_BACKOFF_DELAY
+
+def test_retry_after_pushes_the_next_slot_past_the_backoff_delay():
+    limiter = HostRateLimiter(default_delay=1)
+    limiter.record_throttled(HOST, retry_after=60)
+    assert 59 < limiter.next_allowed_time(HOST) - time.monotonic() <= 60
+    assert not limiter.try_acquire(HOST)[0]
+
+def test_a_503_with_retry_after_holds_the_host_without_retrying(http_server):
+    http_server.routes['/noticia'] = (503, {'Retry-After': '90'}, b'')
+    scraper.host_rate_limiter.reset()
+    try:
+        fetched_page = scraper.fetch_page(http_server.base_url + '/noticia')
+        host = http_server.base_url.split('//', 1)[1]
+        assert (fetched_page['status_code'], fetched_page['html']) == (503, None)
+        assert len(http_server.requests) == 1 # 503 is left to the rate limiter, not urllib3's Retry
+        assert scraper.host_rate_limiter.next_allowed_time(host) - time.monotonic() > 80
+    finally:
+        scraper.host_rate_limiter.reset()
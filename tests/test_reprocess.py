@@ -0,0 +1,76 @@
+import json
+import time
+
+import pytest
+from flask import Flask
+
+import database
+import dedup
+import scraper
+from archive import ResponseArchive
+from config import Config
+from reprocess import ReprocessScheduler
+
+SITE = 'https://jornal.exemplo.com.br'
+
+def _article_page(title, sentence):
+    paragraphs = ''.join(f'<p>{sentence * 4}</p>' for _ in range(3))
+    return f'<html><head><title>{title}</title></head><body><article><h1>{title}</h1>{paragraphs}</article></body></html>'
+
+OLD_PAGE = _article_page('Obras no bairro', 'A prefeitura começou nesta semana as obras de pavimentação das ruas do bairro. ')
+NEW_PAGE = _article_page('Obras de saneamento no bairro',
+                         'A prefeitura começou nesta semana as obras de saneamento e de drenagem das ruas do bairro. ')
+OTHER_PAGE = _article_page('Futebol', 'O time da cidade venceu o clássico de domingo por dois gols a zero no estádio. ')
+
+@pytest.fixture
+def archive(db, database_writer, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'ARCHIVE_DIR', str(tmp_path / 'archive'))
+    monkeypatch.setattr(Config, 'RUN_REPORTS_DIR', str(tmp_path / 'run_reports'))
+    monkeypatch.setattr(Config, 'PARSE_PROCESSES', 0)
+    monkeypatch.setattr(dedup, 'near_duplicate_index', dedup.NearDuplicateIndex())
+    monkeypatch.setattr(scraper, '_crawled_urls_per_site_session', {})
+    db.execute('INSERT INTO sites (url) VALUES (?)', (SITE,))
+    db.commit()
+    response_archive = ResponseArchive()
+    yield response_archive
+    response_archive.close_segment()
+
+def _archive_pages(db, response_archive, pages):
+    rows = []
+    for url, html in pages:
+        segment, offset, length, fetched_at = response_archive.append(url, 200, html)
+        rows.append((1, url, fetched_at, 200, segment, offset, length))
+    database.write_batch(db, archived_responses=rows)
+
+def _reprocess(search_terms):
+    app = Flask(__name__)
+    scheduler = ReprocessScheduler(app)
+    with app.app_context():
+        scheduler.start([{'id': 1, 'url': SITE}], search_terms)
+    deadline = time.monotonic() + 30
+    while scheduler.is_running():
+        assert time.monotonic() < deadline, 'reprocessing did not finish'
+        time.sleep(0.01)
+    return scheduler
+
+def test_the_latest_archived_copy_of_each_page_is_reextracted_and_matched(db, archive):
+    _archive_pages(db, archive, [(f'{SITE}/obras', OLD_PAGE), (f'{SITE}/futebol', OTHER_PAGE), (f'{SITE}/obras', NEW_PAGE)])
+
+    scheduler = _reprocess(['Saneamento'])
+
+    articles = [(row['url'], row['title'], json.loads(row['matched_terms']))
+                for row in db.execute('SELECT url, title, matched_terms FROM articles')]
+    assert articles == [(f'{SITE}/obras', 'Obras de saneamento no bairro', ['Saneamento'])]
+    snapshot = scheduler.run.snapshot()
+    assert snapshot['status'] == 'stopped'
+    assert snapshot['individual_sites'][0]['pages_crawled'] == 2 # One per URL, not per archived fetch
+    assert scheduler.get_stats()['queue_depth'] == 0
+
+def test_an_unreadable_record_is_skipped(db, archive):
+    _archive_pages(db, archive, [(f'{SITE}/obras', NEW_PAGE)])
+    database.write_batch(db, archived_responses=[(1, f'{SITE}/perdida', '2024-05-01T10:00:00Z', 200,
+                                                  'apagado.warc.gz', 0, 100)])
+
+    _reprocess(['Saneamento'])
+
+    assert [row['url'] for row in db.execute('SELECT url FROM articles')] == [f'{SITE}/obras']
@@ -0,0 +1,66 @@
+import requests
+
+import robots
+from config import Config
+from robots import RobotsCache
+
+ROBOTS_TXT = b'''User-agent: *
+Disallow: /privado/
+Crawl-delay: 2
+Sitemap: https://jornal.exemplo.com.br/sitemap.xml
+'''
+
+def test_rules_are_parsed_and_kept_in_the_database(db, http_server):
+    http_server.routes['/robots.txt'] = (200, {'Content-Type': 'text/plain'}, ROBOTS_TXT)
+    base_url = http_server.base_url
+    rules = RobotsCache().get_rules(base_url + '/')
+
+    assert rules.can_fetch(base_url + '/noticia')
+    assert not rules.can_fetch(base_url + '/privado/pagina')
+    assert rules.crawl_delay == 2
+    assert rules.sitemaps == ['https://jornal.exemplo.com.br/sitemap.xml']
+
+    # A new process reads them from robots_cache instead of the network
+    cache = RobotsCache()
+    assert not cache.get_rules(base_url + '/qualquer').can_fetch(base_url + '/privado/')
+    assert not cache.is_allowed(base_url + '/privado/outra')
+    assert len(http_server.requests) == 1
+
+def test_expired_rules_are_fetched_again(db, http_server, monkeypatch):
+    http_server.routes['/robots.txt'] = (200, {}, ROBOTS_TXT)
+    cache = RobotsCache()
+    cache.get_rules(http_server.base_url + '/')
+    cache.get_rules(http_server.base_url + '/')
+    assert len(http_server.requests) == 1
+
+    monkeypatch.setattr(Config, 'ROBOTS_CACHE_TTL', -1)
+    http_server.routes['/robots.txt'] = (200, {}, b'User-agent: *\nDisallow:\n')
+    assert cache.get_rules(http_server.base_url + '/').can_fetch(http_server.base_url + '/privado/pagina')
+    assert len(http_server.requests) == 2
+
+def test_a_4xx_robots_txt_allows_everything(db, http_server):
+    rules = RobotsCache().get_rules(http_server.base_url + '/') # No route: 404
+    assert rules.status_code == 404
+    assert rules.can_fetch(http_server.base_url + '/privado/pagina')
+
+def test_a_5xx_robots_txt_disallows_everything_until_the_error_ttl(db, http_server, monkeypatch):
+    http_server.routes['/robots.txt'] = (503, {}, b'')
+    cache = RobotsCache()
+    assert not cache.get_rules(http_server.base_url + '/').can_fetch(http_server.base_url + '/noticia')
+    assert not cache.is_allowed(http_server.base_url + '/noticia')
+
+    # The full TTL does not apply to errors; once ROBOTS_ERROR_TTL is over it is asked again
+    http_server.routes['/robots.txt'] = (200, {}, ROBOTS_TXT)
+    cache.get_rules(http_server.base_url + '/')
+    assert len(http_server.requests) == 1
+    monkeypatch.setattr(Config, 'ROBOTS_ERROR_TTL', -1)
+    assert cache.get_rules(http_server.base_url + '/').can_fetch(http_server.base_url + '/noticia')
+    assert len(http_server.requests) == 2
+
+def test_an_unreachable_server_disallows_everything(db, monkeypatch):
+    def refuse(url, **kwargs):
+        raise requests.exceptions.ConnectionError(url)
+    monkeypatch.setattr(robots, 'fetch', refuse)
+    rules = RobotsCache().get_rules('http://127.0.0.1:9/')
+    assert rules.status_code is None
+    assert not rules.can_fetch('http://127.0.0.1:9/noticia')
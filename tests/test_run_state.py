@@ -0,0 +1,50 @@
+import json
+
+from config import Config
+from run_state import CrawlRun, RunRegistry
+
+def test_snapshot_adds_up_the_sites_of_the_run():
+    run = CrawlRun()
+    run.start_site(1, 100, 'https://jornal1.exemplo.com.br')
+    run.start_site(2, 50, 'https://jornal2.exemplo.com.br')
+    run.update_site(1, pages_crawled=30)
+    run.update_site(2, pages_crawled=50, status='completed')
+    run.record_article(1, 'Notícia', 'https://jornal1.exemplo.com.br/noticia', ['Gás'])
+    run.record_article(2, 'Outra', 'https://jornal2.exemplo.com.br/outra')
+
+    snapshot = run.snapshot()
+    assert snapshot['status'] == 'running'
+    # Progress counts the sites still running; articles count every site
+    assert (snapshot['pages_crawled'], snapshot['max_pages']) == (30, 100)
+    assert snapshot['articles_saved'] == 2
+    assert [site['articles_saved'] for site in snapshot['individual_sites']] == [1, 1]
+
+def test_stop_signal_and_status():
+    run = CrawlRun()
+    assert not run.stop_requested()
+    run.request_stop()
+    assert run.stop_requested()
+    assert run.snapshot()['status'] == 'stopping'
+
+def test_progress_is_checkpointed_once_per_interval(monkeypatch):
+    run = CrawlRun()
+    run.start_site(1, 10)
+    monkeypatch.setattr(Config, 'RUN_STATE_CHECKPOINT_INTERVAL', 60)
+    assert not run.checkpoint_due(1) # Just started
+    monkeypatch.setattr(Config, 'RUN_STATE_CHECKPOINT_INTERVAL', 0)
+    assert run.checkpoint_due(1)
+
+def test_finishing_a_run_saves_its_report(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'RUN_REPORTS_DIR', str(tmp_path))
+    registry = RunRegistry()
+    run = registry.start_run('incremental')
+    run.start_site(1, 10, 'https://jornal1.exemplo.com.br')
+    run.update_site(1, pages_crawled=4, status='completed')
+    assert registry.stop_current_run()
+
+    run.finish()
+    assert run.snapshot()['status'] == 'stopped'
+    assert not registry.stop_current_run() # Nothing left to stop
+    with open(run.report_path) as report_file:
+        report = json.load(report_file)
+    assert (report['mode'], report['status'], report['pages_crawled']) == ('incremental', 'stopped', 4)
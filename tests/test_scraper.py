@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+import database
+import dedup
+import scraper
+
+PARAGRAPH = ('O governo anunciou nesta terça-feira um novo plano de saneamento para a região metropolitana, '
+             'com investimentos previstos em água, esgoto e drenagem ao longo dos próximos cinco anos. ')
+
+ARTICLE_PAGE = f'''<html><head><title>Plano de saneamento</title>
+</head>
+<body><article><h1>Plano de saneamento</h1>
+<p><img src="/img0.jpg"></p>
+<img src="/img1.jpg"><img src="/img2.jpg"><img src="/img3.jpg"><img src="/img4.jpg">
+<p>{PARAGRAPH * 3}</p><p>{PARAGRAPH * 2}</p><p>{PARAGRAPH}</p>
+<a href="/outra-noticia">Outra notícia</a>
+</article></body></html>'''.encode('utf-8')
+
+def test_fetching_and_parsing_a_page_makes_exactly_one_request(http_server):
+    http_server.routes['/noticia'] = (200, {'Content-Type': 'text/html; charset=utf-8'}, ARTICLE_PAGE)
+    url = http_server.base_url + '/noticia'
+    scraper.reset_fetch_stats()
+
+    fetched_page = scraper.fetch_page(url)
+    result = scraper.parse_page(url, fetched_page['html'])
+
+    assert result['article']['title'] == 'Plano de saneamento'
+    assert http_server.base_url + '/outra-noticia' in result['outlinks']
+    assert [path for path, _ in http_server.requests] == ['/noticia'] # No image downloads from newspaper
+    assert scraper.get_fetch_stats()['fetches'] == 1
+
+def _failing_once(status):
+    responses = [(status, {}, b'erro'), (200, {'Content-Type': 'text/html; charset=utf-8'}, b'<p>ok</p>')]
+    return lambda request_headers: responses.pop(0) if len(responses) > 1 else responses[0]
+
+def test_retried_fetches_count_every_request(http_server, monkeypatch):
+    monkeypatch.setattr(scraper.Config, 'FETCH_BACKOFF_FACTOR', 0.0)
+    http_server.routes['/instavel'] = _failing_once(502)
+    http_server.routes['/antiga'] = (301, {'Location': '/instavel'}, b'')
+    scraper.reset_fetch_stats()
+
+    fetched_page = scraper.fetch_page(http_server.base_url + '/antiga')
+
+    assert fetched_page['html'] == '<p>ok</p>'
+    assert len(http_server.requests) == 3 # Redirect, 502, retried 200
+    assert scraper.get_fetch_stats()['fetches'] == 3
+
+def test_async_fetch_counts_every_attempt(http_server, monkeypatch):
+    monkeypatch.setattr(scraper.Config, 'FETCH_BACKOFF_FACTOR', 0.0)
+    http_server.routes['/instavel'] = _failing_once(500)
+    scraper.reset_fetch_stats()
+
+    async def fetch():
+        async with scraper.aiohttp.ClientSession() as session:
+            return await scraper._fetch_page_async(session, http_server.base_url + '/instavel')
+
+    fetched_page = asyncio.run(fetch())
+
+    assert fetched_page['html'] == '<p>ok</p>'
+    assert len(http_server.requests) == scraper.get_fetch_stats()['fetches'] == 2
+
+HOME_PAGE = b'<html><head><title>Jornal</title></head><body><a href="/noticia">Plano de saneamento</a></body></html>'
+
+@pytest.fixture
+def crawl_site(database_writer, monkeypatch):
+    monkeypatch.setattr(scraper.Config, 'PARSE_PROCESSES', 0)
+    monkeypatch.setattr(scraper.Config, 'ARCHIVE_ENABLED', False)
+    monkeypatch.setattr(dedup, 'near_duplicate_index', dedup.NearDuplicateIndex())
+    monkeypatch.setattr(scraper, '_crawled_urls_per_site_session', {})
+
+    # One run over the site, pages fetched back to back (politeness is the scheduler's job)
+    def crawl(base_url, mode='default'):
+        scraper._crawled_urls_per_site_session.clear()
+        database.add_site(base_url)
+        crawl = scraper.SiteCrawl(1, base_url + '/', ['Saneamento'], mode=mode)
+        crawl.start()
+        while crawl.has_work():
+            crawl.crawl_next_page()
+        crawl.finish()
+        database_writer.flush()
+    return crawl
+
+# Article page that answers If-None-Match with 304 while its ETag is current
+def _page_with_etag(state):
+    def respond(request_headers):
+        if request_headers.get('If-None-Match') == state['etag']:
+            return 304, {'ETag': state['etag']}, b''
+        return 200, {'Content-Type': 'text/html; charset=utf-8', 'ETag': state['etag']}, state['body']
+    return respond
+
+def _article_requests(http_server):
+    return [headers for path, headers in http_server.requests if path == '/noticia']
+
+def test_an_incremental_scan_revalidates_known_pages_instead_of_reparsing(db, http_server, crawl_site, capsys):
+    http_server.routes['/'] = (200, {'Content-Type': 'text/html; charset=utf-8'}, HOME_PAGE)
+    http_server.routes['/noticia'] = _page_with_etag({'etag': '"v1"', 'body': ARTICLE_PAGE})
+
+    crawl_site(http_server.base_url)
+    assert [row['title'] for row in db.execute('SELECT title FROM articles')] == ['Plano de saneamento']
+    validators = database.get_page_validators(1)
+    assert validators[http_server.base_url + '/noticia']['etag'] == '"v1"'
+    # A default scan skips the article, already crawled
+    crawl_site(http_server.base_url)
+    assert len(_article_requests(http_server)) == 1
+
+    capsys.readouterr()
+    crawl_site(http_server.base_url, mode='incremental')
+    output = capsys.readouterr().out
+    assert _article_requests(http_server)[-1]['If-None-Match'] == '"v1"'
+    assert 'Not modified since last crawl (304)' in output
+    # The home page sent no validators; its unchanged body is caught by the content hash
+    assert 'Content unchanged since last crawl' in output
+    assert 'Article saved' not in output
+
+def test_an_incremental_scan_updates_a_changed_article(db, http_server, crawl_site):
+    state = {'etag': '"v1"', 'body': ARTICLE_PAGE}
+    http_server.routes['/'] = (200, {'Content-Type': 'text/html; charset=utf-8'}, HOME_PAGE)
+    http_server.routes['/noticia'] = _page_with_etag(state)
+    crawl_site(http_server.base_url)
+
+    state.update(etag='"v2"', body=ARTICLE_PAGE.replace(b'Plano de saneamento', b'Plano de saneamento revisto'))
+    crawl_site(http_server.base_url, mode='incremental')
+
+    assert [row['title'] for row in db.execute('SELECT title FROM articles')] == ['Plano de saneamento revisto']
+    assert database.get_page_validators(1)[http_server.base_url + '/noticia']['etag'] == '"v2"'
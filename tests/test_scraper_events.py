@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from run_state import RunRegistry, run_registry
+
+# Stands in for the crawl engine of the run, which /scraper_status checks is alive
+class RunningScheduler:
+    def is_running(self):
+        return True
+
+    def get_stats(self):
+        return {'workers': 4, 'active_workers': 1, 'queue_depth': 0, 'sites_pending': 1}
+
+@pytest.fixture
+def app_module(db, monkeypatch):
+    import app # Runs init_db on import, so only once db points DATABASE at the test database
+    monkeypatch.setitem(app.app.config, 'SSE_STATUS_INTERVAL', 0.05)
+    monkeypatch.setattr(app, 'crawl_scheduler', None)
+    monkeypatch.setattr(run_registry, 'current_run', None)
+    return app
+
+def _events(chunks, until, limit=50):
+    events = []
+    for _ in range(limit):
+        chunk = next(chunks).decode('utf-8')
+        if chunk.startswith('event: '):
+            event_line, data_line = chunk.strip().split('\n')
+            events.append((event_line[len('event: '):], json.loads(data_line[len('data: '):])))
+            if events[-1][0] == until:
+                return events
+    raise AssertionError(f'no {until!r} event in {events}')
+
+def test_the_stream_sends_status_run_and_article_events(app_module, monkeypatch):
+    response = app_module.app.test_client().get('/scraper_events')
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry: ')
+    assert _events(chunks, 'status')[-1][1]['status'] == 'STOPPED'
+
+    monkeypatch.setattr(app_module, 'crawl_scheduler', RunningScheduler())
+    run = run_registry.start_run()
+    run.start_site(1, 10, 'https://jornal.exemplo.com.br')
+    assert ('started', {'mode': 'default'}) in _events(chunks, 'started')
+    run.record_article(1, 'Tarifa de gás', 'https://jornal.exemplo.com.br/gas', ['Gás'])
+    assert _events(chunks, 'article')[-1][1] == {'site_id': 1, 'title': 'Tarifa de gás',
+                                                  'url': 'https://jornal.exemplo.com.br/gas', 'matched_terms': ['Gás']}
+    status = _events(chunks, 'status')[-1][1]
+    assert (status['status'], status['articles_saved'], status['workers']) == ('RUNNING', 1, 4)
+
+    response.close()
+    assert not run_registry._subscribers # Unsubscribed when the client goes away
+
+def test_a_subscriber_that_does_not_read_only_loses_its_own_events(monkeypatch):
+    monkeypatch.setattr(RunRegistry, 'SUBSCRIBER_QUEUE_SIZE', 2)
+    registry = RunRegistry()
+    idle, reading = registry.subscribe(), registry.subscribe()
+    received = []
+    for index in range(3):
+        registry.publish('article', {'index': index})
+        received.append(reading.get_nowait()[1]['index'])
+
+    assert received == [0, 1, 2]
+    assert [idle.get_nowait()[1]['index'] for _ in range(idle.qsize())] == [0, 1]
+    registry.unsubscribe(idle)
+    registry.publish('article', {'index': 3})
+    assert idle.empty() and reading.get_nowait()[1] == {'index': 3}
@@ -0,0 +1,66 @@
+import json
+import time
+
+from flask import Flask
+
+import database
+import dedup
+from config import Config
+from term_backfill import TermBackfill
+
+SITE = 'https://jornal.exemplo.com.br'
+
+def _run_backfill():
+    backfill = TermBackfill()
+    backfill.request(Flask(__name__))
+    deadline = time.monotonic() + 10
+    while backfill.is_running():
+        assert time.monotonic() < deadline, 'backfill did not finish'
+        time.sleep(0.01)
+    return backfill.last_result
+
+def test_a_new_term_is_matched_against_saved_articles_and_candidates(db, monkeypatch):
+    monkeypatch.setattr(Config, 'TERM_BACKFILL_BATCH_SIZE', 1) # Every batch boundary gets crossed
+    monkeypatch.setattr(dedup, 'near_duplicate_index', dedup.NearDuplicateIndex())
+    db.execute('INSERT INTO sites (url) VALUES (?)', (SITE,))
+    database.write_batch(db, [database.article_row(1, 'Gás mais caro', f'{SITE}/gas',
+                                                   'O gás e a energia elétrica sobem em junho.', '2024-05-01', ['Gás'])],
+                         candidates=[database.candidate_row(1, 'Conta de luz', f'{SITE}/luz',
+                                                            'A ENERGIA ficará mais cara.', '2024-05-02'),
+                                     database.candidate_row(1, 'Futebol', f'{SITE}/futebol',
+                                                            'O time venceu ontem.', '2024-05-03')])
+    database.add_search_term('Gás')
+    database.finish_term_backfill([term['id'] for term in database.get_search_terms()])
+    database.add_search_term('Energia')
+
+    result = _run_backfill()
+
+    assert (result['terms'], result['articles_scanned'], result['articles_flagged']) == (['Energia'], 1, 1)
+    assert (result['candidates_scanned'], result['candidates_promoted']) == (2, 1)
+    matched = {row['url']: json.loads(row['matched_terms']) for row in db.execute('SELECT url, matched_terms FROM articles')}
+    assert matched == {f'{SITE}/gas': ['Gás', 'Energia'], f'{SITE}/luz': ['Energia']}
+    assert [row['url'] for row in db.execute('SELECT url FROM candidate_articles')] == [f'{SITE}/futebol']
+    promoted_id = db.execute('SELECT id FROM articles WHERE url = ?', (f'{SITE}/luz',)).fetchone()[0]
+    assert database.get_article(promoted_id)['content'] == 'A ENERGIA ficará mais cara.'
+    assert database.get_articles(['Energia'])['total_results'] == 2
+    assert database.get_backfill_terms() == []
+
+    # Nothing pending: a new request finds no work
+    assert _run_backfill() is None
+
+def test_near_duplicate_candidates_follow_the_dedup_policy(db, monkeypatch):
+    monkeypatch.setattr(Config, 'DEDUP_POLICY', 'skip')
+    monkeypatch.setattr(dedup, 'near_duplicate_index', dedup.NearDuplicateIndex())
+    text = 'A tarifa de energia da região metropolitana terá reajuste de oito por cento a partir de junho, anunciou a agência.'
+    fingerprint = dedup.to_signed64(dedup.simhash(text))
+    db.execute('INSERT INTO sites (url) VALUES (?)', (SITE,))
+    database.write_batch(db, [database.article_row(1, 'Reajuste', f'{SITE}/reajuste', text, '2024-05-01', ['Tarifa'],
+                                                   fingerprint)],
+                         candidates=[database.candidate_row(1, 'Reajuste', f'{SITE}/reajuste-copia', text, '2024-05-01',
+                                                            fingerprint)])
+    database.add_search_term('Energia')
+
+    result = _run_backfill()
+
+    assert (result['articles_flagged'], result['candidates_promoted']) == (1, 0)
+    assert [row['url'] for row in db.execute('SELECT url FROM candidate_articles')] == [f'{SITE}/reajuste-copia']
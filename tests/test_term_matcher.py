@@ -0,0 +1,34 @@
+from term_matcher import TermMatcher, fold_text
+
+def test_fold_text_drops_case_accents_and_extra_whitespace():
+    assert fold_text('Ação Pública') == 'acao publica'
+    assert fold_text('São  Paulo\n') == 'sao paulo '
+
+def test_terms_match_regardless_of_case_and_accents():
+    matcher = TermMatcher(['Gás', 'São Paulo'])
+    assert matcher.find_terms('O GAS de sao   paulo') == ['Gás', 'São Paulo']
+
+def test_terms_match_inside_words_unless_whole_words():
+    assert TermMatcher(['Gás']).find_terms('Usina de biogás') == ['Gás']
+    assert TermMatcher(['Gás'], whole_words=True).find_terms('Usina de biogás') == []
+    assert TermMatcher(['Gás'], whole_words=True).find_terms('Preço do gás sobe') == ['Gás']
+
+def test_terms_contained_in_a_longer_match_are_found():
+    matcher = TermMatcher(['rio', 'Rio de Janeiro', 'janeiro'])
+    assert matcher.find_terms('Chuva no Rio de Janeiro') == ['rio', 'Rio de Janeiro', 'janeiro']
+
+def test_results_follow_the_search_term_order():
+    matcher = TermMatcher(['Transporte', 'Energia', 'Saneamento'])
+    assert matcher.find_terms('Saneamento, energia e transporte') == ['Transporte', 'Energia', 'Saneamento']
+
+def test_terms_that_fold_alike_are_all_reported():
+    assert TermMatcher(['São Paulo', 'sao paulo']).find_terms('SÃO PAULO') == ['São Paulo', 'sao paulo']
+
+def test_a_term_does_not_match_across_title_and_content():
+    matcher = TermMatcher(['fim começo'])
+    assert matcher.find_terms('Título do fim', 'começo do texto') == []
+    assert matcher.find_terms('Título', 'do fim começo') == ['fim começo']
+
+def test_no_terms_match_nothing():
+    assert TermMatcher([]).find_terms('qualquer texto') == []
+    assert TermMatcher(['  ']).find_terms('qualquer texto') == []